@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import argparse
+    import random
+    import hashlib
+    import json
+    warnings.filterwarnings("ignore")
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# Make a synthetic metagenome, metagenomic reads, and a minimal ViWrap db dir at a configurable scale;
+# the helpers below are shared with "stub_tools.py", so that all the stub tools make the same calls for the same contig
+
+synthetic_data_json = 'synthetic_data.json'
+metagenome_stem = 'Synthetic_metaG'
+
+integrase_vogs = ['VOG00041', 'VOG15133', 'VOG20969', 'VOG02658', 'VOG04024', 'VOG01778', 'VOG02371']
+kos = [f'K{i:05d}' for i in range(1, 2001, 5)] # 400 KOs
+amg_kos = kos[::10] # Every 10th KO is an AMG KO
+pfams = [f'PF{i:05d}.20' for i in range(1, 301)]
+vogs = [f'VOG{i:05d}' for i in range(100, 600)]
+metabolisms = ['Amino acid metabolism', 'Carbohydrate metabolism', 'Energy metabolism', 'Metabolism of cofactors and vitamins', 'Nucleotide metabolism', 'Lipid metabolism']
+virus_taxs = ['Duplodnaviria;Heunggongvirae;Uroviricota;Caudoviricetes;Crassvirales;Intestiviridae;Lahndsivirus;Lahndsivirus sp.',
+              'Duplodnaviria;Heunggongvirae;Uroviricota;Caudoviricetes;Kirjokansivirales;Graaviviridae;Gravivirus;Gravivirus sp.',
+              'Duplodnaviria;Heunggongvirae;Uroviricota;Caudoviricetes;NA;Autographiviridae;Teseptimavirus;Teseptimavirus T7',
+              'Monodnaviria;Sangervirae;Phixviricota;Malgrandaviricetes;Petitvirales;Microviridae;Phix174microvirus;Escherichia phage phiX174',
+              'Varidnaviria;Bamfordvirae;Preplasmiviricota;Tectiliviricetes;Vinavirales;Corticoviridae;Corticovirus;Pseudoalteromonas virus PM2']
+host_taxs = ['d__Bacteria;p__Bacteroidota;c__Bacteroidia;o__Bacteroidales;f__Bacteroidaceae;g__Bacteroides',
+             'd__Bacteria;p__Proteobacteria;c__Gammaproteobacteria;o__Enterobacterales;f__Enterobacteriaceae;g__Escherichia',
+             'd__Bacteria;p__Firmicutes;c__Bacilli;o__Lactobacillales;f__Streptococcaceae;g__Streptococcus',
+             'd__Bacteria;p__Cyanobacteria;c__Cyanobacteriia;o__PCC-6307;f__Cyanobiaceae;g__Synechococcus']
+ref_viral_gn_num = 200 # The number of IMG/VR reference genomes in the synthetic Tax classification db
+
+def get_fraction(name, salt):
+    # A stable pseudo-random number in [0, 1) for each (name, salt) pair; numbers of different salts are independent
+    return int.from_bytes(hashlib.blake2b(f'{salt}:{name}'.encode(), digest_size = 8).digest(), 'big') / 18446744073709551616
+
+def get_base_scaffold(name):
+    # Remove the VirSorter2 "||" suffix and the VIBRANT "_fragment_" suffix
+    name = name.split('||', 1)[0]
+    if '_fragment_' in name:
+        name = name.rsplit('_fragment_', 1)[0]
+    return name
+
+def is_viral_scaffold(name):
+    viral_fraction = float(os.environ.get('VIWRAP_BENCH_VIRAL_FRACTION', 0.1))
+    return get_fraction(get_base_scaffold(name), 'viral') < viral_fraction
+
+def get_genes(scaffold, length):
+    genes = [] # [(pro, start, end, strand)]
+    for i in range(max(int(length / 1000), 1)): # One gene per kb
+        start = i * 1000 + 1
+        end = min(start + 899, length)
+        strand = '1' if get_fraction(f'{scaffold}_{i + 1}', 'strand') < 0.5 else '-1'
+        genes.append((f'{scaffold}_{i + 1}', start, end, strand))
+    return genes
+
+def get_gene_annotation(pro):
+    KO, Pfam, VOG = '', '', ''
+    if get_fraction(pro, 'KO') < 0.3:
+        KO = kos[int(get_fraction(pro, 'KO_pick') * len(kos))]
+    if get_fraction(pro, 'Pfam') < 0.4:
+        Pfam = pfams[int(get_fraction(pro, 'Pfam_pick') * len(pfams))]
+    if get_fraction(pro, 'VOG') < 0.5:
+        if get_fraction(pro, 'integrase') < 0.05:
+            VOG = integrase_vogs[int(get_fraction(pro, 'VOG_pick') * len(integrase_vogs))]
+        else:
+            VOG = vogs[int(get_fraction(pro, 'VOG_pick') * len(vogs))]
+    return KO, Pfam, VOG
+
+def get_name(accession):
+    return f'hypothetical protein {accession}'
+
+def get_random_seq(rng, length):
+    return ''.join(rng.choices('ACGT', k = length))
+
+def write_metagenome(metagenome, contig_num, min_length, max_length, rng):
+    # Only a small pool of random blocks are made, contigs are sliced from them, so that 10M contigs can be written quickly
+    block_pool = [get_random_seq(rng, max_length) for i in range(64)]
+    f = open(metagenome, 'w')
+    for i in range(1, contig_num + 1):
+        length = rng.randint(min_length, max_length)
+        cov = round(rng.uniform(0.5, 50), 6)
+        seq = block_pool[i % len(block_pool)][:length]
+        f.write(f'>NODE_{i}_length_{length}_cov_{cov}\n')
+        for j in range(0, length, 80):
+            f.write(seq[j:j + 80] + '\n')
+    f.close()
+
+def write_reads(reads_dir, sample_num, read_pair_num, read_length, rng):
+    read_files = []
+    block = get_random_seq(rng, read_length * 4)
+    qual = 'I' * read_length
+    for i in range(1, sample_num + 1):
+        sample = f'Sample_{i:03d}'
+        for direction in ['1', '2']:
+            read_file = os.path.join(reads_dir, f'{sample}_{direction}.fastq')
+            f = open(read_file, 'w')
+            for j in range(read_pair_num):
+                start = (i + j) % (read_length * 3)
+                f.write(f'@{sample}.{j}/{direction}\n{block[start:start + read_length]}\n+\n{qual}\n')
+            f.close()
+            read_files.append(read_file)
+    return read_files
+
+def write_db_dir(db_dir):
+    # Step 1 VIBRANT db
+    vibrant_files_dir = os.path.join(db_dir, 'VIBRANT_db/files')
+    os.makedirs(vibrant_files_dir)
+    os.makedirs(os.path.join(db_dir, 'VIBRANT_db/databases'))
+
+    f = open(os.path.join(vibrant_files_dir, 'VIBRANT_AMGs.tsv'), 'w')
+    f.write('KO\n')
+    for ko in amg_kos:
+        f.write(ko + '\n')
+    f.close()
+
+    f = open(os.path.join(vibrant_files_dir, 'VIBRANT_names.tsv'), 'w')
+    f.write('Accession\tName\n')
+    for accession in kos + pfams + vogs + integrase_vogs:
+        f.write(f'{accession}\t{get_name(accession)}\n')
+    f.close()
+
+    f = open(os.path.join(vibrant_files_dir, 'VIBRANT_KEGG_pathways_summary.tsv'), 'w')
+    f.write('Entry\tMetabolism\tPathway\tKOs\n')
+    for i in range(0, len(kos), 20): # 20 KOs per pathway
+        map_id = f'map{i + 10:05d}'
+        metabolism = metabolisms[int(i / 20) % len(metabolisms)]
+        f.write(f'{map_id}\t{metabolism}\tPathway {map_id}\t' + '~'.join(kos[i:i + 20]) + '\n')
+    f.close()
+
+    # Step 2 Tax classification db
+    tax_classification_db = os.path.join(db_dir, 'Tax_classification_db')
+    os.mkdir(tax_classification_db)
+    f = open(os.path.join(tax_classification_db, 'IMGVR_high-quality_phage_vOTU_representatives_pro2viral_gn_map.csv'), 'w')
+    f.write('protein_id,contig_id,keywords\n')
+    for i in range(1, ref_viral_gn_num + 1):
+        for j in range(1, 4):
+            f.write(f'IMGVR_UViG_{i}_{j},IMGVR_UViG_{i},{virus_taxs[i % len(virus_taxs)]}\n')
+    f.close()
+
+    f = open(os.path.join(tax_classification_db, 'VOG_marker_table.txt'), 'w')
+    f.write('VOG\tTaxonomy\n')
+    for i in range(len(vogs[:50])):
+        f.write(f'{vogs[i]}\t{";".join(virus_taxs[i % len(virus_taxs)].split(";")[:6])}\n')
+    f.close()
+
+    # Step 3 Other dbs are only needed as dirs
+    for db in ['CheckV_db', 'iPHoP_db/iPHoP_db', 'VirSorter2_db', 'DVF_db']:
+        os.makedirs(os.path.join(db_dir, db))
+
+def make_synthetic_data(out_dir, contig_num, sample_num, read_pair_num, read_length, min_length, max_length, viral_fraction, seed):
+    rng = random.Random(seed)
+    os.makedirs(out_dir)
+
+    # Step 1 Metagenome
+    os.mkdir(os.path.join(out_dir, 'metagenome'))
+    metagenome = os.path.join(out_dir, 'metagenome', f'{metagenome_stem}.fasta')
+    write_metagenome(metagenome, contig_num, min_length, max_length, rng)
+
+    # Step 2 Reads
+    os.mkdir(os.path.join(out_dir, 'reads'))
+    read_files = write_reads(os.path.join(out_dir, 'reads'), sample_num, read_pair_num, read_length, rng)
+
+    # Step 3 db dir and an empty conda env dir (the stub "conda" does not need any env)
+    db_dir = os.path.join(out_dir, 'ViWrap_db')
+    write_db_dir(db_dir)
+    conda_env_dir = os.path.join(out_dir, 'conda_envs')
+    os.mkdir(conda_env_dir)
+
+    # Step 4 Write down the data description
+    synthetic_data = {'input_metagenome': metagenome,
+                      'input_reads': ','.join(read_files),
+                      'db_dir': db_dir,
+                      'conda_env_dir': conda_env_dir,
+                      'contig_num': contig_num,
+                      'sample_num': sample_num,
+                      'read_pair_num': read_pair_num,
+                      'min_length': min_length,
+                      'max_length': max_length,
+                      'viral_fraction': viral_fraction,
+                      'seed': seed}
+    with open(os.path.join(out_dir, synthetic_data_json), 'w') as f:
+        json.dump(synthetic_data, f, indent = 4)
+    f.close()
+
+    return synthetic_data
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Make a synthetic metagenome, metagenomic reads, and a minimal ViWrap db dir for benchmarking')
+    parser.add_argument('--out_dir', '-o', dest='out_dir', required=True, help=r'(required) output directory; it should not exist')
+    parser.add_argument('--contigs', dest='contigs', required=False, default=10000, type=int, help=r'number of metagenomic contigs, 10k to 10M (default = 10000)')
+    parser.add_argument('--samples', dest='samples', required=False, default=1, type=int, help=r'number of metagenomic samples (read pairs), 1 to 100 (default = 1)')
+    parser.add_argument('--read_pairs', dest='read_pairs', required=False, default=1000, type=int, help=r'number of read pairs per sample; reads are only counted, since mapping is stubbed (default = 1000)')
+    parser.add_argument('--read_length', dest='read_length', required=False, default=150, type=int, help=r'read length (default = 150)')
+    parser.add_argument('--min_length', dest='min_length', required=False, default=2000, type=int, help=r'minimal contig length (default = 2000)')
+    parser.add_argument('--max_length', dest='max_length', required=False, default=6000, type=int, help=r'maximal contig length (default = 6000)')
+    parser.add_argument('--viral_fraction', dest='viral_fraction', required=False, default=0.1, type=float, help=r'fraction of contigs that the stub tools call as viral (default = 0.1)')
+    parser.add_argument('--seed', dest='seed', required=False, default=1, type=int, help=r'random seed (default = 1)')
+    args = vars(parser.parse_args())
+
+    if os.path.exists(args['out_dir']):
+        sys.exit(f"The output dir of {args['out_dir']} already exists")
+
+    make_synthetic_data(os.path.abspath(args['out_dir']), args['contigs'], args['samples'], args['read_pairs'], args['read_length'], args['min_length'], args['max_length'], args['viral_fraction'], args['seed'])
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import argparse
+    import ast
+    import json
+    import time
+    import random
+    import shutil
+    import tracemalloc
+    import gzip
+    import textwrap
+    from statistics import median
+    warnings.filterwarnings("ignore")
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# Microbenchmarks of the hot parsing and writing helpers on generated fixtures of three size tiers;
+# record throughput (records/s and MB/s) and peak memory (by tracemalloc), and compare them with a baseline JSON
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(benchmark_dir)
+sys.path.insert(0, root_dir)
+sys.path.insert(0, os.path.join(root_dir, 'scripts')) # For the scripts that import "result_parser" directly
+sys.path.insert(0, benchmark_dir)
+
+from scripts import module, result_parser, downloadDB, tax_db
+from make_synthetic_data import get_fraction, write_db_dir, kos, amg_kos, virus_taxs, host_taxs
+
+tier2size = {'small': 1000, 'medium': 10000, 'large': 100000, 'xlarge': 1000000} # tier => number of records; xlarge is only run if it is picked by --tiers
+
+def load_script_functions(script):
+    # The wrapper scripts run their main code at import, so only load their imports and function definitions
+    with open(script, 'r') as f:
+        tree = ast.parse(f.read())
+    f.close()
+    tree.body = [node for node in tree.body if isinstance(node, (ast.Try, ast.Import, ast.ImportFrom, ast.FunctionDef))]
+    namespace = {'__name__': os.path.basename(script)}
+    exec(compile(tree, script, 'exec'), namespace)
+    return namespace
+
+def get_file_size(*files):
+    return sum(os.path.getsize(file) for file in files)
+
+def get_scaffold(i):
+    return f'NODE_{i}_length_{1000 + i % 5000}_cov_{round(1 + get_fraction(str(i), "cov") * 50, 6)}'
+
+def write_fasta_fixture(fasta, n, rng):
+    block = ''.join(rng.choices('ACGT', k = 2000))
+    f = open(fasta, 'w')
+    for i in range(1, n + 1):
+        # Half of the headers have a description, so that store_seq has to split them
+        f.write(f'>{get_scaffold(i)}' + (f' flag=1 multi={i % 7}\n' if i % 2 else '\n'))
+        seq = block[i % 1000:i % 1000 + 1000]
+        for j in range(0, len(seq), 80):
+            f.write(seq[j:j + 80] + '\n')
+    f.close()
+
+def make_store_seq_bench(fixture_dir, n, rng):
+    fasta = os.path.join(fixture_dir, 'input.fasta')
+    write_fasta_fixture(fasta, n, rng)
+    return {'run': lambda: module.store_seq(fasta), 'setup': None, 'records': n, 'bytes': get_file_size(fasta)}
+
+def make_write_down_seq_bench(fixture_dir, n, rng):
+    fasta = os.path.join(fixture_dir, 'input.fasta')
+    write_fasta_fixture(fasta, n, rng)
+    seq_dict = module.store_seq(fasta)
+    output = os.path.join(fixture_dir, 'output.fasta')
+    return {'run': lambda: module.write_down_seq(seq_dict, output), 'setup': None, 'records': n, 'bytes': get_file_size(fasta)}
+
+def make_write_down_seq_gzip_bench(fixture_dir, n, rng):
+    fasta = os.path.join(fixture_dir, 'input.fasta')
+    write_fasta_fixture(fasta, n, rng)
+    seq_dict = module.store_seq(fasta)
+    output = os.path.join(fixture_dir, 'output.fasta.gz')
+    return {'run': lambda: module.write_down_seq(seq_dict, output, compress = 'gzip'), 'setup': None, 'records': n, 'bytes': get_file_size(fasta)}
+
+def make_write_down_seqs_bench(fixture_dir, n, rng):
+    # Per-genome files of 10 records each, written in the batch mode
+    fasta = os.path.join(fixture_dir, 'input.fasta')
+    write_fasta_fixture(fasta, n, rng)
+    seq_dict = module.store_seq(fasta)
+    output_dir = os.path.join(fixture_dir, 'output')
+    os.mkdir(output_dir)
+    path_to_file2seq_dict = {}
+    for i, head in enumerate(seq_dict):
+        path_to_file = os.path.join(output_dir, f'gn_{i // 10}.fasta')
+        if path_to_file not in path_to_file2seq_dict:
+            path_to_file2seq_dict[path_to_file] = {}
+        path_to_file2seq_dict[path_to_file][head] = seq_dict[head]
+    def setup():
+        # Write into an empty dir in each run, as the pipeline does; replacing the files of the last run makes the time depend on their writeback
+        for path_to_file in path_to_file2seq_dict:
+            if os.path.exists(path_to_file):
+                os.remove(path_to_file)
+    return {'run': lambda: module.write_down_seqs(path_to_file2seq_dict), 'setup': setup, 'records': n, 'bytes': get_file_size(fasta)}
+
+def make_get_hmmsearch_result_bench(fixture_dir, n, rng):
+    # A hmmsearch tblout with two hits per protein
+    hmmsearch_result = os.path.join(fixture_dir, 'hmmsearch_result.tblout')
+    f = open(hmmsearch_result, 'w')
+    f.write('# target name        accession  query name           accession    E-value  score  bias   E-value  score  bias   exp reg clu  ov env dom rep inc description of target\n')
+    f.write('#------------------- ---------- -------------------- ---------- --------- ------ ----- --------- ------ -----   --- --- --- --- --- --- --- --- ---------------------\n')
+    for i in range(n):
+        pro = f'{get_scaffold(int(i / 2) + 1)}_{i % 2 + 1}'
+        score = round(rng.uniform(20, 500), 1)
+        f.write(f'{pro:<20} -          {kos[i % len(kos)]:<20} -            1.2e-30  {score}   0.1   2.3e-30  {score}   0.1   1.0   1   0   0   1   1   1   1 -\n')
+    f.write('#\n# Program:         hmmsearch\n# [ok]\n')
+    f.close()
+    return {'run': lambda: result_parser.get_hmmsearch_result(hmmsearch_result), 'setup': None, 'records': n, 'bytes': get_file_size(hmmsearch_result)}
+
+def make_find_best_hits_bench(fixture_dir, n, rng):
+    # A DIAMOND tabular output (outfmt 6) with five hits per protein, not ordered by bit score
+    find_best_hits = load_script_functions(os.path.join(root_dir, 'scripts/run_Tax_RefSeq.py'))['find_best_hits']
+    diamond_out = os.path.join(fixture_dir, 'diamond_out.txt')
+    f = open(diamond_out, 'w')
+    for i in range(n):
+        pro = f'{get_scaffold(int(i / 5) + 1)}_1'
+        f.write(f'{pro}\tYP_{rng.randint(1, 999999):09d}.1\t{round(rng.uniform(30, 100), 1)}\t300\t20\t1\t1\t300\t1\t300\t1.2e-50\t{round(rng.uniform(50, 600), 1)}\n')
+    f.close()
+    return {'run': lambda: find_best_hits(diamond_out), 'setup': None, 'records': n, 'bytes': get_file_size(diamond_out)}
+
+def write_gpff_fixture(gpff_file, n, rng):
+    # RefSeq viral protein records, with the rare cases of the ORGANISM block: wrapped organism names, a lineage of only "Viruses.",
+    # a "." place holder of no lineage, more than one accession, and repeated accessions
+    f = gzip.open(gpff_file, 'wt')
+    for i in range(1, n + 1):
+        acc = f'YP_{i - 7 if i % 19 == 4 and i > 7 else i:09d}'
+        virus_tax = virus_taxs[i % len(virus_taxs)].split(';')
+        organism = virus_tax[-1] + (f' strain vB_{i}_isolated_from_a_wastewater_treatment_plant_in_the_city_of_Madison' if i % 7 == 3 else '')
+        if i % 13 == 6:
+            lineage = '.'
+        elif i % 11 == 5:
+            lineage = 'Viruses.'
+        else:
+            lineage = 'Viruses; ' + '; '.join(rank for rank in virus_tax[:-1] if rank != 'NA') + '.'
+        seq = ''.join(rng.choices('ACDEFGHIKLMNPQRSTVWY', k = 100 + i % 200)).lower()
+
+        f.write(f'LOCUS       {acc:<24} {len(seq)} aa            linear   PHG 01-JAN-2020\n')
+        f.write(f'DEFINITION  hypothetical protein [{organism}].\n')
+        f.write(f'ACCESSION   {acc}' + (f' YP_{i + n:09d}\n' if i % 17 == 2 else '\n'))
+        f.write(f'VERSION     {acc}.1\nDBSOURCE    REFSEQ: accession NC_{i:06d}.1\nKEYWORDS    RefSeq.\n')
+        f.write(f'SOURCE      {organism}\n')
+        organism_lines = textwrap.wrap(organism, 68)
+        f.write(f'  ORGANISM  {organism_lines[0]}\n')
+        for line in organism_lines[1:] + textwrap.wrap(lineage, 68):
+            f.write(f'            {line}\n')
+        f.write('REFERENCE   1  (residues 1 to 100)\n  AUTHORS   Zhou,Z.\n  TITLE     Direct Submission\n  JOURNAL   Submitted (01-JAN-2020)\n')
+        f.write('FEATURES             Location/Qualifiers\n')
+        f.write(f'     source          1..{len(seq)}\n                     /organism="{organism}"\n                     /db_xref="taxon:{i}"\n')
+        f.write(f'     Protein         1..{len(seq)}\n                     /product="hypothetical protein"\n')
+        f.write('ORIGIN      \n')
+        for j in range(0, len(seq), 60):
+            f.write(f'{j + 1:>9} ' + ' '.join(seq[k:k + 10] for k in range(j, min(j + 60, len(seq)), 10)) + '\n')
+        f.write('//\n')
+    f.close()
+
+def check_scan_gpff(gpff_file, check_num = 10000):
+    # Check the first "check_num" records of scan_gpff against the accession, organism, and taxonomy parsed by Biopython
+    from Bio import SeqIO
+    scan_result = downloadDB.scan_gpff(gpff_file)
+    f = gzip.open(gpff_file, 'rt')
+    for i, gp_record in enumerate(SeqIO.parse(f, 'genbank')):
+        if i == check_num:
+            break
+        biopython_result = (gp_record.annotations['accessions'][0], ";".join(gp_record.annotations['taxonomy']) + ";" + gp_record.annotations['organism'])
+        if scan_result[i] != biopython_result:
+            sys.exit(f"scan_gpff does not match Biopython at record {i + 1}: {scan_result[i]} vs. {biopython_result}")
+    f.close()
+
+def make_scan_gpff_bench(fixture_dir, n, rng):
+    gpff_file = os.path.join(fixture_dir, 'viral.1.protein.gpff.gz')
+    write_gpff_fixture(gpff_file, n, rng)
+    check_scan_gpff(gpff_file)
+    return {'run': lambda: downloadDB.scan_gpff(gpff_file), 'setup': None, 'records': n, 'bytes': get_file_size(gpff_file)}
+
+def make_get_pro2tax_bench(fixture_dir, n, rng):
+    # A Tax classification db of n proteins compiled into the tax db; look up the taxonomy of n / 10 best hits
+    tax_classification_db_dir = os.path.join(fixture_dir, 'Tax_classification_db')
+    os.mkdir(tax_classification_db_dir)
+    pro2tax_file = os.path.join(tax_classification_db_dir, tax_db.tax_txt_name)
+    f = open(pro2tax_file, 'w')
+    for i in range(n):
+        f.write(f'YP_{i:09d}\t{virus_taxs[i % len(virus_taxs)]}{i % 50}\n')
+    f.close()
+    tax_db.write_tax_db(pro2tax_file, os.path.join(tax_classification_db_dir, tax_db.tax_db_name))
+    best_hits = [f'YP_{rng.randrange(n):09d}' for i in range(max(n // 10, 1))]
+    return {'run': lambda: tax_db.get_pro2tax(tax_classification_db_dir, best_hits), 'setup': None, 'records': len(best_hits), 'bytes': get_file_size(pro2tax_file)}
+
+def write_quality_summary(quality_summary, scaffolds):
+    f = open(quality_summary, 'w')
+    f.write('contig_id\tcontig_length\tprovirus\tproviral_length\tgene_count\tviral_genes\thost_genes\tcheckv_quality\tmiuvig_quality\tcompleteness\tcompleteness_method\tcontamination\tkmer_freq\twarnings\n')
+    for scaffold in scaffolds:
+        viral_genes = 0 if get_fraction(scaffold, 'viral_genes') < 0.2 else 3
+        host_genes = 1 if get_fraction(scaffold, 'host_genes') < 0.1 else 0
+        completeness = round(get_fraction(scaffold, 'completeness') * 100, 2)
+        f.write(f'{scaffold}\t25000\tNo\tNA\t25\t{viral_genes}\t{host_genes}\tMedium-quality\tGenome-fragment\t{completeness}\tAAI-based (medium-confidence)\t0.0\t1.0\t\n')
+    f.close()
+
+def make_parse_checkv_result_bench(fixture_dir, n, rng):
+    # 100 CheckV result dirs, as the CheckV results of 100 bins
+    checkv_outdir = os.path.join(fixture_dir, 'CheckV_result')
+    quality_summaries = []
+    for k in range(100):
+        os.makedirs(os.path.join(checkv_outdir, f'vRhyme_bin_{k + 1}'))
+        quality_summaries.append(os.path.join(checkv_outdir, f'vRhyme_bin_{k + 1}', 'quality_summary.tsv'))
+        write_quality_summary(quality_summaries[-1], [f'vRhyme_{k + 1}__{get_scaffold(i)}' for i in range(k + 1, n + 1, 100)])
+    output = os.path.join(fixture_dir, 'CheckV_quality_summary.txt')
+    return {'run': lambda: module.parse_checkv_result(checkv_outdir, output), 'setup': None, 'records': n, 'bytes': get_file_size(*quality_summaries)}
+
+def make_screen_virsorter2_result_bench(fixture_dir, n, rng):
+    virsorter_outdir = os.path.join(fixture_dir, 'VirSorter2_outdir')
+    os.makedirs(os.path.join(virsorter_outdir, 'pass2'))
+    os.makedirs(os.path.join(virsorter_outdir, 'CheckV_result_2nd'))
+    seqs = [f'{get_scaffold(i)}||full' for i in range(1, n + 1)]
+
+    final_viral_score = os.path.join(virsorter_outdir, 'pass2/final-viral-score.tsv')
+    f = open(final_viral_score, 'w')
+    f.write('seqname\tdsDNAphage\tssDNA\tmax_score\tmax_score_group\tlength\thallmark\tviral\tcellular\n')
+    for seq in seqs:
+        score = round(0.5 + get_fraction(seq, 'score') / 2, 3)
+        f.write(f'{seq}\t{score}\t0.0\t{score}\tdsDNAphage\t{rng.randint(5000, 20000)}\t{rng.randint(0, 3)}\t80.0\t5.0\n')
+    f.close()
+    quality_summary = os.path.join(virsorter_outdir, 'CheckV_result_2nd/quality_summary.tsv')
+    write_quality_summary(quality_summary, seqs)
+
+    list_files = [os.path.join(fixture_dir, f'{name}_list.txt') for name in ['keep1', 'keep2', 'discard', 'manual_check']]
+    return {'run': lambda: module.screen_virsorter2_result(virsorter_outdir, *list_files), 'setup': None, 'records': n, 'bytes': get_file_size(final_viral_score, quality_summary)}
+
+def make_get_virus_raw_abundance_bench(fixture_dir, n, rng):
+    # n scaffolds of 4 samples; genomes of 1 to 3 scaffolds
+    mapping_result_dir = os.path.join(fixture_dir, 'Mapping_result')
+    os.mkdir(mapping_result_dir)
+    samples = [f'Sample_{i:03d}' for i in range(1, 5)]
+    coverm_raw_result = os.path.join(mapping_result_dir, 'all_coverm_raw_result.txt')
+    f = open(coverm_raw_result, 'w')
+    f.write('contigName\tcontigLen\ttotalAvgDepth\t' + '\t'.join([f'{sample}.filtered.bam\t{sample}.filtered.bam-var' for sample in samples]) + '\n')
+    for i in range(1, n + 1):
+        depths = [round(rng.uniform(0, 50), 4) for sample in samples]
+        f.write(f'{get_scaffold(i)}\t25000\t{round(sum(depths) / len(depths), 4)}\t' + '\t'.join([f'{depth}\t{round(depth / 2, 4)}' for depth in depths]) + '\n')
+    f.close()
+
+    gn2info = {} # gn => {fasta, faa, ffn, scaffolds, size, pro_count}
+    i, gn_num = 1, 0
+    while i <= n:
+        gn_num += 1
+        scaffold_num = min(rng.randint(1, 3), n - i + 1)
+        gn2info[f'vRhyme_bin_{gn_num}'] = {'fasta': '', 'faa': '', 'ffn': '', 'size': 25000 * scaffold_num, 'pro_count': 25 * scaffold_num,
+                                          'scaffolds': [f'vRhyme_{gn_num}__{get_scaffold(j)}' for j in range(i, i + scaffold_num)]}
+        i += scaffold_num
+    genome_catalog = os.path.join(fixture_dir, 'genome_catalog.json')
+    with open(genome_catalog, 'w') as f:
+        json.dump(gn2info, f)
+    f.close()
+
+    output = os.path.join(fixture_dir, 'Virus_raw_abundance.txt')
+    return {'run': lambda: module.get_virus_raw_abundance(mapping_result_dir, genome_catalog, output), 'setup': None, 'records': n, 'bytes': get_file_size(coverm_raw_result, genome_catalog)}
+
+def make_generate_result_visualization_inputs_bench(fixture_dir, n, rng):
+    # Step 1 Make a ViWrap summary dir of n viruses
+    viwrap_summary_outdir = os.path.join(fixture_dir, 'ViWrap_summary_outdir')
+    os.mkdir(viwrap_summary_outdir)
+    viruses = [f'vRhyme_bin_{i}' for i in range(1, n + 1)]
+
+    f = open(os.path.join(viwrap_summary_outdir, 'Virus_summary_info.txt'), 'w')
+    f.write('\tgenome_size\tscaffold_num\tprotein_count\tAMG_KOs\tlytic_state\tcheckv_quality\tmiuvig_quality\tcompleteness\tcompleteness_method\n')
+    for virus in viruses:
+        AMG_KOs = ';'.join([f'{ko}({rng.randint(1, 2)})' for ko in rng.sample(amg_kos, rng.randint(1, 3))]) if get_fraction(virus, 'amg') < 0.3 else ''
+        f.write(f'{virus}\t25000\t{rng.randint(1, 3)}\t25\t{AMG_KOs}\tlytic_virus\tMedium-quality\tGenome-fragment\t75.0\tAAI-based (medium-confidence)\n')
+    f.close()
+
+    f = open(os.path.join(viwrap_summary_outdir, 'Virus_normalized_abundance.txt'), 'w')
+    f.write('\tSample_001\tMeanCov.Percent\n')
+    for virus in viruses:
+        f.write(f'{virus}\t{round(rng.uniform(0, 50), 4)}\t{100 / n}\n')
+    f.close()
+
+    f = open(os.path.join(viwrap_summary_outdir, 'Tax_classification_result.txt'), 'w')
+    for virus in viruses:
+        if get_fraction(virus, 'tax') < 0.5:
+            f.write(f'{virus}\t{virus_taxs[int(get_fraction(virus, "tax_pick") * len(virus_taxs))]}\n')
+    f.close()
+
+    f = open(os.path.join(viwrap_summary_outdir, 'Host_prediction_to_genus_m90.csv'), 'w')
+    f.write('Virus,AAI to closest RaFAH reference,Host genus,Confidence score,List of methods\n')
+    for virus in viruses:
+        if get_fraction(virus, 'host') < 0.5:
+            f.write(f'{virus},NA,{host_taxs[int(get_fraction(virus, "host_pick") * len(host_taxs))]},95.0,blast;CRISPR\n')
+    f.close()
+
+    for cluster_info, name in [('Species_cluster_info.txt', 'species_rep'), ('Genus_cluster_info.txt', 'genus')]:
+        f = open(os.path.join(viwrap_summary_outdir, cluster_info), 'w')
+        f.write(f'#{name},genomes\n')
+        for i in range(0, n, 4):
+            f.write(f'{viruses[i]},' + ';'.join(viruses[i:i + 4]) + '\n')
+        f.close()
+
+    # Step 2 Make a VIBRANT db dir
+    db_dir = os.path.join(fixture_dir, 'ViWrap_db')
+    write_db_dir(db_dir)
+    VIBRANT_db = os.path.join(db_dir, 'VIBRANT_db')
+    module.load_vibrant_metadata(VIBRANT_db) # Build the VIBRANT metadata cache in advance, as it is built at download time
+
+    viwrap_visualization_outdir = os.path.join(fixture_dir, 'ViWrap_visualization_outdir')
+    def setup():
+        if os.path.exists(viwrap_visualization_outdir):
+            shutil.rmtree(viwrap_visualization_outdir)
+    summary_files = [os.path.join(viwrap_summary_outdir, file_name) for file_name in os.listdir(viwrap_summary_outdir)]
+    return {'run': lambda: module.generate_result_visualization_inputs(viwrap_visualization_outdir, viwrap_summary_outdir, VIBRANT_db), 'setup': setup, 'records': n, 'bytes': get_file_size(*summary_files)}
+
+benchmarks = {'store_seq': make_store_seq_bench,
+              'write_down_seq': make_write_down_seq_bench,
+              'write_down_seq_gzip': make_write_down_seq_gzip_bench,
+              'write_down_seqs': make_write_down_seqs_bench,
+              'get_hmmsearch_result': make_get_hmmsearch_result_bench,
+              'find_best_hits': make_find_best_hits_bench,
+              'scan_gpff': make_scan_gpff_bench,
+              'get_pro2tax': make_get_pro2tax_bench,
+              'parse_checkv_result': make_parse_checkv_result_bench,
+              'screen_virsorter2_result': make_screen_virsorter2_result_bench,
+              'get_virus_raw_abundance': make_get_virus_raw_abundance_bench,
+              'generate_result_visualization_inputs': make_generate_result_visualization_inputs_bench} # name => fixture maker
+
+# Benchmarks bound by file writing; their wall time mostly depends on the disk and the page cache, not on the code,
+# so their throughput is compared by the CPU time of the process (user + system) instead of the wall time;
+# their fixtures are put in "--io_work_dir" (on tmpfs by default), since the kernel time of writing to a disk changes with its writeback
+io_bound_benchmarks = {'write_down_seq', 'write_down_seq_gzip', 'write_down_seqs'}
+
+tier2min_time = {'small': 2, 'medium': 3, 'large': 5, 'xlarge': 10} # tier => minimal total time (s) of the timed runs of each benchmark
+
+calibration_lines = [f'NODE_{i}\t{i * 3}\t{i % 7}\n' for i in range(50000)]
+
+def get_calibration_time():
+    # The wall time and the CPU time of a fixed parse-and-join workload (about 25 ms), as the machine speed
+    start, cpu_start = time.perf_counter(), time.process_time()
+    seq_dict = {}
+    for line in calibration_lines:
+        tmp = line.rstrip('\n').split('\t')
+        seq_dict[tmp[0]] = ''.join(tmp[1:])
+    return time.perf_counter() - start, time.process_time() - cpu_start
+
+def run_bench(bench, repeat, min_time, batch_time = 0.05):
+    # The benchmark is timed in batches of runs, each of at least "batch_time" seconds (fast benchmarks are run many times in a batch),
+    # until there are at least "repeat" batches and "min_time" seconds; the median time per run of all batches is used for throughput.
+    # Each batch is paired with a calibration run right before it, since the machine speed could change during a benchmark,
+    # and the median of the per-run times (wall and CPU) normalized by their calibration times is used to compare with the baseline.
+    # Peak memory is measured in a separate run, since tracemalloc slows down the run
+    if bench['setup']:
+        bench['setup']()
+    start = time.perf_counter()
+    bench['run']()
+    batch_size = max(int(batch_time / max(time.perf_counter() - start, 1e-6)), 1) # The number of runs in a batch
+
+    times, normalized_times, normalized_cpu_times, total_time = [], [], [], 0
+    while len(times) < repeat or (total_time < min_time and len(times) < 1000):
+        calibration_time, calibration_cpu_time = get_calibration_time()
+        elapsed, cpu_elapsed = 0, 0
+        for k in range(batch_size):
+            if bench['setup']:
+                bench['setup']()
+            start, cpu_start = time.perf_counter(), time.process_time()
+            bench['run']()
+            elapsed += time.perf_counter() - start
+            cpu_elapsed += time.process_time() - cpu_start
+        total_time += elapsed
+        times.append(elapsed / batch_size)
+        normalized_times.append(elapsed / batch_size / calibration_time)
+        normalized_cpu_times.append(cpu_elapsed / batch_size / max(calibration_cpu_time, 1e-6))
+    median_time = median(times)
+
+    if bench['setup']:
+        bench['setup']()
+    tracemalloc.start()
+    bench['run']()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'records': bench['records'], 'bytes': bench['bytes'], 'runs': len(times) * batch_size, 'time': median_time, 'normalized_time': median(normalized_times), 'normalized_cpu_time': median(normalized_cpu_times),
+            'records_per_s': bench['records'] / median_time, 'MB_per_s': bench['bytes'] / 1048576 / median_time, 'peak_memory_MB': peak_memory / 1048576}
+
+def compare_with_baseline(results, baseline, threshold):
+    # A regression is a throughput drop (by the normalized median time) or a peak memory increase of more than the threshold in any tier;
+    # the throughput of the I/O-bound benchmarks is compared by their normalized median CPU time
+    regressions = []
+    for name in results:
+        for tier in results[name]:
+            if name not in baseline or tier not in baseline[name]:
+                continue
+            result, base = results[name][tier], baseline[name][tier]
+            time_key = 'normalized_cpu_time' if name in io_bound_benchmarks else 'normalized_time'
+            throughput_ratio = base[time_key] / result[time_key] # < 1 if the throughput drops
+            if throughput_ratio < 1 - threshold:
+                regressions.append(f"{name} ({tier}): the throughput drops by {round((1 - throughput_ratio) * 100)}% from the baseline (normalized by the machine speed{', by CPU time' if name in io_bound_benchmarks else ''})")
+            if result['peak_memory_MB'] > base['peak_memory_MB'] * (1 + threshold) and result['peak_memory_MB'] - base['peak_memory_MB'] > 1:
+                regressions.append(f"{name} ({tier}): {round(result['peak_memory_MB'], 1)} MB peak memory vs. {round(base['peak_memory_MB'], 1)} MB in the baseline")
+    return regressions
+
+default_io_work_dir = '/dev/shm/ViWrap_microbench_io_workdir' if os.path.isdir('/dev/shm') else './ViWrap_microbench_io_workdir'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Microbenchmarks of the hot parsing and writing helpers, with a regression gate against a baseline')
+    parser.add_argument('--work_dir', dest='work_dir', required=False, default='./ViWrap_microbench_workdir', help=r'dir for the generated fixtures; it should not exist, and will be removed in the end (default = ./ViWrap_microbench_workdir)')
+    parser.add_argument('--io_work_dir', dest='io_work_dir', required=False, default=default_io_work_dir, help=r'dir for the generated fixtures of the I/O-bound benchmarks (' + ', '.join(sorted(io_bound_benchmarks)) + r'); it should not exist, and will be removed in the end (default = ' + default_io_work_dir + r')')
+    parser.add_argument('--bench', dest='bench', required=False, default='all', help=r'comma-separated benchmarks to run (default = all): ' + ', '.join(benchmarks))
+    parser.add_argument('--tiers', dest='tiers', required=False, default='small,medium,large', help=r'comma-separated size tiers to run: small (1k records), medium (10k records), large (100k records), and xlarge (1M records) (default = small,medium,large)')
+    parser.add_argument('--repeat', dest='repeat', required=False, default=5, type=int, help=r'minimal number of timed runs of each benchmark; each benchmark is also run for at least 2 s (small), 3 s (medium), 5 s (large), or 10 s (xlarge), and the median run is reported (default = 5)')
+    parser.add_argument('--seed', dest='seed', required=False, default=1, type=int, help=r'random seed of the fixtures (default = 1)')
+    parser.add_argument('--json_output', dest='json_output', required=False, default='', help=r'write down the results to this JSON file; it can be used as the baseline of a later run')
+    parser.add_argument('--baseline', dest='baseline', required=False, default='', help=r'baseline JSON file made by --json_output; exit with 1 if any tier regresses by more than the threshold')
+    parser.add_argument('--threshold', dest='threshold', required=False, default=0.25, type=float, help=r'allowed throughput drop and peak memory increase compared with the baseline (default = 0.25)')
+    args = vars(parser.parse_args())
+
+    names = list(benchmarks) if args['bench'] == 'all' else args['bench'].split(',')
+    tiers = args['tiers'].split(',')
+    for name in names:
+        if name not in benchmarks:
+            sys.exit(f"Unknown benchmark: {name}")
+    for tier in tiers:
+        if tier not in tier2size:
+            sys.exit(f"Unknown tier: {tier}")
+    work_dir, io_work_dir = os.path.abspath(args['work_dir']), os.path.abspath(args['io_work_dir'])
+    for each_work_dir in [work_dir, io_work_dir]:
+        if os.path.exists(each_work_dir):
+            sys.exit(f"The work dir of {each_work_dir} already exists")
+    if 'tmp' in work_dir: # parse_checkv_result skips any dir with "tmp" in its path
+        sys.exit(f"The work dir of {work_dir} should not have 'tmp' in its path")
+
+    # Step 1 Run the benchmarks
+    results = {} # name => tier => result
+    print(f"{'benchmark':<40}{'tier':>8}{'records':>10}{'time (s)':>11}{'records/s':>13}{'MB/s':>9}{'peak memory (MB)':>19}")
+    try:
+        for name in names:
+            results[name] = {}
+            for tier in tiers:
+                fixture_dir = os.path.join(io_work_dir if name in io_bound_benchmarks else work_dir, name, tier)
+                os.makedirs(fixture_dir)
+                bench = benchmarks[name](fixture_dir, tier2size[tier], random.Random(args['seed']))
+                result = run_bench(bench, args['repeat'], tier2min_time[tier])
+                results[name][tier] = result
+                print(f"{name:<40}{tier:>8}{result['records']:>10}{result['time']:>11.4f}{result['records_per_s']:>13.0f}{result['MB_per_s']:>9.1f}{result['peak_memory_MB']:>19.1f}")
+                shutil.rmtree(fixture_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors = True)
+        shutil.rmtree(io_work_dir, ignore_errors = True)
+
+    if args['json_output']:
+        with open(args['json_output'], 'w') as f:
+            json.dump(results, f, indent = 4)
+        f.close()
+
+    # Step 2 Compare with the baseline
+    if args['baseline']:
+        with open(args['baseline'], 'r') as f:
+            baseline = json.load(f)
+        f.close()
+        regressions = compare_with_baseline(results, baseline, args['threshold'])
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) of more than {int(args['threshold'] * 100)}% against {args['baseline']}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regression of more than {int(args['threshold'] * 100)}% against {args['baseline']}")
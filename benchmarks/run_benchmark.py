@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import argparse
+    import json
+    import time
+    import math
+    import functools
+    import inspect
+    import traceback
+    from pathlib import Path
+    warnings.filterwarnings("ignore")
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# Time every "scripts/module.py" function and the end-to-end ViWrap run on synthetic data made by "make_synthetic_data.py";
+# all external tools are replaced by the stubs in "stub_tools.py" (through the stub "conda" in "stub_bin/"),
+# so the timing shows the Python overhead of ViWrap itself
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(benchmark_dir)
+sys.path.insert(0, root_dir)
+sys.path.insert(0, benchmark_dir)
+
+timings = {} # name => {calls, total, self, max}
+call_stack = [] # [[name, child_time]]; the running timed calls
+
+def add_timing(name, elapsed, self_elapsed):
+    if name not in timings:
+        timings[name] = {'calls': 0, 'total': 0.0, 'self': 0.0, 'max': 0.0}
+    timings[name]['calls'] += 1
+    timings[name]['total'] += elapsed
+    timings[name]['self'] += self_elapsed
+    timings[name]['max'] = max(timings[name]['max'], elapsed)
+
+def run_timed(name, func, *args, **kwargs):
+    # The time of nested timed calls is subtracted from the self time of the caller
+    call_stack.append([name, 0.0])
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        child_time = call_stack.pop()[1]
+        add_timing(name, elapsed, elapsed - child_time)
+        if call_stack:
+            call_stack[-1][1] += elapsed
+
+def get_timed_func(name, func):
+    @functools.wraps(func)
+    def timed_func(*args, **kwargs):
+        return run_timed(name, func, *args, **kwargs)
+    return timed_func
+
+def get_command_name(cmd):
+    items = cmd.split()
+    if items[:2] == ['conda', 'run']:
+        if 'python' in items and items.index('python') + 1 < len(items):
+            return 'tool: ' + Path(items[items.index('python') + 1]).name
+        return 'tool: ' + (items[4] if len(items) > 4 else 'conda')
+    if items and items[0] == 'python' and len(items) > 1:
+        return 'shell: python ' + Path(items[1]).name
+    return 'shell: ' + (items[0] if items else '')
+
+def patch_module_and_os_system(module):
+    # Functions are looked up from the module namespace at call time, so nested calls within module.py are also timed
+    for name, obj in list(vars(module).items()):
+        if inspect.isfunction(obj) and obj.__module__ == module.__name__:
+            setattr(module, name, get_timed_func(name, obj))
+
+    os_system = os.system
+    def timed_os_system(cmd):
+        return run_timed(get_command_name(cmd), os_system, cmd)
+    os.system = timed_os_system
+
+def get_summary(wall_time):
+    summary = {'wall_time': wall_time, 'external_tools': 0.0, 'shell_commands': 0.0, 'module_functions_self': 0.0}
+    for name in timings:
+        if name.startswith('tool: '):
+            summary['external_tools'] += timings[name]['self']
+        elif name.startswith('shell: '):
+            summary['shell_commands'] += timings[name]['self']
+        else:
+            summary['module_functions_self'] += timings[name]['self']
+    summary['other_orchestration'] = wall_time - summary['external_tools'] - summary['shell_commands'] - summary['module_functions_self']
+    summary['viwrap_python_overhead'] = wall_time - summary['external_tools']
+    return summary
+
+def print_timings(summary, top):
+    print(f"\n{'function / command':<55}{'calls':>8}{'total (s)':>12}{'self (s)':>12}{'max (s)':>12}")
+    for name in sorted(timings, key = lambda x: timings[x]['self'], reverse = True)[:top]:
+        timing = timings[name]
+        print(f"{name:<55}{timing['calls']:>8}{timing['total']:>12.3f}{timing['self']:>12.3f}{timing['max']:>12.3f}")
+    print('')
+    for item in ['wall_time', 'external_tools', 'shell_commands', 'module_functions_self', 'other_orchestration', 'viwrap_python_overhead']:
+        print(f"{item.replace('_', ' '):<55}{summary[item]:>12.3f} s")
+
+def run_benchmark(args):
+    # Step 1 Load the synthetic data description
+    with open(os.path.join(args['data_dir'], 'synthetic_data.json'), 'r') as f:
+        synthetic_data = json.load(f)
+    f.close()
+
+    out_dir = os.path.abspath(args['out_dir'])
+    if os.path.exists(out_dir):
+        sys.exit(f"The output dir of {out_dir} already exists")
+    if 'tmp' in out_dir: # ViWrap skips any CheckV result dir with "tmp" in its path
+        sys.exit(f"The output dir of {out_dir} should not have 'tmp' in its path")
+
+    # Step 2 Put the stub "conda" at the front of PATH
+    os.environ['PATH'] = os.path.join(benchmark_dir, 'stub_bin') + os.pathsep + os.environ.get('PATH', '')
+    os.environ['VIWRAP_BENCH_VIRAL_FRACTION'] = str(synthetic_data['viral_fraction'])
+
+    # Step 3 Patch module.py and os.system, and make the ViWrap arguments by the ViWrap parser itself
+    import scripts
+    from scripts import module, master_run, master_run_wo_reads
+    patch_module_and_os_system(module)
+
+    master = master_run if args['task'] == 'run' else master_run_wo_reads
+    parser = argparse.ArgumentParser()
+    master.fetch_arguments(parser, root_dir, synthetic_data['db_dir'])
+    viwrap_argv = ['--input_metagenome', synthetic_data['input_metagenome'], '--out_dir', out_dir, '--db_dir', synthetic_data['db_dir'],
+                   '--conda_env_dir', synthetic_data['conda_env_dir'], '--identify_method', args['identify_method'], '--threads', str(args['threads'])]
+    if args['task'] == 'run':
+        viwrap_argv += ['--input_reads', synthetic_data['input_reads']]
+    if args['max_memory'] > 0:
+        viwrap_argv += ['--max_memory', str(args['max_memory'])]
+    if args['bgzip_intermediates']:
+        viwrap_argv += ['--bgzip_intermediates']
+    viwrap_args = vars(parser.parse_args(viwrap_argv))
+
+    # Step 4 Run ViWrap end to end
+    status = 'finished'
+    start = time.perf_counter()
+    try:
+        run_timed(f"{args['task']} (end to end)", master.main, viwrap_args)
+    except SystemExit as e:
+        status = f'exited: {e}'
+    except Exception as e:
+        traceback.print_exc()
+        status = f'failed: {type(e).__name__}: {e}'
+    wall_time = time.perf_counter() - start
+    del timings[f"{args['task']} (end to end)"]
+
+    # Step 5 Report
+    summary = get_summary(wall_time)
+    print_timings(summary, args['top'])
+    print(f"\nViWrap {args['task']} ({args['identify_method']}) on {synthetic_data['contig_num']} contigs and {synthetic_data['sample_num']} samples: {status}")
+
+    if args['json_output']:
+        result = {'task': args['task'], 'identify_method': args['identify_method'], 'threads': args['threads'], 'status': status,
+                  'synthetic_data': synthetic_data, 'summary': summary, 'timings': timings}
+        with open(args['json_output'], 'w') as f:
+            json.dump(result, f, indent = 4)
+        f.close()
+
+    if status != 'finished':
+        sys.exit(1)
+
+def compare_benchmarks(json_files):
+    # Estimate how each function scales with the contig number: time ~ n^k, k = log(t2 / t1) / log(n2 / n1)
+    results = []
+    for json_file in json_files:
+        with open(json_file, 'r') as f:
+            results.append(json.load(f))
+        f.close()
+    small, large = sorted(results, key = lambda x: x['synthetic_data']['contig_num'])
+    n_ratio = large['synthetic_data']['contig_num'] / small['synthetic_data']['contig_num']
+    if n_ratio <= 1:
+        sys.exit("The two benchmarks should be run on different numbers of contigs")
+
+    print(f"\n{'function / command':<55}{'self (s) small':>16}{'self (s) large':>16}{'exponent':>10}")
+    rows = []
+    for name in large['timings']:
+        if name in small['timings']:
+            t1, t2 = small['timings'][name]['self'], large['timings'][name]['self']
+            exponent = math.log(t2 / t1) / math.log(n_ratio) if t1 > 0.001 and t2 > 0.001 else float('nan')
+            rows.append([name, t1, t2, exponent])
+    for name, t1, t2, exponent in sorted(rows, key = lambda x: x[2], reverse = True):
+        flag = '  <= superlinear' if exponent > 1.5 else ''
+        print(f"{name:<55}{t1:>16.3f}{t2:>16.3f}{exponent:>10.2f}{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Time every module.py function and the end-to-end ViWrap run on synthetic data with stub tools')
+    parser.add_argument('--data_dir', dest='data_dir', required=False, default='none', help=r'synthetic data dir made by make_synthetic_data.py')
+    parser.add_argument('--out_dir', '-o', dest='out_dir', required=False, default='./ViWrap_benchmark_outdir', help=r'ViWrap output dir; it should not exist (default = ./ViWrap_benchmark_outdir)')
+    parser.add_argument('--task', dest='task', required=False, default='run', help=r'the ViWrap task to benchmark: run or run_wo_reads (default = run)')
+    parser.add_argument('--identify_method', dest='identify_method', required=False, default='vb-vs', help=r'the virus identifying method: vb, vs, dvf, vb-vs, or vb-vs-dvf (default = vb-vs)')
+    parser.add_argument('--threads', '-t', dest='threads', required=False, default=4, type=int, help=r'number of threads (default = 4)')
+    parser.add_argument('--max_memory', dest='max_memory', required=False, default=0, type=float, help=r'pass a memory budget (in GB) to ViWrap, to check its memory warnings and peak memory report (default = 0, no budget)')
+    parser.add_argument('--bgzip_intermediates', dest='bgzip_intermediates', action='store_true', required=False, default=False, help=r'pass --bgzip_intermediates to ViWrap')
+    parser.add_argument('--top', dest='top', required=False, default=40, type=int, help=r'number of the slowest functions and commands to show (default = 40)')
+    parser.add_argument('--json_output', dest='json_output', required=False, default='', help=r'write down all timings to this JSON file')
+    parser.add_argument('--compare', dest='compare', nargs=2, required=False, default=None, help=r'compare two JSON outputs made on different numbers of contigs, and estimate the scaling exponent of each function')
+    args = vars(parser.parse_args())
+
+    if args['compare']:
+        compare_benchmarks(args['compare'])
+    else:
+        if args['data_dir'] == 'none' or not os.path.exists(os.path.join(args['data_dir'], 'synthetic_data.json')):
+            sys.exit("Please provide a synthetic data dir made by make_synthetic_data.py by --data_dir")
+        if args['task'] != 'run' and args['task'] != 'run_wo_reads':
+            sys.exit("The task should be one of these: run and run_wo_reads")
+        run_benchmark(args)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import re
+    import argparse
+    import threading
+    from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+    warnings.filterwarnings("ignore")
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# A local HTTP stand-in for the db servers (NCBI, VOG, iPHoP, and GTDB), to test the db downloader without network access.
+# It serves a dir with Range requests, and "--fail_after" drops the first response of each file after some bytes,
+# so that the resume of an interrupted download can be tested. Point ViWrap to it by "--db_url_config", e.g.,
+# {"iPHoP.latest.tar.gz": {"url": "http://127.0.0.1:8000/iPHoP.latest.tar.gz", "checksum": "md5:..."}}
+
+server_state = {'fail_after': 0, 'failed_files': set(), 'lock': threading.Lock()}
+
+class StubDBRequestHandler(SimpleHTTPRequestHandler):
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return None
+        file_size = os.path.getsize(path)
+
+        ## Parse the Range header; only a single "bytes=start-" or "bytes=start-end" range is supported
+        start, end = 0, file_size - 1
+        range_header = self.headers.get('Range')
+        if range_header:
+            range_match = re.match(r'bytes=(\d+)-(\d*)$', range_header.strip())
+            if not range_match or int(range_match.group(1)) >= file_size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{file_size}')
+                self.end_headers()
+                return None
+            start = int(range_match.group(1))
+            if range_match.group(2):
+                end = min(int(range_match.group(2)), file_size - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{file_size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        f = open(path, 'rb')
+        f.seek(start)
+        self.range_length = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        # Send the requested range; drop the connection after "fail_after" bytes for the first response of each file
+        remaining = self.range_length
+        fail_after = 0
+        with server_state['lock']:
+            if server_state['fail_after'] > 0 and self.path not in server_state['failed_files']:
+                server_state['failed_files'].add(self.path)
+                fail_after = server_state['fail_after']
+        sent = 0
+        while remaining > 0:
+            chunk = source.read(min(65536, remaining))
+            if not chunk:
+                break
+            if fail_after and sent + len(chunk) > fail_after:
+                outputfile.write(chunk[:fail_after - sent])
+                outputfile.flush()
+                self.close_connection = True
+                return
+            outputfile.write(chunk)
+            sent += len(chunk)
+            remaining -= len(chunk)
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"stub_db_server | {self.address_string()} | {format % args}\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve a dir as a stand-in for the db servers, with Range requests and optional dropped responses')
+    parser.add_argument('--dir', '-d', dest='dir', required=True, help='the dir to serve, e.g., a dir with small "iPHoP.latest.tar.gz" and "viral.1.protein.faa.gz" files')
+    parser.add_argument('--port', '-p', dest='port', required=False, default=8000, type=int, help='port to listen on (default = 8000)')
+    parser.add_argument('--fail_after', dest='fail_after', required=False, default=0, type=int, help='drop the first response of each file after this number of bytes; 0 means never (default = 0)')
+    args = parser.parse_args()
+
+    server_state['fail_after'] = args.fail_after
+    serve_dir = os.path.abspath(args.dir)
+    os.chdir(serve_dir)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubDBRequestHandler)
+    sys.stderr.write(f"stub_db_server | serving {serve_dir} at http://127.0.0.1:{args.port}\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
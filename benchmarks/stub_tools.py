@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import json
+    from pathlib import Path
+    from glob import glob
+    from make_synthetic_data import (get_fraction, get_base_scaffold, is_viral_scaffold, get_genes, get_gene_annotation, get_name,
+                                     amg_kos, virus_taxs, host_taxs)
+    warnings.filterwarnings("ignore")
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# Stubs of the ViWrap wrapper scripts (scripts/run_*.py) that run external tools; each stub takes the same arguments
+# as the wrapper script and writes the same output layout that the tool would make, but instantly.
+# Calls are made from stable pseudo-random numbers of the contig names, so that all stubs agree with each other
+
+def iter_fasta(input_seq_file):
+    head, seq_lines = '', []
+    with open(input_seq_file, 'r') as lines:
+        for line in lines:
+            line = line.rstrip('\n')
+            if line.startswith('>'):
+                if head:
+                    yield head, ''.join(seq_lines)
+                head, seq_lines = line[1:].split(None, 1)[0], []
+            else:
+                seq_lines.append(line)
+    lines.close()
+    if head:
+        yield head, ''.join(seq_lines)
+
+def write_fasta_record(f, header, seq):
+    f.write(f'>{header}\n{seq}\n')
+
+def get_pro_seq(pro, length):
+    return 'M' + 'ACDEFGHIKLMNPQRSTVWY'[int(get_fraction(pro, 'aa') * 20)] * (int(length / 3) - 1)
+
+def write_genes(scaffold2length, faa_file, ffn_file, vibrant_style):
+    # VIBRANT faa/ffn headers carry tab-separated annotations, while Prodigal-called proteins only have IDs
+    faa = open(faa_file, 'w')
+    ffn = open(ffn_file, 'w')
+    for scaffold, length in scaffold2length.items():
+        for pro, start, end, strand in get_genes(scaffold, length):
+            header = pro
+            if vibrant_style:
+                KO, Pfam, VOG = get_gene_annotation(pro)
+                accession = KO or Pfam or VOG or 'hypothetical'
+                header = f'{pro}\t({start}..{end})\t{strand}\t{accession}\t{get_name(accession)}'
+            write_fasta_record(faa, header, get_pro_seq(pro, end - start + 1))
+            write_fasta_record(ffn, header, 'ATG' * int((end - start + 1) / 3))
+    faa.close()
+    ffn.close()
+
+def get_annotation_items(pro, scaffold, header_type):
+    KO, Pfam, VOG = get_gene_annotation(pro)
+    AMG = 'AMG' if KO in amg_kos else ''
+    KO_items = [KO, AMG, get_name(KO), '1.2e-30', '105.3'] if KO else ['', '', '', '', '']
+    Pfam_items = [Pfam, get_name(Pfam), '3.4e-20', '75.1'] if Pfam else ['', '', '', '']
+    VOG_items = [VOG, get_name(VOG), '5.6e-40', '140.2'] if VOG else ['', '', '', '']
+    if header_type == 'VIBRANT': # VIBRANT annotations also have a v-score column for each db
+        KO_items.append('1.0' if KO else '')
+        Pfam_items.append('0.5' if Pfam else '')
+        VOG_items.append('2.0' if VOG else '')
+    return [pro, scaffold] + KO_items + Pfam_items + VOG_items
+
+def run_VIBRANT(argv):
+    metagenomic_scaffold, viwrap_outdir, input_length_limit = argv[0], argv[1], int(argv[4])
+    stem = Path(metagenomic_scaffold).stem
+    vibrant_outdir = os.path.join(viwrap_outdir, f'VIBRANT_{stem}')
+    phages_dir = os.path.join(vibrant_outdir, f'VIBRANT_phages_{stem}')
+    results_dir = os.path.join(vibrant_outdir, f'VIBRANT_results_{stem}')
+    os.makedirs(phages_dir)
+    os.makedirs(results_dir)
+
+    # Step 1 Call viruses; about 10% of them are integrated prophages, and about 20% of them are lysogenic
+    phage2length = {} # phage => length
+    combined = open(os.path.join(phages_dir, f'{stem}.phages_combined.fna'), 'w')
+    lytic = open(os.path.join(phages_dir, f'{stem}.phages_lytic.fna'), 'w')
+    lysogenic = open(os.path.join(phages_dir, f'{stem}.phages_lysogenic.fna'), 'w')
+    for header, seq in iter_fasta(metagenomic_scaffold):
+        base = get_base_scaffold(header)
+        if len(seq) < input_length_limit or not is_viral_scaffold(header) or get_fraction(base, 'vb') >= 0.9:
+            continue
+        if get_fraction(base, 'prophage') < 0.1 and len(seq) >= 2 * input_length_limit:
+            phage, seq = f'{header}_fragment_1', seq[:int(len(seq) / 2)]
+            write_fasta_record(lysogenic, phage, seq)
+        elif get_fraction(base, 'lysogenic') < 0.2:
+            phage = header
+            write_fasta_record(lysogenic, phage, seq)
+        else:
+            phage = header
+            write_fasta_record(lytic, phage, seq)
+        write_fasta_record(combined, phage, seq)
+        phage2length[phage] = len(seq)
+    combined.close()
+    lytic.close()
+    lysogenic.close()
+
+    # Step 2 Write down proteins, genes, and annotations
+    write_genes(phage2length, os.path.join(phages_dir, f'{stem}.phages_combined.faa'), os.path.join(phages_dir, f'{stem}.phages_combined.ffn'), True)
+
+    annotation = open(os.path.join(results_dir, f'VIBRANT_annotations_{stem}.tsv'), 'w')
+    annotation.write('protein\tscaffold\tKO\tAMG\tKO name\tKO evalue\tKO score\tKO v-score\tPfam\tPfam name\tPfam evalue\tPfam score\tPfam v-score\tVOG\tVOG name\tVOG evalue\tVOG score\tVOG v-score\n')
+    amg_individuals = open(os.path.join(results_dir, f'VIBRANT_AMG_individuals_{stem}.tsv'), 'w')
+    amg_individuals.write('protein\tscaffold\tAMG KO\tAMG KO name\tPfam\tPfam name\n')
+    for phage, length in phage2length.items():
+        for pro, start, end, strand in get_genes(phage, length):
+            items = get_annotation_items(pro, phage, 'VIBRANT')
+            annotation.write('\t'.join(items) + '\n')
+            if items[3] == 'AMG':
+                amg_individuals.write(f'{pro}\t{phage}\t{items[2]}\t{items[4]}\t{items[8]}\t{items[9]}\n')
+    annotation.close()
+    amg_individuals.close()
+
+def run_VirSorter2_1st(argv):
+    metagenomic_scaffold, virsorter_outdir, input_length_limit = argv[0], argv[1], int(argv[3])
+    os.makedirs(os.path.join(virsorter_outdir, 'pass1'))
+    f = open(os.path.join(virsorter_outdir, 'pass1/final-viral-combined.fa'), 'w')
+    for header, seq in iter_fasta(metagenomic_scaffold):
+        if len(seq) >= input_length_limit and is_viral_scaffold(header) and get_fraction(header, 'vs2') < 0.9:
+            write_fasta_record(f, f'{header}||full', seq)
+    f.close()
+
+def run_VirSorter2_CheckV_1st(argv):
+    virsorter_outdir = argv[0]
+    checkv_outdir = os.path.join(virsorter_outdir, 'CheckV_result_1st')
+    os.mkdir(checkv_outdir)
+    open(os.path.join(checkv_outdir, 'proviruses.fna'), 'w').close()
+    viruses = open(os.path.join(checkv_outdir, 'viruses.fna'), 'w')
+    combined = open(os.path.join(checkv_outdir, 'combined.fna'), 'w')
+    for header, seq in iter_fasta(os.path.join(virsorter_outdir, 'pass1/final-viral-combined.fa')):
+        write_fasta_record(viruses, header, seq)
+        write_fasta_record(combined, header, seq)
+    viruses.close()
+    combined.close()
+
+def run_VirSorter2_2nd(argv):
+    virsorter_outdir, input_length_limit = argv[0], int(argv[2])
+    os.mkdir(os.path.join(virsorter_outdir, 'pass2'))
+    f = open(os.path.join(virsorter_outdir, 'pass2/final-viral-combined.fa'), 'w')
+    score = open(os.path.join(virsorter_outdir, 'pass2/final-viral-score.tsv'), 'w')
+    score.write('seqname\tdsDNAphage\tssDNA\tmax_score\tmax_score_group\tlength\thallmark\tviral\tcellular\n')
+    for header, seq in iter_fasta(os.path.join(virsorter_outdir, 'CheckV_result_1st/combined.fna')):
+        if len(seq) >= input_length_limit:
+            write_fasta_record(f, header, seq)
+            max_score = round(0.5 + get_fraction(header, 'vs2_score') / 2, 3)
+            hallmark = int(get_fraction(header, 'hallmark') * 4)
+            score.write(f'{header}\t{max_score}\t0.0\t{max_score}\tdsDNAphage\t{len(seq)}\t{hallmark}\t80.0\t5.0\n')
+    f.close()
+    score.close()
+
+def write_checkv_quality_summary(quality_summary, records, checkv_quality_func):
+    f = open(quality_summary, 'w')
+    f.write('contig_id\tcontig_length\tprovirus\tproviral_length\tgene_count\tviral_genes\thost_genes\tcheckv_quality\tmiuvig_quality\tcompleteness\tcompleteness_method\tcontamination\tkmer_freq\twarnings\n')
+    for header, length in records:
+        gene_count = max(int(length / 1000), 1)
+        viral_genes, host_genes = checkv_quality_func(header, gene_count)
+        completeness = round(get_fraction(header, 'completeness') * 100, 2)
+        checkv_quality = 'Complete' if completeness > 98 else ('High-quality' if completeness > 90 else ('Medium-quality' if completeness > 50 else 'Low-quality'))
+        miuvig_quality = 'High-quality' if completeness > 90 else 'Genome-fragment'
+        f.write(f'{header}\t{length}\tNo\tNA\t{gene_count}\t{viral_genes}\t{host_genes}\t{checkv_quality}\t{miuvig_quality}\t{completeness}\tAAI-based (medium-confidence)\t0.0\t1.0\t\n')
+    f.close()
+
+def run_VirSorter2_CheckV_2nd(argv):
+    virsorter_outdir = argv[0]
+    os.mkdir(os.path.join(virsorter_outdir, 'CheckV_result_2nd'))
+
+    def get_gene_num(header, gene_count):
+        # About 80% of them will be in "keep1", 10% in "keep2", 5% in "manual_check" (if long enough), and 5% in "discard"
+        fraction = get_fraction(header, 'vs2_checkv')
+        if fraction < 0.8:
+            return max(int(gene_count / 2), 1), 0
+        elif fraction < 0.9:
+            return 0, 0
+        elif fraction < 0.95:
+            return 0, 1
+        return 0, 2
+
+    records = [(header, len(seq)) for header, seq in iter_fasta(os.path.join(virsorter_outdir, 'pass2/final-viral-combined.fa'))]
+    write_checkv_quality_summary(os.path.join(virsorter_outdir, 'CheckV_result_2nd/quality_summary.tsv'), records, get_gene_num)
+
+def run_DVF(argv):
+    metagenomic_scaffold, dvf_outdir, input_length_limit = argv[0], argv[1], int(argv[2])
+    os.makedirs(dvf_outdir, exist_ok = True)
+    f = open(os.path.join(dvf_outdir, f'{Path(metagenomic_scaffold).name}_gt{input_length_limit}bp_dvfpred.txt'), 'w')
+    f.write('name\tlen\tscore\tpvalue\n')
+    for header, seq in iter_fasta(metagenomic_scaffold):
+        if len(seq) >= input_length_limit:
+            if is_viral_scaffold(header) and get_fraction(header, 'dvf') < 0.9:
+                f.write(f'{header}\t{len(seq)}\t0.98\t0.01\n')
+            else:
+                f.write(f'{header}\t{len(seq)}\t{round(get_fraction(header, "dvf_score") * 0.9, 3)}\t0.3\n')
+    f.close()
+
+def run_annotate_by_VIBRANT_db(argv):
+    identify_method, virsorter_outdir, dvf_outdir = argv[1], argv[2], argv[3]
+    prefix = os.path.join(virsorter_outdir, 'final_vs2_virus') if identify_method == 'vs' else os.path.join(dvf_outdir, 'final_dvf_virus')
+
+    scaffold2length = {header: len(seq) for header, seq in iter_fasta(prefix + '.fasta')}
+    write_genes(scaffold2length, prefix + '.faa', prefix + '.ffn', False)
+
+    f = open(prefix + '.annotation.txt', 'w')
+    f.write('protein\tscaffold\tKO\tAMG\tKO name\tKO evalue\tKO score\tPfam\tPfam name\tPfam evalue\tPfam score\tVOG\tVOG name\tVOG evalue\tVOG score\n')
+    for scaffold, length in scaffold2length.items():
+        for pro, start, end, strand in get_genes(scaffold, length):
+            f.write('\t'.join(get_annotation_items(pro, scaffold, 'ViWrap')) + '\n')
+    f.close()
+
+def mapping_metaG_reads(argv):
+    viral_scaffold, metagenomic_scaffold, metaG_reads, mapping_result_dir = argv[0], argv[1], argv[2], argv[3]
+    os.mkdir(mapping_result_dir)
+
+    # Step 1 Get the sample names in the same way as ViWrap
+    metaG_reads_list = metaG_reads.split(',')
+    if argv[4] == 'illumina':
+        samples = [Path(metaG_reads_list[i]).stem.rsplit('_', 1)[0] for i in range(0, len(metaG_reads_list), 2)]
+    else:
+        samples = [Path(metaG_read).stem for metaG_read in metaG_reads_list]
+
+    # Step 2 Write down the CoverM table (metabat format) for all metagenomic scaffolds
+    viral_scaffold_ids = {} # old_name => new_name
+    for header, seq in iter_fasta(viral_scaffold):
+        viral_scaffold_ids[get_base_scaffold(header)] = header
+
+    coverm = open(os.path.join(mapping_result_dir, 'all_coverm_raw_result.txt'), 'w')
+    vrhyme = open(os.path.join(mapping_result_dir, 'vRhyme_input_coverage.txt'), 'w')
+    coverm.write('contigName\tcontigLen\ttotalAvgDepth\t' + '\t'.join([f'{sample}.filtered.bam\t{sample}.filtered.bam-var' for sample in samples]) + '\n')
+    vrhyme.write('contigName\t' + '\t'.join([f'{sample}.filtered.bam\t{sample}.filtered.bam-var' for sample in samples]) + '\n')
+    for header, seq in iter_fasta(metagenomic_scaffold):
+        depths = [round(get_fraction(header, sample) * 50, 4) for sample in samples]
+        items = '\t'.join([f'{depth}\t{round(depth / 2, 4)}' for depth in depths])
+        coverm.write(f'{header}\t{len(seq)}\t{round(sum(depths) / len(depths), 4)}\t{items}\n')
+        vrhyme.write(f'{viral_scaffold_ids.get(header, header)}\t{items}\n')
+    coverm.close()
+    vrhyme.close()
+
+def run_vRhyme(argv):
+    viral_scaffold, vRhyme_outdir = argv[0], argv[1]
+    vRhyme_best_bin_dir = os.path.join(vRhyme_outdir, 'vRhyme_best_bins_fasta')
+    os.makedirs(vRhyme_best_bin_dir)
+
+    # About 40% of the scaffolds are binned, in bins of 2 to 4 scaffolds
+    bin_num, bin_size, f = 0, 0, None
+    for header, seq in iter_fasta(viral_scaffold):
+        if get_fraction(header, 'binned') >= 0.4:
+            continue
+        if bin_size == 0:
+            if f:
+                f.close()
+            bin_num += 1
+            bin_size = 2 + int(get_fraction(header, 'bin_size') * 3)
+            f = open(os.path.join(vRhyme_best_bin_dir, f'vRhyme_bin_{bin_num}.fasta'), 'w')
+        write_fasta_record(f, f'vRhyme_{bin_num}__{header}', seq)
+        bin_size -= 1
+    if f:
+        f.close()
+    # The last bin could have only one scaffold, vRhyme never makes such a bin
+    if bin_num and len(list(iter_fasta(os.path.join(vRhyme_best_bin_dir, f'vRhyme_bin_{bin_num}.fasta')))) < 2:
+        os.remove(os.path.join(vRhyme_best_bin_dir, f'vRhyme_bin_{bin_num}.fasta'))
+        bin_num -= 1
+
+    # Write down the faa and ffn files of each bin from the gene files of the viral scaffolds
+    scaffold2bin = {} # scaffold => vRhyme_bin_num
+    for n in range(1, bin_num + 1):
+        for header, seq in iter_fasta(os.path.join(vRhyme_best_bin_dir, f'vRhyme_bin_{n}.fasta')):
+            scaffold2bin[header.split('__', 1)[1]] = n
+    for suffix in ['faa', 'ffn']:
+        fs = {n: open(os.path.join(vRhyme_best_bin_dir, f'vRhyme_bin_{n}.{suffix}'), 'w') for n in range(1, bin_num + 1)}
+        with open(viral_scaffold.rsplit('.', 1)[0] + f'.{suffix}', 'r') as lines:
+            n = 0
+            for line in lines:
+                if line.startswith('>'):
+                    n = scaffold2bin.get(line[1:].split('\t', 1)[0].rsplit('_', 1)[0], 0)
+                    if n:
+                        fs[n].write(f'>vRhyme_{n}__{line[1:]}')
+                elif n:
+                    fs[n].write(line)
+        lines.close()
+        for n in fs:
+            fs[n].close()
+
+def run_CheckV(argv):
+    input_dir, outdir = argv[0], argv[1]
+    for path, dir_list, file_list in os.walk(input_dir):
+        for file_name in file_list:
+            if 'fasta' in file_name:
+                checkv_outdir = os.path.join(outdir, Path(file_name).stem)
+                os.makedirs(checkv_outdir)
+                records = [(header, len(seq)) for header, seq in iter_fasta(os.path.join(path, file_name))]
+                write_checkv_quality_summary(os.path.join(checkv_outdir, 'quality_summary.tsv'), records, lambda header, gene_count: (max(int(gene_count / 2), 1), 0))
+
+def run_vContact2(argv):
+    all_vRhyme_faa, pro2viral_gn_map, tax_classification_db_dir, outdir = argv[0], argv[1], argv[2], argv[4]
+    os.makedirs(outdir)
+
+    # Step 1 Make the combined input files next to the input faa, as the wrapper script does
+    dir_path = Path(all_vRhyme_faa).parent
+    for combined_file, input_files in [(f'{dir_path}/combined_viral_faa.faa', [all_vRhyme_faa]),
+                                       (f'{dir_path}/combined_pro2viral_gn_map.csv', [pro2viral_gn_map, f'{tax_classification_db_dir}/IMGVR_high-quality_phage_vOTU_representatives_pro2viral_gn_map.csv'])]:
+        f = open(combined_file, 'w')
+        for input_file in input_files:
+            with open(input_file, 'r') as lines:
+                for line in lines:
+                    f.write(line)
+            lines.close()
+        f.close()
+
+    # Step 2 Get genomes
+    gns = {} # gn => protein count
+    with open(pro2viral_gn_map, 'r') as lines:
+        for line in lines:
+            tmp = line.rstrip('\n').split(',')
+            if tmp[0] != 'protein_id':
+                gns[tmp[1]] = gns.get(tmp[1], 0) + 1
+    lines.close()
+
+    ref_gns = [] # Reference genomes in the Tax classification db
+    with open(os.path.join(tax_classification_db_dir, 'IMGVR_high-quality_phage_vOTU_representatives_pro2viral_gn_map.csv'), 'r') as lines:
+        for line in lines:
+            tmp = line.rstrip('\n').split(',')
+            if tmp[0] != 'protein_id' and tmp[1] not in ref_gns:
+                ref_gns.append(tmp[1])
+    lines.close()
+
+    # Step 3 About 60% of the genomes are clustered into VCs of about 5 genomes, and each VC has one reference genome
+    vc_num = max(int(len(gns) / 5), 1)
+    f = open(os.path.join(outdir, 'genome_by_genome_overview.csv'), 'w')
+    f.write('Genome,Accession,Size,VC,VC Status,Level,VC Subcluster,VC Subcluster Size,Quality,Adjusted P-value,VC Avg. Distance,Topology Confidence Score,Genus Confidence Score,VC Kingdoms,VC Phyla,VC Classes,VC Orders,VC Families,VC Genera,Genera in VC\n')
+    for gn in gns:
+        if get_fraction(gn, 'vc') < 0.6:
+            VC = f'VC_{int(get_fraction(gn, "vc_pick") * vc_num)}_0'
+            confidence = round(0.85 + get_fraction(gn, 'vc_confidence') * 0.15, 4)
+            f.write(f'{gn},{gn},{gns[gn]},{VC},Clustered,VC,{VC},5,1.0,{confidence},0.5,0.9,{confidence},1,1,1,1,1,1,1\n')
+        else:
+            f.write(f'{gn},{gn},{gns[gn]},,Outlier,,,,,,,,,,,,,,,\n')
+    for i in range(min(vc_num, len(ref_gns))):
+        f.write(f'{ref_gns[i]},{ref_gns[i]},3,VC_{i}_0,Clustered,VC,VC_{i}_0,5,1.0,1.0,0.5,0.9,1.0,1,1,1,1,1,1,1\n')
+    f.close()
+
+def run_dRep(argv):
+    dRep_outdir, viral_genus_genome_list_dir = argv[0], argv[1]
+    for viral_genus_genome_list in glob(f'{viral_genus_genome_list_dir}/viral_genus_genome_list.*.txt'):
+        with open(viral_genus_genome_list, 'r') as lines:
+            genomes = [Path(line.rstrip('\n')).name for line in lines if line.strip()]
+        lines.close()
+        if len(genomes) < 2:
+            continue
+        VC = Path(viral_genus_genome_list).stem.split('.')[1]
+        data_tables_dir = os.path.join(dRep_outdir, f'Output.{VC}', 'data_tables')
+        os.makedirs(data_tables_dir)
+
+        # Split the genus into about 2 species
+        genome2cluster = {genome: f'1_{int(get_fraction(genome, "species") * 2) + 1}' for genome in genomes}
+        cdb = open(os.path.join(data_tables_dir, 'Cdb.csv'), 'w')
+        cdb.write('genome,secondary_cluster,threshold,cluster_method,comparison_algorithm,primary_cluster\n')
+        wdb = open(os.path.join(data_tables_dir, 'Wdb.csv'), 'w')
+        wdb.write('genome,cluster,score\n')
+        cluster2rep = {} # cluster => representative genome
+        for genome, cluster in genome2cluster.items():
+            cdb.write(f'{genome},{cluster},0.05,average,fastANI,1\n')
+            if cluster not in cluster2rep:
+                cluster2rep[cluster] = genome
+                wdb.write(f'{genome},{cluster},1.0\n')
+        cdb.close()
+        wdb.close()
+
+def load_gns(genome_catalog):
+    with open(genome_catalog, 'r') as f:
+        gns = list(json.load(f).keys())
+    f.close()
+    return gns
+
+def run_Tax_RefSeq(argv):
+    output, genome_catalog = argv[6], argv[7]
+    f = open(output, 'w')
+    for gn in load_gns(genome_catalog):
+        if get_fraction(gn, 'refseq') < 0.3:
+            f.write(f'{gn}\t{virus_taxs[int(get_fraction(gn, "refseq_pick") * len(virus_taxs))]}\n')
+    f.close()
+
+def run_Tax_VOG(argv):
+    output, genome_catalog = argv[7], argv[8]
+    f = open(output, 'w')
+    for gn in load_gns(genome_catalog):
+        if get_fraction(gn, 'vog') < 0.3:
+            tax = virus_taxs[int(get_fraction(gn, 'vog_pick') * len(virus_taxs))]
+            f.write(f'{gn}\t{";".join(tax.split(";")[:6])}\n')
+    f.close()
+
+def run_iPHoP(argv):
+    all_fasta, iphop_outdir = argv[0], argv[1]
+    os.makedirs(iphop_outdir, exist_ok = True)
+    genome = open(os.path.join(iphop_outdir, 'Host_prediction_to_genome_m90.csv'), 'w')
+    genome.write('Virus,Host genome,Host taxonomy,Main method,Confidence score,Additional methods\n')
+    genus = open(os.path.join(iphop_outdir, 'Host_prediction_to_genus_m90.csv'), 'w')
+    genus.write('Virus,AAI to closest RaFAH reference,Host genus,Confidence score,List of methods\n')
+    for header, seq in iter_fasta(all_fasta):
+        if get_fraction(header, 'iphop') < 0.5:
+            host_tax = host_taxs[int(get_fraction(header, 'iphop_pick') * len(host_taxs))]
+            genome.write(f'{header},GCA_000000001.1,{host_tax};s__,blast,92.5,\n')
+            genus.write(f'{header},45.2,{host_tax},92.5,blast;92.5\n')
+    genome.close()
+    genus.close()
+
+def run_nothing(argv):
+    pass
+
+# Wrapper script name => stub; all other scripts (pure-Python ones) are run as they are
+stubs = {'run_VIBRANT.py': run_VIBRANT,
+         'run_VirSorter2_1st.py': run_VirSorter2_1st,
+         'run_VirSorter2_CheckV_1st.py': run_VirSorter2_CheckV_1st,
+         'run_VirSorter2_2nd.py': run_VirSorter2_2nd,
+         'run_VirSorter2_CheckV_2nd.py': run_VirSorter2_CheckV_2nd,
+         'run_DVF.py': run_DVF,
+         'run_annotate_by_VIBRANT_db.py': run_annotate_by_VIBRANT_db,
+         'mapping_metaG_reads.py': mapping_metaG_reads,
+         'run_vRhyme.py': run_vRhyme,
+         'run_CheckV.py': run_CheckV,
+         'run_vContact2.py': run_vContact2,
+         'run_dRep.py': run_dRep,
+         'run_Tax_RefSeq.py': run_Tax_RefSeq,
+         'run_Tax_VOG.py': run_Tax_VOG,
+         'run_iPHoP.py': run_iPHoP,
+         'add_custom_MAGs_to_host_db__make_gtdbtk_results.py': run_nothing,
+         'add_custom_MAGs_to_host_db__add_to_db.py': run_nothing}
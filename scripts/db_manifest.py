@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import json
+    import shutil
+    import threading
+    warnings.filterwarnings("ignore")
+    from datetime import datetime
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# The db manifest ("ViWrap_db/db_manifest.json") records the version and the set-up time of each db component;
+# it is written by "ViWrap download" and "ViWrap db update". Artifacts that are made from db components and reused later
+# (e.g., the custom iPHoP db made with custom MAGs) get a stamp of the component versions they were made from,
+# so that they are removed (inside the db dir) or refused (elsewhere) after one of these components is updated
+
+db_manifest_name = 'db_manifest.json'
+db_artifact_stamp_name = 'ViWrap_db_stamp.json'
+
+# db component => the artifacts (relative to the db dir) made from it; they are removed when the component is updated
+component2artifacts = {'iphop': ['iPHoP_db_custom'], 'gtdb': ['iPHoP_db_custom']}
+
+manifest_lock = threading.Lock() # The db components can be set up in parallel threads
+
+def load_db_manifest(db_dir):
+    manifest_file = os.path.join(db_dir, db_manifest_name)
+    if not os.path.exists(manifest_file):
+        return {'components': {}}
+    with open(manifest_file, 'r') as f:
+        manifest = json.load(f)
+    f.close()
+    return manifest
+
+def update_db_manifest(db_dir, component2version):
+    # Record the version of each given component with the current time
+    with manifest_lock:
+        manifest = load_db_manifest(db_dir)
+        for component in component2version:
+            manifest['components'][component] = {'version': component2version[component], 'updated_at': str(datetime.now().replace(microsecond=0))}
+        manifest_file = os.path.join(db_dir, db_manifest_name)
+        with open(manifest_file + '.part', 'w') as f:
+            json.dump(manifest, f, indent = 4)
+        f.close()
+        os.replace(manifest_file + '.part', manifest_file)
+
+def write_db_artifact_stamp(artifact_dir, db_dir, components):
+    # Stamp an artifact dir with the manifest entries of the components it was made from
+    if not os.path.exists(artifact_dir):
+        return
+    manifest = load_db_manifest(db_dir)
+    stamp = {component: manifest['components'].get(component, {}) for component in components}
+    with open(os.path.join(artifact_dir, db_artifact_stamp_name), 'w') as f:
+        json.dump(stamp, f, indent = 4)
+    f.close()
+
+def get_stale_components(artifact_dir, db_dir):
+    # Return the components that have been updated since the artifact was made; an artifact without a stamp can not be checked
+    stamp_file = os.path.join(artifact_dir, db_artifact_stamp_name)
+    if not os.path.exists(stamp_file):
+        return []
+    with open(stamp_file, 'r') as f:
+        stamp = json.load(f)
+    f.close()
+    manifest = load_db_manifest(db_dir)
+    return [component for component in stamp if stamp[component] != manifest['components'].get(component, {})]
+
+def invalidate_db_artifacts(db_dir, component):
+    # Remove the artifacts in the db dir that were made from the component, and return them
+    removed_artifacts = []
+    for artifact in component2artifacts.get(component, []):
+        artifact_dir = os.path.join(db_dir, artifact)
+        if os.path.exists(artifact_dir):
+            shutil.rmtree(artifact_dir)
+            removed_artifacts.append(artifact_dir)
+    return removed_artifacts
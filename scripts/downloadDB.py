@@ -4,8 +4,22 @@ try:
     import warnings
     import sys
     import os
+    import json
+    import time
+    import gzip
+    import shutil
+    import hashlib
+    import logging
+    import http.client
+    import urllib.request
+    import urllib.error
+    import urllib.parse
+    import multiprocessing
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime
     warnings.filterwarnings("ignore")
     from pathlib import Path
+    from glob import glob
     import subprocess
     from subprocess import DEVNULL, STDOUT, check_call
     from Bio import SeqIO
@@ -13,6 +27,281 @@ except Exception as e:
     sys.stderr.write(str(e) + "\n\n")
     exit(1)
     
+logger = logging.getLogger(__name__)
+
+# The files downloaded directly by ViWrap; file name => {'url': url, 'checksum': 'md5:<hex>' or 'sha256:<hex>' ('' means only the size is checked)}
+# The URLs and checksums can be replaced by "--db_url_config" (e.g., to use a mirror or a local HTTP server)
+db_files = {}
+for i in range(1, 4):
+    db_files[f'viral.{i}.protein.faa.gz'] = {'url': f'https://ftp.ncbi.nlm.nih.gov/refseq/release/viral/viral.{i}.protein.faa.gz', 'checksum': ''}
+    db_files[f'viral.{i}.protein.gpff.gz'] = {'url': f'https://ftp.ncbi.nlm.nih.gov/refseq/release/viral/viral.{i}.protein.gpff.gz', 'checksum': ''}
+db_files['vog.hmm.tar.gz'] = {'url': 'http://fileshare.csb.univie.ac.at/vog/vog97/vog.hmm.tar.gz', 'checksum': ''}
+db_files['iPHoP.latest.tar.gz'] = {'url': 'https://portal.nersc.gov/cfs/m342/iphop/db/iPHoP.latest.tar.gz', 'checksum': ''}
+db_files['RELEASE_NUMBER'] = {'url': 'https://ftp.ncbi.nlm.nih.gov/refseq/release/RELEASE_NUMBER', 'checksum': ''} # The current RefSeq release, for the db manifest
+db_files['gtdbtk_r207_v2_data.tar.gz'] = {'url': 'https://data.gtdb.ecogenomic.org/releases/release207/207.0/auxillary_files/gtdbtk_r207_v2_data.tar.gz', 'checksum': ''}
+
+def load_db_url_config(db_url_config):
+    # The config is a JSON file of file name => {"url": url, "checksum": "md5:<hex>"}; both keys are optional
+    with open(db_url_config, 'r') as f:
+        config = json.load(f)
+    f.close()
+    for file_name in config:
+        if file_name not in db_files:
+            sys.exit(f"Unknown db file in {db_url_config}: {file_name}; it should be one of these: {', '.join(db_files)}")
+        db_files[file_name].update(config[file_name])
+        
+def get_file_checksum(path_to_file, checksum_type):
+    file_hash = hashlib.new(checksum_type)
+    with open(path_to_file, 'rb') as f:
+        chunk = f.read(4194304)
+        while chunk:
+            file_hash.update(chunk)
+            chunk = f.read(4194304)
+    f.close()
+    return file_hash.hexdigest()
+    
+def download_file(url, path_to_file, checksum = '', retries = 5):
+    # Download url into "{path_to_file}.part" and rename it to path_to_file when it is complete and verified;
+    # an existing part file (e.g., from an interrupted run or a dropped connection) is resumed by an HTTP range request,
+    # and the download is retried with backoff on network errors. The total size is always checked, and the checksum is checked if it is given
+    if os.path.exists(path_to_file):
+        return path_to_file
+    part_file = path_to_file + '.part'
+    
+    attempt = 0
+    while True:
+        downloaded_size = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+        request = urllib.request.Request(url, headers = {'User-Agent': 'ViWrap'})
+        if downloaded_size:
+            request.add_header('Range', f'bytes={downloaded_size}-')
+        try:
+            with urllib.request.urlopen(request, timeout = 60) as response:
+                if downloaded_size and response.status != 206: # The server does not support range requests, so start over
+                    downloaded_size = 0
+                total_size = 0 # 0 means unknown
+                if response.status == 206 and response.headers.get('Content-Range', '').rsplit('/', 1)[-1].isdigit():
+                    total_size = int(response.headers['Content-Range'].rsplit('/', 1)[-1])
+                elif response.headers.get('Content-Length', '').isdigit():
+                    total_size = downloaded_size + int(response.headers['Content-Length'])
+                    
+                with open(part_file, 'ab' if downloaded_size else 'wb') as f:
+                    shutil.copyfileobj(response, f, 4194304)
+                f.close()
+            if total_size and os.path.getsize(part_file) != total_size:
+                raise IOError(f"incomplete download: {os.path.getsize(part_file)} of {total_size} bytes")
+            break
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            if isinstance(e, urllib.error.HTTPError) and e.code == 416 and downloaded_size: # The part file is already complete
+                break
+            if isinstance(e, urllib.error.HTTPError) and e.code < 500: # 4xx errors will not go away by retrying
+                raise
+            if attempt >= retries:
+                raise
+            time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+            logger.warning(f"{time_current} | Downloading {Path(path_to_file).name} was interrupted ({e}); resume it in {min(2 ** attempt, 60)} seconds")
+            time.sleep(min(2 ** attempt, 60))
+            attempt += 1
+        
+    if checksum:
+        checksum_type, expected_checksum = checksum.split(':', 1)
+        if get_file_checksum(part_file, checksum_type) != expected_checksum.lower():
+            os.remove(part_file) # A corrupted part file can not be resumed
+            raise IOError(f"{checksum_type} checksum of {Path(path_to_file).name} does not match")
+    os.replace(part_file, path_to_file)
+    return path_to_file
+    
+def log_download_progress(file_name, downloaded_size, total_size, progress_state):
+    # Log the progress at every 10% (or every 1 GB if the total size is unknown)
+    step = total_size / 10 if total_size else 1024 ** 3
+    if downloaded_size - progress_state['last_logged_size'] < step and downloaded_size != total_size:
+        return
+    progress_state['last_logged_size'] = downloaded_size
+    time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+    if total_size:
+        logger.info(f"{time_current} | Downloading {file_name}: {int(downloaded_size * 100 / total_size)}% ({downloaded_size / 1024 ** 3:.2f} of {total_size / 1024 ** 3:.2f} GB)")
+    else:
+        logger.info(f"{time_current} | Downloading {file_name}: {downloaded_size / 1024 ** 3:.2f} GB")
+    
+def get_tar_extract_cmd(extract_dir, tar_file = '-'):
+    # Decompress by pigz if it is available (reading, decompressing, and checking the CRC in separate threads), otherwise by gzip;
+    # either way the decompression runs in its own process beside the download and the extraction. tar_file is "-" for stdin
+    if shutil.which('pigz'):
+        return ['tar', '-x', '-I', 'pigz', '-f', tar_file, '-C', extract_dir]
+    return ['tar', '-x', '-z', '-f', tar_file, '-C', extract_dir]
+    
+def download_and_extract(url, extract_dir, checksum = '', retries = 5):
+    # Stream a .tar.gz file from url through gzip decompression into tar, without writing the tarball to disk;
+    # the progress is logged and the checksum is computed on the stream. An interrupted stream is resumed by an HTTP range request
+    # into the same tar process (if the server ignores the range, the bytes that tar already has are skipped).
+    # Since the files are extracted before the checksum is known, the caller should remove extract_dir if an error is raised
+    file_name = Path(urllib.parse.urlparse(url).path).name
+    os.makedirs(extract_dir, exist_ok = True)
+    checksum_type, expected_checksum = checksum.split(':', 1) if checksum else ('md5', '')
+    stream_hash = hashlib.new(checksum_type)
+    progress_state = {'last_logged_size': 0}
+    
+    process = subprocess.Popen(get_tar_extract_cmd(extract_dir), stdin = subprocess.PIPE)
+    try:
+        streamed_size = 0 # The number of bytes that have been passed to tar
+        total_size = 0 # 0 means unknown
+        attempt = 0
+        while True:
+            request = urllib.request.Request(url, headers = {'User-Agent': 'ViWrap'})
+            if streamed_size:
+                request.add_header('Range', f'bytes={streamed_size}-')
+            try:
+                with urllib.request.urlopen(request, timeout = 60) as response:
+                    skip_size = streamed_size if streamed_size and response.status != 206 else 0 # The server does not support range requests
+                    if response.status == 206 and response.headers.get('Content-Range', '').rsplit('/', 1)[-1].isdigit():
+                        total_size = int(response.headers['Content-Range'].rsplit('/', 1)[-1])
+                    elif response.headers.get('Content-Length', '').isdigit():
+                        total_size = streamed_size - skip_size + int(response.headers['Content-Length'])
+                        
+                    chunk = response.read(4194304)
+                    while chunk:
+                        if skip_size:
+                            skipped = min(skip_size, len(chunk))
+                            chunk = chunk[skipped:]
+                            skip_size -= skipped
+                        if chunk:
+                            process.stdin.write(chunk)
+                            stream_hash.update(chunk)
+                            streamed_size += len(chunk)
+                            log_download_progress(file_name, streamed_size, total_size, progress_state)
+                        chunk = response.read(4194304)
+                if total_size and streamed_size != total_size:
+                    raise IOError(f"incomplete download: {streamed_size} of {total_size} bytes")
+                break
+            except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+                if process.poll() is not None: # tar has stopped, e.g., a broken gzip stream or a full disk
+                    raise IOError(f"tar stopped while extracting {file_name}")
+                if isinstance(e, urllib.error.HTTPError) and e.code < 500: # 4xx errors will not go away by retrying
+                    raise
+                if attempt >= retries:
+                    raise
+                time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+                logger.warning(f"{time_current} | Downloading {file_name} was interrupted ({e}); resume it in {min(2 ** attempt, 60)} seconds")
+                time.sleep(min(2 ** attempt, 60))
+                attempt += 1
+        process.stdin.close()
+        if process.wait() != 0: # gzip checks the CRC and length of the decompressed data
+            raise IOError(f"tar could not extract {file_name}")
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+        
+    if expected_checksum and stream_hash.hexdigest() != expected_checksum.lower():
+        raise IOError(f"{checksum_type} checksum of {file_name} does not match")
+        
+def extract_db_file(file_name, extract_dir, download_dir = ''):
+    # Stream one of the db files (the keys of "db_files") into extract_dir. A stream can only be resumed within the same run, so if it fails
+    # for good, an empty "{file_name}.part" is left in download_dir; a rerun then downloads the file to disk by "download_file" instead
+    # (resumed by HTTP range requests across later interruptions), extracts it, and removes it
+    path_to_file = os.path.join(download_dir, file_name)
+    if download_dir and (os.path.exists(path_to_file + '.part') or os.path.exists(path_to_file)):
+        download_file(db_files[file_name]['url'], path_to_file, db_files[file_name]['checksum'])
+        os.makedirs(extract_dir, exist_ok = True)
+        if subprocess.call(get_tar_extract_cmd(extract_dir, path_to_file)) != 0:
+            raise IOError(f"tar could not extract {file_name}")
+        os.remove(path_to_file)
+        return
+        
+    try:
+        download_and_extract(db_files[file_name]['url'], extract_dir, db_files[file_name]['checksum'])
+    except Exception:
+        if download_dir:
+            os.makedirs(download_dir, exist_ok = True)
+            open(path_to_file + '.part', 'ab').close()
+        raise
+    
+def download_db_files(file_names, download_dir, threads = 4):
+    # Download the db files (the keys of "db_files") into download_dir in parallel, and return their paths
+    os.makedirs(download_dir, exist_ok = True)
+    with ThreadPoolExecutor(max_workers = int(threads)) as executor:
+        futures = [executor.submit(download_file, db_files[file_name]['url'], os.path.join(download_dir, file_name), db_files[file_name]['checksum']) for file_name in file_names]
+        paths = [future.result() for future in futures]
+    return paths
+    
+def gunzip_and_combine(gz_files, path_to_file):
+    # Decompress and concatenate gzip files into one file without keeping the decompressed parts
+    with open(path_to_file + '.part', 'wb') as fo:
+        for gz_file in gz_files:
+            with gzip.open(gz_file, 'rb') as fi:
+                shutil.copyfileobj(fi, fo, 4194304)
+            fi.close()
+    fo.close()
+    os.replace(path_to_file + '.part', path_to_file)
+    
+def remove_partial_db_dir(db_component_dir):
+    # Remove what a failed run of a db component left, before setting it up again
+    if os.path.exists(db_component_dir):
+        shutil.rmtree(db_component_dir)
+        
+def check_db_paths(paths):
+    # Raise an error if any path that a db set-up step should have made is missing
+    missing_paths = [path for path in paths if not os.path.exists(path)]
+    if missing_paths:
+        raise IOError(f"missing {', '.join(missing_paths)}")
+        
+def get_download_status_dir(db_dir):
+    return os.path.join(db_dir, 'download_status')
+    
+def is_db_component_done(db_dir, component):
+    return os.path.exists(os.path.join(get_download_status_dir(db_dir), f'{component}.done'))
+    
+def write_db_component_marker(db_dir, component, status = 'finished'):
+    marker = {'component': component, f'{status}_time': str(datetime.now().replace(microsecond=0))}
+    with open(os.path.join(get_download_status_dir(db_dir), f'{component}.done'), 'w') as f:
+        json.dump(marker, f, indent = 4)
+    f.close()
+    
+def run_db_component(db_dir, component, set_up_db_component, component_paths = None):
+    # Run the set-up function of a component and write down its completion marker; return False if it fails.
+    # component_paths: [[the paths that its set-up makes], [the paths that a finished set-up must have]];
+    # a "{component}.started" marker is written before the set-up, so that only what a failed run of the downloader left is removed by a rerun.
+    # A component that is present without any marker (e.g., set up by an older ViWrap) is adopted if it is complete, or left as it is and failed
+    started_marker = os.path.join(get_download_status_dir(db_dir), f'{component}.started')
+    if is_db_component_done(db_dir, component):
+        time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+        logger.info(f"{time_current} | {component} has been set up before, skip it")
+        return True
+    if component_paths and not os.path.exists(started_marker) and [path for pattern in component_paths[0] for path in glob(pattern)]:
+        try:
+            check_db_paths(component_paths[1])
+        except IOError as e:
+            time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+            logger.error(f"{time_current} | {component} is present but was not set up by \"ViWrap download\", and it is not complete ({e}); it is left as it is, please move it away and rerun")
+            return False
+        write_db_component_marker(db_dir, component, 'adopted')
+        time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+        logger.info(f"{time_current} | {component} is present and complete, use it as it is")
+        return True
+        
+    open(started_marker, 'w').close()
+    try:
+        set_up_db_component()
+    except Exception as e:
+        time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+        logger.error(f"{time_current} | {component} could not be set up: {e}")
+        return False
+    write_db_component_marker(db_dir, component)
+    os.remove(started_marker)
+    time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+    logger.info(f"{time_current} | {component} has been set up")
+    return True
+    
+def run_db_components(db_dir, db_components, jobs = 3, db_component_paths = {}):
+    # Set up the db components (component => set-up function without arguments) with "jobs" components at the same time;
+    # a component is skipped if its completion marker is present, so a rerun only sets up the missing components.
+    # db_component_paths: component => component_paths of "run_db_component".
+    # A failed component does not stop the others; the failed components are returned
+    os.makedirs(get_download_status_dir(db_dir), exist_ok = True)
+    with ThreadPoolExecutor(max_workers = int(jobs)) as executor:
+        futures = {component: executor.submit(run_db_component, db_dir, component, db_components[component], db_component_paths.get(component)) for component in db_components}
+        failed_components = [component for component in futures if not futures[component].result()]
+    return failed_components
+    
 def store_seq(input_seq_file): # The input sequence file should be a file with full path
     head = "" # Store the header line
     seq_dict = {} # Store the sequence dict
@@ -51,55 +340,101 @@ def write_down_seq(seq_dict, path_to_file):
         seq_file.write(seq_dict[head] + "\n")
     seq_file.close()
     
-def dl_refseq_viral_protein(tax_classification_db_dir):
-    dl_cmd = []
-    for i in range(1, 4):
-        each_dl_cmd = f'wget https://ftp.ncbi.nlm.nih.gov/refseq/release/viral/viral.{i}.protein.faa.gz -O {tax_classification_db_dir}/viral.{i}.protein.faa.gz'
-        each_gzip_cmd = f'gzip -d {tax_classification_db_dir}/viral.{i}.protein.faa.gz'
-        each_cmd = each_dl_cmd + ";" + each_gzip_cmd
-        dl_cmd.append(each_cmd)
-    
-    n = 4 # The number of parallel processes
-    for j in range(max(int(len(dl_cmd)/n + 1), 1)):
-        procs = [subprocess.Popen(i, shell=True, stdout=DEVNULL) for i in dl_cmd[j*n: min((j+1)*n, len(dl_cmd))] ]
-        for p in procs:
-            p.wait()  
-            
-    combind_cmd = f'cat {tax_classification_db_dir}/viral.*.protein.faa > {tax_classification_db_dir}/NCBI_RefSeq_viral.faa'
-    rm_cmd = f'rm {tax_classification_db_dir}/viral.*.protein.faa'
-    os.system(combind_cmd + ";" + rm_cmd)
-    
-def dl_refseq_viral_protein_gpff(tax_classification_db_dir):
-    dl_cmd = []
-    #os.mkdir(tax_classification_db_dir)
-    for i in range(1, 4):
-        each_dl_cmd = f'wget https://ftp.ncbi.nlm.nih.gov/refseq/release/viral/viral.{i}.protein.gpff.gz -O {tax_classification_db_dir}/viral.{i}.protein.gpff.gz'
-        each_gzip_cmd = f'gzip -d {tax_classification_db_dir}/viral.{i}.protein.gpff.gz'
-        each_cmd = each_dl_cmd + ";" + each_gzip_cmd
-        dl_cmd.append(each_cmd)
-    
-    n = 4 # The number of parallel processes
-    for j in range(max(int(len(dl_cmd)/n + 1), 1)):
-        procs = [subprocess.Popen(i, shell=True, stdout=DEVNULL) for i in dl_cmd[j*n: min((j+1)*n, len(dl_cmd))] ]
-        for p in procs:
-            p.wait()  
-            
-    combind_cmd = f'cat {tax_classification_db_dir}/viral.*.protein.gpff > {tax_classification_db_dir}/NCBI_RefSeq_viral.gpff'
-    rm_cmd = f'rm {tax_classification_db_dir}/viral.*.protein.gpff'
-    os.system(combind_cmd + ";" + rm_cmd)
-    
-def parse_gpff(tax_classification_db_dir):
-    pro2tax = {}
-    gpff = f'{tax_classification_db_dir}/NCBI_RefSeq_viral.gpff'
-    f = open(gpff, "r")
-    for gp_record in SeqIO.parse(f, 'genbank'):
-        acc = gp_record.annotations['accessions'][0]
-        organism = gp_record.annotations['organism']
-        tax_line = (";").join(gp_record.annotations['taxonomy'])
-        pro2tax[acc] = tax_line + ";" + organism
+def get_refseq_release():
+    # Return the current RefSeq release number, or '' if it can not be fetched; it is only used to stamp the db manifest
+    try:
+        request = urllib.request.Request(db_files['RELEASE_NUMBER']['url'], headers = {'User-Agent': 'ViWrap'})
+        with urllib.request.urlopen(request, timeout = 60) as response:
+            return response.read().decode().strip()
+    except (urllib.error.URLError, http.client.HTTPException, OSError, UnicodeDecodeError):
+        return ''
         
+def get_db_file_release(file_name):
+    # The release of a db file is the name of the dir in its URL, i.e., "vog97" for http://fileshare.csb.univie.ac.at/vog/vog97/vog.hmm.tar.gz
+    return Path(urllib.parse.urlparse(db_files[file_name]['url']).path).parent.name
+    
+def dl_refseq_viral_protein(tax_classification_db_dir, download_dir):
+    gz_files = download_db_files([f'viral.{i}.protein.faa.gz' for i in range(1, 4)], download_dir)
+    gunzip_and_combine(gz_files, f'{tax_classification_db_dir}/NCBI_RefSeq_viral.faa')
+    
+def dl_refseq_viral_protein_gpff(tax_classification_db_dir, download_dir):
+    # The gpff files are kept compressed and separate, so that parse_gpff can scan them in parallel
+    gz_files = download_db_files([f'viral.{i}.protein.gpff.gz' for i in range(1, 4)], download_dir)
+    return gz_files
+    
+def remove_db_files(file_names, download_dir):
+    # Remove the downloaded files after the db component that uses them has been set up
+    for file_name in file_names:
+        if os.path.exists(os.path.join(download_dir, file_name)):
+            os.remove(os.path.join(download_dir, file_name))
+    
+def split_gpff_taxonomy(lineage):
+    # The same as Biopython: drop the last ".", split by ";", and drop empty items
+    if not lineage or lineage == ".":
+        return []
+    if lineage[-1] == ".":
+        lineage = lineage[:-1]
+    return [item.strip() for item in lineage.split(";") if item]
+    
+def scan_gpff(gpff_file):
+    # Scan a gpff file (plain or .gz) line by line, and only keep the first accession, the organism, and the lineage of each record;
+    # the organism name can be wrapped onto several lines, and the lineage starts at the first line with ";" (the same rule as Biopython).
+    # The features and sequences are skipped. Return a list of (accession, "lineage;organism")
+    pro2tax = []
+    acc = organism = None
+    lineage = ''
+    in_organism = False # Whether the current line could still be a part of the ORGANISM block
+    in_header = True # The header ends at "FEATURES"; only the header has ACCESSION and ORGANISM lines
+    
+    f = gzip.open(gpff_file, 'rt') if gpff_file.endswith('.gz') else open(gpff_file, 'r')
+    for line in f:
+        if line.startswith('//'):
+            if acc != None and organism != None:
+                pro2tax.append((acc, ";".join(split_gpff_taxonomy(lineage.strip())) + ";" + organism))
+            acc = organism = None
+            lineage = ''
+            in_organism = False
+            in_header = True
+            continue
+        if not in_header:
+            continue
+        line = line.rstrip()
+        if in_organism:
+            if line.startswith('            '): # A continuation line of the ORGANISM block
+                if lineage or ";" in line or line[12:].strip() in ('Bacteria.', 'Archaea.', 'Eukaryota.', 'Unclassified.', 'Viruses.', 'cellular organisms.', 'other sequences.', 'unclassified sequences.'):
+                    lineage += " " + line[12:]
+                elif line[12:].strip() != ".": # "." is a place holder of no lineage
+                    organism += " " + line[12:].strip()
+                continue
+            in_organism = False
+        if line.startswith('ACCESSION') and acc == None:
+            accessions = line[12:].replace(";", " ").split()
+            if accessions:
+                acc = accessions[0]
+        elif line.startswith('  ORGANISM'):
+            organism = line[12:].strip()
+            in_organism = True
+        elif line.startswith('FEATURES'):
+            in_header = False
     f.close()
-
+    
+    return pro2tax
+    
+def parse_gpff(tax_classification_db_dir, gpff_files):
+    # Scan each gpff file in its own process (up to the number of CPUs); the "spawn" start method is used, since this can run in a thread of the db downloader,
+    # and forking a process with other running threads is not safe
+    processes = min(len(gpff_files), os.cpu_count() or 1)
+    if processes > 1:
+        with multiprocessing.get_context('spawn').Pool(processes) as pool:
+            gpff_results = pool.map(scan_gpff, gpff_files)
+    else:
+        gpff_results = [scan_gpff(gpff_file) for gpff_file in gpff_files]
+    
+    pro2tax = {} # Keep the first position and the last taxonomy of a repeated accession, the same as parsing the combined gpff
+    for gpff_result in gpff_results:
+        for acc, tax in gpff_result:
+            pro2tax[acc] = tax
+    
     fo = open(f'{tax_classification_db_dir}/NCBI_RefSeq_viral_protein2NCBI_tax.txt', "w")
     for pro in pro2tax:
         tax = pro2tax[pro]
@@ -196,27 +531,14 @@ def reformat_NCBI_tax_to_ICTV_8_rank_tax(tax_classification_db_dir, ictv_tax_inf
     for NCBI_tax in NCBI_tax_dict:
         species = NCBI_tax_dict[NCBI_tax] # The "species" is according to the NCBI species
         NCBI_tax = NCBI_tax.replace("Viruses;", "", 1) # Delete the "Viruses;" in the front
-        ictv_8_rank_tax = ''
-        realm = kingdom = phylum = class_ = order = family = genus = ''
+        rank2taxon = dict.fromkeys(['Realm', 'Kingdom', 'Phylum', 'Class', 'Order', 'Family', 'Genus'], '') # The 7 ranks above species => taxon
         
         NCBI_tax_list = NCBI_tax.split(";")
-        for i in range((len(NCBI_tax_list) - 1)):
-            if NCBI_tax_list[i] in String2rank:
-                if String2rank[NCBI_tax_list[i]] == 'Realm':
-                    realm = NCBI_tax_list[i]
-                elif String2rank[NCBI_tax_list[i]] == 'Kingdom':
-                    kingdom = NCBI_tax_list[i]
-                elif String2rank[NCBI_tax_list[i]] == 'Phylum':
-                    phylum = NCBI_tax_list[i]
-                elif String2rank[NCBI_tax_list[i]] == 'Class':     
-                    class_ = NCBI_tax_list[i]
-                elif String2rank[NCBI_tax_list[i]] == 'Order':
-                    order = NCBI_tax_list[i]
-                elif String2rank[NCBI_tax_list[i]] == 'Family':
-                    family = NCBI_tax_list[i]
-                elif String2rank[NCBI_tax_list[i]] == 'Genus':     
-                    genus = NCBI_tax_list[i]                    
-        ictv_8_rank_tax = f'{realm};{kingdom};{phylum};{class_};{order};{family};{genus};{species}'
+        for taxon in NCBI_tax_list[:-1]:
+            rank = String2rank.get(taxon, '')
+            if rank in rank2taxon: # The last taxon of a rank is kept
+                rank2taxon[rank] = taxon
+        ictv_8_rank_tax = ';'.join(rank2taxon.values()) + f';{species}'
         NCBI_tax2ictv_8_rank_tax[NCBI_tax] = ictv_8_rank_tax # Note that here NCBI_tax does not contain "Viruses;" in the front
         
     # Step 4. Write down result
@@ -236,7 +558,6 @@ def make_diamond_db(tax_classification_db_dir):
 
 def remove(tax_classification_db_dir):    
     remove_cmds = []
-    remove_cmds.append(f'rm {tax_classification_db_dir}/NCBI_RefSeq_viral.gpff')
     remove_cmds.append(f'rm {tax_classification_db_dir}/NCBI_RefSeq_viral_protein2NCBI_tax.txt')
     os.system(';'.join(remove_cmds))
     
@@ -251,14 +572,11 @@ def get_vog_marker_table(vog_marker_table):
     lines.close()
     return vog_marker_list
     
-def get_marker_vog_hmm(vog_marker_list, tax_classification_db_dir):
-    # Step 1 Download whole VOG HMMs (VOG 97)
-    wget_cmd = f'wget http://fileshare.csb.univie.ac.at/vog/vog97/vog.hmm.tar.gz -O {tax_classification_db_dir}/vog.hmm.tar.gz'
-    os.system(wget_cmd)
+def get_marker_vog_hmm(vog_marker_list, tax_classification_db_dir, hmmpress_cmd = 'hmmpress', download_dir = ''):
+    # Step 1 Download and extract whole VOG HMMs (VOG 97)
+    extract_db_file('vog.hmm.tar.gz', f'{tax_classification_db_dir}/tmp', download_dir)
+    
     # Step 2 Pick marker VOG HMMs, concatenate, and press
-    os.mkdir(f'{tax_classification_db_dir}/tmp')
-    unzip_cmd = f'tar xzf {tax_classification_db_dir}/vog.hmm.tar.gz --directory {tax_classification_db_dir}/tmp'
-    os.system(unzip_cmd)
     
     marker_hmms = []
     for vog in vog_marker_list:
@@ -267,9 +585,49 @@ def get_marker_vog_hmm(vog_marker_list, tax_classification_db_dir):
     cat_cmd = f'cat {" ".join(marker_hmms)} > {tax_classification_db_dir}/marker_VOG.hmm'
     os.system(cat_cmd)
     
-    press_cmd = f'hmmpress {tax_classification_db_dir}/marker_VOG.hmm'
+    press_cmd = f'{hmmpress_cmd} -f {tax_classification_db_dir}/marker_VOG.hmm'
     os.system(press_cmd)
     
     os.system(f'rm -rf {tax_classification_db_dir}/tmp')
-    os.system(f'rm {tax_classification_db_dir}/vog.hmm.tar.gz')
-    
\ No newline at end of file
+    
+
+def shard_hmm_db(hmm_file, shard_num, shard_dir, hmmpress_cmd = 'hmmpress'):
+    # Split an HMM db into "shard_num" pressed shards, so that hmmsearch can run over (profile shard x protein chunk) pairs;
+    # profiles are distributed round-robin while streaming the db, and a manifest records the shards
+    hmm_stem = Path(hmm_file).stem
+    os.makedirs(shard_dir, exist_ok = True)
+    shard_files = [os.path.join(shard_dir, f"{hmm_stem}.shard_{i + 1}.HMM") for i in range(int(shard_num))]
+    shard_handles = [open(shard_file, 'w') for shard_file in shard_files]
+    shard2profile_num = [0] * int(shard_num)
+    
+    i = 0 # The index of the current profile
+    with open(hmm_file, 'r') as lines:
+        for line in lines:
+            shard_handles[i % int(shard_num)].write(line)
+            if line.startswith('//'): # The end of a profile
+                shard2profile_num[i % int(shard_num)] += 1
+                i += 1
+    lines.close()
+    for shard_handle in shard_handles:
+        shard_handle.close()
+        
+    # Press all shards in parallel
+    press_cmds = []
+    for j in range(int(shard_num)):
+        if shard2profile_num[j]:
+            press_cmds.append(f"{hmmpress_cmd} -f {shard_files[j]}")
+    procs = [subprocess.Popen(i, shell=True, stdout=DEVNULL, stderr=DEVNULL) for i in press_cmds]
+    for p in procs:
+        p.wait()
+            
+    manifest = {} 
+    manifest['source'] = Path(hmm_file).name
+    manifest['source_size'] = os.path.getsize(hmm_file) # Used to check if the shards are still made from the same db 
+    manifest['profile_num'] = i
+    manifest['shards'] = [{'file': Path(shard_files[j]).name, 'profile_num': shard2profile_num[j]} for j in range(int(shard_num)) if shard2profile_num[j]]
+    for j in range(int(shard_num)):
+        if not shard2profile_num[j]:
+            os.remove(shard_files[j])
+    with open(os.path.join(shard_dir, f"{hmm_stem}.shards.json"), 'w') as f:
+        json.dump(manifest, f, indent = 4)
+    f.close()
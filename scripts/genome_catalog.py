@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import json
+    warnings.filterwarnings("ignore")
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# The run-scoped genome catalog ("viral_genome_catalog.json") is made by "module.make_genome_catalog";
+# the loader is kept here, without other dependencies, so that the scripts run in the conda envs can import it as well
+
+def load_genome_catalog(genome_catalog):
+    with open(genome_catalog, 'r') as f:
+        gn2info = json.load(f) # gn => {fasta, faa, ffn, scaffolds, size, pro_count}
+    f.close()
+    
+    return gn2info
+    
+def get_gn2faa(genome_catalog):
+    # Return gn => addr to its faa file, for the genomes that have one
+    gn2info = load_genome_catalog(genome_catalog)
+    return {gn: gn2info[gn]['faa'] for gn in gn2info if gn2info[gn]['faa']}
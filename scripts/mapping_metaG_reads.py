@@ -63,32 +63,19 @@ def run_consent(input_reads, input_reads_type, num_threads):
     correcting_cmd = f'CONSENT-correct --in {input_reads} --out {out_fasta_file} --type {reads_type} -j {num_threads} 1> /dev/null'
     os.system(correcting_cmd)
 
-def store_seq(input_seq_file): # The input sequence file should be a file with full path
-    head = "" # Store the header line
-    seq_dict = {} # Store the sequence dict
+def store_seq_ids(input_seq_file): # The input sequence file should be a file with full path
+    # Only store the headers in the same way as "store_seq" in module.py; sequence lines are skipped
+    heads = [] # Store the header lines
     
     with open(input_seq_file, "r") as seq_lines:
         for line in seq_lines:
-            line = line.rstrip("\n") # Remove "\n" in the end
             if ">" in line:
-                if (" " or "\t") in line: # Break at the first " " or "\t"
-                    spliter = ""
-                    for i in range(len(line)):
-                        if line[i] == " " or line[i] == "\t":
-                            spliter = line[i]
-                            break 
-                           
-                    head = line.split(f'{spliter}', 1)[0]
-                    seq_dict[head] = ""
-                else:
-                    head = line
-                    seq_dict[head] = ""
-            else:
-                seq_dict[head] += line
+                line = line.rstrip("\n") # Remove "\n" in the end
+                heads.append(re.split('[ \t]', line, 1)[0]) # Break at the first " " or "\t"
             
     seq_lines.close()
     
-    return seq_dict    
+    return heads    
         
 def convert_sam_to_sorted_bam(input_sam_file, num_threads):
     # Open the SAM file in reading mode
@@ -165,8 +152,8 @@ def mapping_metaG_reads(viral_scaffold, metagenomic_scaffold, metaG_reads, mappi
         coverm_raw_table_subset = coverm_raw_table.drop(['contigLen', 'totalAvgDepth'], axis = 1)
         
         dict_virus_rename = {} # old_name => new_name
-        viral_seq = store_seq(viral_scaffold)
-        for header in viral_seq:
+        viral_seq_ids = store_seq_ids(viral_scaffold)
+        for header in viral_seq_ids:
             new_name = header.replace('>', '', 1)
             old_name = ''
             if '||' in new_name:
@@ -225,8 +212,8 @@ def mapping_metaG_reads(viral_scaffold, metagenomic_scaffold, metaG_reads, mappi
         coverm_raw_table_subset = coverm_raw_table.drop(['contigLen', 'totalAvgDepth'], axis = 1)
         
         dict_virus_rename = {} # old_name => new_name
-        viral_seq = store_seq(viral_scaffold)
-        for header in viral_seq:
+        viral_seq_ids = store_seq_ids(viral_scaffold)
+        for header in viral_seq_ids:
             new_name = header.replace('>', '', 1)
             old_name = ''
             if '||' in new_name:
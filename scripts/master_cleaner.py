@@ -65,7 +65,7 @@ def main(args):
         
         # Step 3 Clean 02_vRhyme_outdir    
         os.system(f"rm {os.path.join(args['vrhyme_outdir'], 'combined_pro2viral_gn_map.csv')}")
-        os.system(f"rm {os.path.join(args['vrhyme_outdir'], 'combined_viral_faa.faa')}")
+        os.system(f"rm {os.path.join(args['vrhyme_outdir'], 'combined_viral_faa.faa*')}")
         
         time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
         logger.info(f"{time_current} | 02_vRhyme_outdir has been cleaned") 
@@ -0,0 +1,170 @@
+import sys
+import os
+import argparse
+import logging
+import shutil
+import scripts
+from scripts import downloadDB
+from scripts import master_downloader
+from scripts import db_manifest
+from datetime import datetime
+
+
+def fetch_arguments(parser,root_dir,db_path_default):
+    db_subparsers = parser.add_subparsers(help=argparse.SUPPRESS)
+    update_parser = db_subparsers.add_parser(
+        "update",
+        usage=argparse.SUPPRESS,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="""Rebuild the named components of the ViWrap database, and leave the other components as they are
+
+Usage: ViWrap db update --component <components> --conda_env_dir <conda env dir> [options]
+
+Example: ViWrap db update --component refseq,vog --db_dir /path/to/ViWrap_db --conda_env_dir /path/to/ViWrap_conda_environments
+        """,
+    )
+    update_parser.set_defaults(func=main)
+    update_parser.set_defaults(program="db_update")
+    update_parser.add_argument('--component', '-c', dest='component', required=True, default='none', help=r'(required) the db components to rebuild, separated by ",": ' + ', '.join(update_components))
+    update_parser.add_argument('--db_dir','-d', dest='db_dir', required=False, default=db_path_default, help=f'database directory; default = {db_path_default}')
+    update_parser.add_argument('--conda_env_dir', dest='conda_env_dir', required=True, default='none', help=r'(required) the directory where you put your conda environment files. It is the parent directory that contains all the conda environment folders')
+    update_parser.add_argument('--threads','-t', dest='threads', required=False, default=10, help='number of threads (default = 10)')
+    update_parser.add_argument('--hmm_shard_num', dest='hmm_shard_num', required=False, default=0, help='the number of pressed shards of the KEGG, Pfam, and VOG HMM dbs when updating the "vibrant" component; use the same number as in "ViWrap download" (default = 0)')
+    update_parser.add_argument('--db_url_config', dest='db_url_config', required=False, default='none', help=r'a JSON file to replace the URLs and checksums of the files that ViWrap downloads directly (the same as in "ViWrap download"); the VOG HMMs are pinned to vog97, so it is needed to update "vog" to a new release, e.g., {"vog.hmm.tar.gz": {"url": "http://fileshare.csb.univie.ac.at/vog/vog225/vog.hmm.tar.gz"}}')
+    update_parser.add_argument('--root_dir', dest='root_dir', required=False, default=root_dir,help=argparse.SUPPRESS)
+
+
+# Component of "ViWrap db update" => [the db dir it is set up in, its set-up function]; "refseq", "vog", and "imgvr" are the three parts of Tax_classification_db
+update_components = {}
+update_components['refseq'] = ['Tax_classification_db', master_downloader.set_up_refseq_db]
+update_components['vog'] = ['Tax_classification_db', master_downloader.set_up_vog_db]
+update_components['imgvr'] = ['Tax_classification_db', master_downloader.set_up_imgvr_db]
+update_components['vibrant'] = ['VIBRANT_db', master_downloader.set_up_vibrant_db]
+update_components['checkv'] = ['CheckV_db', master_downloader.set_up_checkv_db]
+update_components['iphop'] = ['iPHoP_db', master_downloader.set_up_iphop_db]
+update_components['gtdb'] = ['GTDB_db', master_downloader.set_up_gtdb_db]
+update_components['virsorter2'] = ['VirSorter2_db', master_downloader.set_up_virsorter2_db]
+update_components['dvf'] = ['DVF_db', master_downloader.set_up_dvf_db]
+
+def update_tax_classification_db_part(args, set_up_part):
+    # Set up a part of the Tax classification db in a staging dir, and then move its files into the db,
+    # so that the files of the other parts are kept, and the db is not touched if the set-up fails
+    staging_dir = os.path.join(args['db_dir'], 'Tax_classification_db_update')
+    downloadDB.remove_partial_db_dir(staging_dir)
+    os.mkdir(staging_dir)
+
+    component2version = set_up_part(args, staging_dir)
+    staged_file_names = os.listdir(staging_dir)
+    for db_file_name in os.listdir(args['Tax_classification_db']):
+        # Remove the old files made from a staged file (e.g., "marker_VOG.hmm.h3m" of "marker_VOG.hmm") that the new set-up did not make again
+        db_file = os.path.join(args['Tax_classification_db'], db_file_name)
+        if db_file_name not in staged_file_names and [file_name for file_name in staged_file_names if db_file_name.startswith(file_name + '.')]:
+            if os.path.isdir(db_file):
+                shutil.rmtree(db_file)
+            else:
+                os.remove(db_file)
+    for file_name in staged_file_names:
+        db_file = os.path.join(args['Tax_classification_db'], file_name)
+        if os.path.isdir(db_file):
+            shutil.rmtree(db_file)
+        os.replace(os.path.join(staging_dir, file_name), db_file)
+    os.rmdir(staging_dir)
+
+    return component2version
+
+def update_db_dir(args, db_component_dir, set_up_db_component):
+    # Set up a whole db dir again; the old dir is kept aside until the new one is ready, and is put back if the set-up fails
+    old_dir = db_component_dir + '_old'
+    downloadDB.remove_partial_db_dir(old_dir)
+    if os.path.exists(db_component_dir):
+        os.rename(db_component_dir, old_dir)
+
+    try:
+        component2version = set_up_db_component(args)
+    except Exception:
+        downloadDB.remove_partial_db_dir(db_component_dir)
+        if os.path.exists(old_dir):
+            os.rename(old_dir, db_component_dir)
+        raise
+    downloadDB.remove_partial_db_dir(old_dir)
+
+    return component2version
+
+def update_component(args, component):
+    db_name, set_up_db_component = update_components[component]
+    if db_name == 'Tax_classification_db':
+        return update_tax_classification_db_part(args, set_up_db_component)
+    elif db_name == 'iPHoP_db':
+        return update_db_dir(args, os.path.join(args['db_dir'], 'iPHoP_db'), set_up_db_component)
+    else:
+        return update_db_dir(args, args[db_name], set_up_db_component)
+
+
+def main(args):
+    # Welcome and logger
+    print("### Welcome to ViWrap ###\n")
+
+	## Set up the logger
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(message)s",
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    logger = logging.getLogger(__name__)
+
+    # Step 1 Pre-check inputs
+    start_time = datetime.now().replace(microsecond=0)
+
+    components = [component for component in args['component'].split(',') if component]
+    for component in components:
+        if component not in update_components:
+            sys.exit(f"Unknown db component: {component}; it should be one of these: {', '.join(update_components)}")
+
+    if not os.path.exists(args['conda_env_dir']):
+        sys.exit(f"Could not find conda env dirs within {args['conda_env_dir']}")
+
+    if not os.path.exists(args['db_dir']):
+        sys.exit(f"Could not find directory {args['db_dir']}. Please set up the database by \"ViWrap download\" first")
+
+    if args['db_url_config'] != 'none' and not os.path.exists(args['db_url_config']):
+        sys.exit(f"Could not find the db URL config file {args['db_url_config']}")
+    elif args['db_url_config'] != 'none':
+        scripts.downloadDB.load_db_url_config(args['db_url_config'])
+
+    master_downloader.set_defaults(args)
+
+    if [component for component in components if update_components[component][0] == 'Tax_classification_db'] and not os.path.exists(args['Tax_classification_db']):
+        sys.exit(f"Could not find {args['Tax_classification_db']}. Please set up the database by \"ViWrap download\" first")
+
+    # Step 2 Update each component, record its version in the db manifest, and remove the artifacts made from its old version
+    failed_components = []
+    for component in components:
+        time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+        logger.info(f"{time_current} | Update {component} db. In processing...")
+        try:
+            component2version = update_component(args, component)
+        except Exception as e:
+            time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+            logger.error(f"{time_current} | {component} db could not be updated, the old one is kept: {e}")
+            failed_components.append(component)
+            continue
+
+        old_version = db_manifest.load_db_manifest(args['db_dir'])['components'].get(component, {}).get('version', 'unknown')
+        db_manifest.update_db_manifest(args['db_dir'], component2version)
+        removed_artifacts = db_manifest.invalidate_db_artifacts(args['db_dir'], component)
+
+        time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+        logger.info(f"{time_current} | {component} db has been updated from \"{old_version}\" to \"{component2version[component]}\"")
+        for removed_artifact in removed_artifacts:
+            logger.info(f"{time_current} | {removed_artifact} was made from the old {component} db and has been removed")
+
+    if os.path.exists(args['download_dir']) and not os.listdir(args['download_dir']):
+        os.rmdir(args['download_dir'])
+    if failed_components:
+        sys.exit(f"These db components could not be updated: {', '.join(failed_components)}")
+
+    end_time = datetime.now().replace(microsecond=0)
+    duration = end_time - start_time
+    logger.info(f"The total running time is {duration} (in \"hr:min:sec\" format)")
@@ -5,6 +5,9 @@ import logging
 import scripts
 from scripts import module
 from scripts import downloadDB
+from scripts import tax_db
+from scripts import db_manifest
+from scripts import vibrant_metadata
 from datetime import datetime
 from pathlib import Path
 from glob import glob
@@ -16,6 +19,9 @@ def fetch_arguments(parser,root_dir,db_path_default):
     parser.add_argument('--db_dir','-d', dest='db_dir', required=False, default=db_path_default, help=f'database directory; default = {db_path_default}')
     parser.add_argument('--conda_env_dir', dest='conda_env_dir', required=True, default='none', help=r'(required) the directory where you put your conda environment files. It is the parent directory that contains all the conda environment folders')
     parser.add_argument('--threads','-t', dest='threads', required=False, default=10, help='number of threads (default = 10)')
+    parser.add_argument('--hmm_shard_num', dest='hmm_shard_num', required=False, default=0, help='split KEGG, Pfam, and VOG HMM dbs in VIBRANT db into this number of pressed shards, so that the annotation of viruses identified by VirSorter2 or DeepVirFinder can search (HMM shard x protein chunk) pairs in parallel; 0 means no splitting (default = 0)')
+    parser.add_argument('--download_jobs', dest='download_jobs', required=False, default=3, help=r'number of dbs to download and set up at the same time (default = 3)')
+    parser.add_argument('--db_url_config', dest='db_url_config', required=False, default='none', help=r'a JSON file to replace the URLs and checksums of the files that ViWrap downloads directly, e.g., {"iPHoP.latest.tar.gz": {"url": "http://mirror/iPHoP.latest.tar.gz", "checksum": "md5:..."}}; it can be used for a mirror or a local HTTP server')
     parser.add_argument('--root_dir', dest='root_dir', required=False, default=root_dir,help=argparse.SUPPRESS)
 
 
@@ -31,146 +37,239 @@ def set_defaults(args):
     args['VIBRANT_db'] = os.path.join(args['db_dir'],'VIBRANT_db')
     args['VirSorter2_db'] = os.path.join(args['db_dir'],'VirSorter2_db')
     args['DVF_db'] = os.path.join(args['db_dir'],'DVF_db')    
+    
+    ## Store the dir for downloaded files; files are kept here until the db that uses them has been set up, so that an interrupted download can be resumed
+    args['download_dir'] = os.path.join(args['db_dir'],'download_cache')
 
 
-def main(args):
-    # Welcome and logger
-    print("### Welcome to ViWrap ###\n") 
-
-	## Set up the logger
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )    
-    logger = logging.getLogger(__name__) 
-
-    # Step 1 Pre-check inputs
-    start_time = datetime.now().replace(microsecond=0)
-
-    if not os.path.exists(args['conda_env_dir']):
-        sys.exit(f"Could not find conda env dirs within {args['conda_env_dir']}") 
-    
-    if os.path.exists(args['db_dir']):
-        sys.exit(f"The db dir of {args['db_dir']} has also ready been set up")
-    else:
-        os.mkdir(args['db_dir'])
-    
-    time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
-    logger.info(f"{time_current} | Looks like the input conda software is correct")  
+def set_up_vibrant_db(args):
+    # Each set-up function returns its db components (as in "ViWrap db update") => versions, which are recorded in the db manifest
+    logger = logging.getLogger(__name__)
+    scripts.downloadDB.remove_partial_db_dir(args['VIBRANT_db'])
     
-    set_defaults(args)
-    
-    # Step 2  Make VIBRANT db
+    # Step 1 Make VIBRANT db
     vibrant_db_dir_absolute_path = os.path.abspath(args['VIBRANT_db'])
     os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT')} bash {os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT/bin/download-db.sh')} {vibrant_db_dir_absolute_path}")
+    scripts.downloadDB.check_db_paths([os.path.join(args['VIBRANT_db'], 'databases'), os.path.join(args['VIBRANT_db'], 'files')])
+    
+    ## Step 1.1 Split KEGG, Pfam, and VOG HMMs into pressed shards
+    if int(args['hmm_shard_num']) > 1:
+        hmmpress_cmd = f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT')} hmmpress"
+        for hmm_file in ['KEGG_profiles_prokaryotes.HMM', 'Pfam-A_v32.HMM', 'VOGDB94_phage.HMM']:
+            scripts.downloadDB.shard_hmm_db(os.path.join(args['VIBRANT_db'], 'databases', hmm_file), args['hmm_shard_num'], os.path.join(args['VIBRANT_db'], 'databases/shards'), hmmpress_cmd)
+        
+        time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+        logger.info(f"{time_current} | VIBRANT HMM dbs have been split into {args['hmm_shard_num']} shards")  
+    
+    ## Step 1.2 Compile VIBRANT AMG, name, and KEGG pathway tables into one metadata cache
+    scripts.vibrant_metadata.write_vibrant_metadata(args['VIBRANT_db'])
     
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
-    logger.info(f"{time_current} | VIBRANT db has been set up")  
+    logger.info(f"{time_current} | VIBRANT metadata cache has been made")  
     
+    return {'vibrant': 'KEGG prokaryotes, Pfam-A v32, and VOGDB94 HMMs'}
     
-    # Step 3  Make Tax classification db
-    os.mkdir(args['Tax_classification_db'])
-
+def set_up_refseq_db(args, tax_classification_db_dir):
     ###############################################
     # Part I Download NCBI RefSeq viral protein db#
     ###############################################
+    refseq_release = scripts.downloadDB.get_refseq_release()
 
-    ## Step 3.1 Download NCBI RefSeq viral protein and protein gpff
-    scripts.downloadDB.dl_refseq_viral_protein(args['Tax_classification_db'])
-    scripts.downloadDB.dl_refseq_viral_protein_gpff(args['Tax_classification_db'])
+    ## Step 1.1 Download NCBI RefSeq viral protein and protein gpff
+    scripts.downloadDB.dl_refseq_viral_protein(tax_classification_db_dir, args['download_dir'])
+    gpff_files = scripts.downloadDB.dl_refseq_viral_protein_gpff(tax_classification_db_dir, args['download_dir'])
 
-    ## Step 3.2 Parse to get protein to NCBI taxonomy info
-    scripts.downloadDB.parse_gpff(args['Tax_classification_db'])
+    ## Step 1.2 Parse to get protein to NCBI taxonomy info
+    scripts.downloadDB.parse_gpff(tax_classification_db_dir, gpff_files)
 
-    ## Step 3.3 Grep NCBI RefSeq viral proteins with taxonomy info
-    scripts.downloadDB.grep_NCBI_RefSeq_viral_proteins_w_tax(args['Tax_classification_db'])
+    ## Step 1.3 Grep NCBI RefSeq viral proteins with taxonomy info
+    scripts.downloadDB.grep_NCBI_RefSeq_viral_proteins_w_tax(tax_classification_db_dir)
 
-    ## Step 3.4 Reformat NCBI tax to ICTV 8-rank tax
+    ## Step 1.4 Reformat NCBI tax to ICTV 8-rank tax
     ictv_tax_info = os.path.join(args['root_dir'], 'database/ICTV_Master_Species_List.txt')
-    pro2ictv_8_rank_tax = os.path.join(args['Tax_classification_db'], 'pro2ictv_8_rank_tax.txt')
-    scripts.downloadDB.reformat_NCBI_tax_to_ICTV_8_rank_tax(args['Tax_classification_db'], ictv_tax_info, pro2ictv_8_rank_tax)
+    pro2ictv_8_rank_tax = os.path.join(tax_classification_db_dir, 'pro2ictv_8_rank_tax.txt')
+    scripts.downloadDB.reformat_NCBI_tax_to_ICTV_8_rank_tax(tax_classification_db_dir, ictv_tax_info, pro2ictv_8_rank_tax)
+    
+    ## Step 1.4.1 Compile the protein taxonomy into a sqlite db, so that the taxonomy of best hits can be looked up without parsing the whole table
+    scripts.tax_db.write_tax_db(pro2ictv_8_rank_tax, os.path.join(tax_classification_db_dir, scripts.tax_db.tax_db_name))
 
-    ## Step 3.5 Make diamond blastp db
-    scripts.downloadDB.make_diamond_db(args['Tax_classification_db'])
+    ## Step 1.5 Make diamond blastp db
+    scripts.downloadDB.make_diamond_db(tax_classification_db_dir)
 
-    ## Step 3.6 Remove useless files
-    scripts.downloadDB.remove(args['Tax_classification_db'])
+    ## Step 1.6 Remove useless files
+    scripts.downloadDB.remove(tax_classification_db_dir)
+    scripts.downloadDB.check_db_paths([os.path.join(tax_classification_db_dir, 'NCBI_RefSeq_viral.faa'), os.path.join(tax_classification_db_dir, 'pro2ictv_8_rank_tax.txt'), os.path.join(tax_classification_db_dir, scripts.tax_db.tax_db_name)])
+    scripts.downloadDB.remove_db_files([f'viral.{i}.protein.{x}.gz' for i in range(1, 4) for x in ['faa', 'gpff']], args['download_dir'])
+    
+    return {'refseq': f'RefSeq release {refseq_release}' if refseq_release else 'RefSeq latest'}
     
+def set_up_vog_db(args, tax_classification_db_dir):
     ##########################
     # Part II Download VOG db#
     ##########################
-    ## Step 3.7 Parse to get VOG marker list
+    ## Step 1.7 Parse to get VOG marker list
     vog_marker_table = os.path.join(args['root_dir'], 'database/VOG_marker_table.txt')
-    os.system(f"cp {os.path.join(args['root_dir'], 'database/VOG_marker_table.txt')} {os.path.join(args['Tax_classification_db'], 'VOG_marker_table.txt')}")
+    os.system(f"cp {os.path.join(args['root_dir'], 'database/VOG_marker_table.txt')} {os.path.join(tax_classification_db_dir, 'VOG_marker_table.txt')}")
     vog_marker_list = scripts.downloadDB.get_vog_marker_table(vog_marker_table)
 
-    ## Step 3.8 Download the latest VOG db and pick VOG markers
-    scripts.downloadDB.get_marker_vog_hmm(vog_marker_list, args['Tax_classification_db'])
+    ## Step 1.8 Download the latest VOG db and pick VOG markers
+    hmmpress_cmd = f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-Tax')} hmmpress" # hmmer is in the ViWrap-Tax conda env, which runs hmmsearch to the marker VOG HMMs
+    scripts.downloadDB.get_marker_vog_hmm(vog_marker_list, tax_classification_db_dir, hmmpress_cmd, args['download_dir'])
+    scripts.downloadDB.check_db_paths([os.path.join(tax_classification_db_dir, f'marker_VOG.hmm{x}') for x in ['', '.h3m', '.h3i', '.h3f', '.h3p']])
     
+    return {'vog': scripts.downloadDB.get_db_file_release('vog.hmm.tar.gz')}
+    
+def set_up_imgvr_db(args, tax_classification_db_dir):
     #############################
     # Part III Download IMGVR db#
     #############################
-    ## Step 3.9 cp and degzip IMGVR db
-    os.system(f"cat {os.path.join(args['root_dir'], 'database/IMGVR_high-quality_phage_vOTU_representatives.tar.gz*')} > {os.path.join(args['Tax_classification_db'], 'IMGVR_high-quality_phage_vOTU_representatives.tar.gz')}")
-    os.system(f"tar xzf {os.path.join(args['Tax_classification_db'], 'IMGVR_high-quality_phage_vOTU_representatives.tar.gz')} --directory {args['Tax_classification_db']}")
-    os.system(f"mv {os.path.join(args['Tax_classification_db'], 'IMGVR_high-quality_phage_vOTU_representatives/*')} {args['Tax_classification_db']}")
-    os.system(f"rm {os.path.join(args['Tax_classification_db'], 'IMGVR_high-quality_phage_vOTU_representatives.tar.gz')}")
-    os.system(f"rm -r {os.path.join(args['Tax_classification_db'], 'IMGVR_high-quality_phage_vOTU_representatives')}")
+    ## Step 1.9 cp and degzip IMGVR db
+    os.system(f"cat {os.path.join(args['root_dir'], 'database/IMGVR_high-quality_phage_vOTU_representatives.tar.gz*')} > {os.path.join(tax_classification_db_dir, 'IMGVR_high-quality_phage_vOTU_representatives.tar.gz')}")
+    os.system(f"tar xzf {os.path.join(tax_classification_db_dir, 'IMGVR_high-quality_phage_vOTU_representatives.tar.gz')} --directory {tax_classification_db_dir}")
+    os.system(f"mv {os.path.join(tax_classification_db_dir, 'IMGVR_high-quality_phage_vOTU_representatives/*')} {tax_classification_db_dir}")
+    os.system(f"rm {os.path.join(tax_classification_db_dir, 'IMGVR_high-quality_phage_vOTU_representatives.tar.gz')}")
+    os.system(f"rm -r {os.path.join(tax_classification_db_dir, 'IMGVR_high-quality_phage_vOTU_representatives')}")
     
-    time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
-    logger.info(f"{time_current} | Tax classification db has been set up")    
+    return {'imgvr': 'IMGVR high-quality phage vOTU representatives (in ViWrap)'}
     
-
-    # Step 4 Make CheckV db
+def set_up_tax_classification_db(args):
+    scripts.downloadDB.remove_partial_db_dir(args['Tax_classification_db'])
+    os.mkdir(args['Tax_classification_db'])
+    
+    component2version = {}
+    component2version.update(set_up_refseq_db(args, args['Tax_classification_db']))
+    component2version.update(set_up_vog_db(args, args['Tax_classification_db']))
+    component2version.update(set_up_imgvr_db(args, args['Tax_classification_db']))
+    return component2version
+    
+def set_up_checkv_db(args):
+    scripts.downloadDB.remove_partial_db_dir(args['CheckV_db'])
+    for checkv_db_dir in glob(os.path.join(args['db_dir'], 'checkv-db-v*')):
+        scripts.downloadDB.remove_partial_db_dir(checkv_db_dir)
+        
     os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-CheckV')} checkv download_database {args['db_dir']} >/dev/null 2>&1")
+    checkv_db_version = ', '.join(Path(checkv_db_dir).name for checkv_db_dir in glob(os.path.join(args['db_dir'], 'checkv-db-v*'))) # i.e., checkv-db-v1.5
     os.system(f"mv {os.path.join(args['db_dir'], 'checkv-db-v*')} {args['CheckV_db']}")
-
-    time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
-    logger.info(f"{time_current} | CheckV db has been set up")  
+    scripts.downloadDB.check_db_paths([args['CheckV_db']])
+    
+    return {'checkv': checkv_db_version}
     
+def set_up_iphop_db(args):
+    scripts.downloadDB.remove_partial_db_dir(os.path.join(args['db_dir'], 'iPHoP_db'))
     
-    # Step 5 Make iPHoP db
-    os.system(f"wget https://portal.nersc.gov/cfs/m342/iphop/db/iPHoP.latest.tar.gz -O {os.path.join(args['db_dir'], 'iPHoP.latest.tar.gz')}") 
-    os.mkdir(os.path.join(args['db_dir'], 'iPHoP_db'))
-    os.system(f"tar xzf {os.path.join(args['db_dir'], 'iPHoP.latest.tar.gz')} --directory {os.path.join(args['db_dir'], 'iPHoP_db')}")
+    scripts.downloadDB.extract_db_file('iPHoP.latest.tar.gz', os.path.join(args['db_dir'], 'iPHoP_db'), args['download_dir'])
+    iphop_db_version = ', '.join(Path(iphop_db_dir).name for iphop_db_dir in glob(os.path.join(args['db_dir'], 'iPHoP_db/*_pub'))) # i.e., Aug_2023_pub_rw
     os.system(f"mv {os.path.join(args['db_dir'], 'iPHoP_db/*_pub')} {args['iPHoP_db']}")
-    os.system(f"rm {os.path.join(args['db_dir'], 'iPHoP.latest.tar.gz')}")
+    scripts.downloadDB.check_db_paths([args['iPHoP_db']])
     
-    time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
-    logger.info(f"{time_current} | iPHoP db has been set up")     
+    return {'iphop': iphop_db_version}
     
-
-    # Step 6 Make GTDB-Tk db (v2.1.1) and release 207 v2
-    os.system(f"wget https://data.gtdb.ecogenomic.org/releases/release207/207.0/auxillary_files/gtdbtk_r207_v2_data.tar.gz -O {os.path.join(args['db_dir'], 'gtdbtk_r207_v2_data.tar.gz')}")
-    os.mkdir(args['GTDB_db'])     
-    os.system(f"tar xzf {os.path.join(args['db_dir'], 'gtdbtk_r207_v2_data.tar.gz')} --directory {args['GTDB_db']}")
+def set_up_gtdb_db(args):
+    # GTDB-Tk db (v2.1.1) and release 207 v2
+    scripts.downloadDB.remove_partial_db_dir(args['GTDB_db'])
+    
+    scripts.downloadDB.extract_db_file('gtdbtk_r207_v2_data.tar.gz', args['GTDB_db'], args['download_dir'])
     os.system(f"mv {os.path.join(args['GTDB_db'], 'release207_v2')} {os.path.join(args['GTDB_db'], 'GTDB_db')}")  
-    os.system(f"rm {os.path.join(args['db_dir'], 'gtdbtk_r207_v2_data.tar.gz')}")
+    scripts.downloadDB.check_db_paths([os.path.join(args['GTDB_db'], 'GTDB_db')])
     os.system(f"conda env config vars set GTDBTK_DATA_PATH={os.path.join(args['GTDB_db'], 'GTDB_db')} -p {os.path.join(args['conda_env_dir'], 'ViWrap-GTDBTk')}")
     
-    time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
-    logger.info(f"{time_current} | GTDB-Tk db has been set up") 
+    return {'gtdb': 'release207_v2'}
+    
+def set_up_virsorter2_db(args):
+    scripts.downloadDB.remove_partial_db_dir(args['VirSorter2_db'])
     
-
-    # Step 7 Download VirSorter2 db
     os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-vs2')} virsorter setup -d {args['VirSorter2_db']} -j {args['threads']} >/dev/null 2>&1")
+    scripts.downloadDB.check_db_paths([args['VirSorter2_db']])
     
-    time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
-    logger.info(f"{time_current} | VirSorter2 db has been set up")     
+    return {'virsorter2': 'virsorter setup'}
     
-    # Step 8 Download DVF db
-    os.system(f"git clone  .git {os.path.join(args['db_dir'], 'DVF_db_tmp')}")
+def set_up_dvf_db(args):
+    scripts.downloadDB.remove_partial_db_dir(args['DVF_db'])
+    scripts.downloadDB.remove_partial_db_dir(os.path.join(args['db_dir'], 'DVF_db_tmp'))
+    
+    os.system(f"git clone https://github.com/jessieren/DeepVirFinder.git {os.path.join(args['db_dir'], 'DVF_db_tmp')}")
     os.system(f"mv {os.path.join(args['db_dir'], 'DVF_db_tmp/models')} {args['DVF_db']}")
     os.system(f"rm -rf {os.path.join(args['db_dir'], 'DVF_db_tmp')}")
+    scripts.downloadDB.check_db_paths([args['DVF_db']])
+    
+    return {'dvf': 'DeepVirFinder models'}
+    
+def set_up_and_record_db(args, set_up_db_component):
+    # Set up a db and record the versions of its components in the db manifest
+    component2version = set_up_db_component(args)
+    scripts.db_manifest.update_db_manifest(args['db_dir'], component2version)
+    
+def get_db_components(args):
+    # db component => set-up function; the components do not depend on each other, so they can be set up at the same time
+    db_components = {}
+    db_components['VIBRANT_db'] = lambda: set_up_and_record_db(args, set_up_vibrant_db)
+    db_components['Tax_classification_db'] = lambda: set_up_and_record_db(args, set_up_tax_classification_db)
+    db_components['CheckV_db'] = lambda: set_up_and_record_db(args, set_up_checkv_db)
+    db_components['iPHoP_db'] = lambda: set_up_and_record_db(args, set_up_iphop_db)
+    db_components['GTDB_db'] = lambda: set_up_and_record_db(args, set_up_gtdb_db)
+    db_components['VirSorter2_db'] = lambda: set_up_and_record_db(args, set_up_virsorter2_db)
+    db_components['DVF_db'] = lambda: set_up_and_record_db(args, set_up_dvf_db)
+    return db_components
+    
+def get_db_component_paths(args):
+    # db component => [[the paths that its set-up makes (glob patterns)], [the paths that a finished set-up must have]];
+    # a component that is present without any marker in "download_status" is only used if it is complete, and it is never removed
+    db_component_paths = {}
+    db_component_paths['VIBRANT_db'] = [[args['VIBRANT_db']], [os.path.join(args['VIBRANT_db'], 'databases'), os.path.join(args['VIBRANT_db'], 'files')]]
+    db_component_paths['Tax_classification_db'] = [[args['Tax_classification_db']], [os.path.join(args['Tax_classification_db'], x) for x in ['NCBI_RefSeq_viral.faa', 'pro2ictv_8_rank_tax.txt', scripts.tax_db.tax_db_name]] + [os.path.join(args['Tax_classification_db'], f'marker_VOG.hmm{x}') for x in ['', '.h3m', '.h3i', '.h3f', '.h3p']]]
+    db_component_paths['CheckV_db'] = [[args['CheckV_db'], os.path.join(args['db_dir'], 'checkv-db-v*')], [args['CheckV_db']]]
+    db_component_paths['iPHoP_db'] = [[os.path.join(args['db_dir'], 'iPHoP_db')], [args['iPHoP_db']]]
+    db_component_paths['GTDB_db'] = [[args['GTDB_db']], [os.path.join(args['GTDB_db'], 'GTDB_db')]]
+    db_component_paths['VirSorter2_db'] = [[args['VirSorter2_db']], [args['VirSorter2_db']]]
+    db_component_paths['DVF_db'] = [[args['DVF_db'], os.path.join(args['db_dir'], 'DVF_db_tmp')], [args['DVF_db']]]
+    return db_component_paths
+    
+
+def main(args):
+    # Welcome and logger
+    print("### Welcome to ViWrap ###\n") 
+
+	## Set up the logger
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(message)s",
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )    
+    logger = logging.getLogger(__name__) 
+
+    # Step 1 Pre-check inputs
+    start_time = datetime.now().replace(microsecond=0)
+
+    if not os.path.exists(args['conda_env_dir']):
+        sys.exit(f"Could not find conda env dirs within {args['conda_env_dir']}") 
+        
+    if args['db_url_config'] != 'none' and not os.path.exists(args['db_url_config']):
+        sys.exit(f"Could not find the db URL config file {args['db_url_config']}")
+    elif args['db_url_config'] != 'none':
+        scripts.downloadDB.load_db_url_config(args['db_url_config'])
+    
+    if os.path.exists(args['db_dir']):
+        time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+        logger.info(f"{time_current} | The db dir of {args['db_dir']} exists; only the dbs that have not been set up will be downloaded")  
+    else:
+        os.mkdir(args['db_dir'])
     
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
-    logger.info(f"{time_current} | DVF db has been set up")     
+    logger.info(f"{time_current} | Looks like the input conda software is correct")  
+    
+    set_defaults(args)
     
+    # Step 2 Download and set up all dbs; independent dbs are set up at the same time, and each finished db gets a completion marker in "download_status";
+    # only the dbs that a failed run of the downloader started are removed and set up again, and complete dbs without any marker are used as they are
+    db_components = get_db_components(args)
+    failed_components = scripts.downloadDB.run_db_components(args['db_dir'], db_components, args['download_jobs'], get_db_component_paths(args))
+    if failed_components:
+        sys.exit(f"These dbs could not be set up: {', '.join(failed_components)}; please check the errors above, and rerun the same command to resume them")
+        
+    os.system(f"rm -rf {args['download_dir']}")
 
     end_time = datetime.now().replace(microsecond=0)
     duration = end_time - start_time
-    logger.info(f"The total running time is {duration} (in \"hr:min:sec\" format)")  
-        
\ No newline at end of file
+    logger.info(f"The total running time is {duration} (in \"hr:min:sec\" format)")
\ No newline at end of file
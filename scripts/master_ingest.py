@@ -0,0 +1,64 @@
+import sys
+import os
+import argparse
+import logging
+import scripts
+from scripts import warehouse
+from pathlib import Path
+from datetime import datetime
+
+
+def fetch_arguments(parser,root_dir,db_path_default):
+    parser.set_defaults(func=main)
+    parser.set_defaults(program="ingest")
+    parser.add_argument('--out_dir','-o', dest='out_dir', required=True, default='none', help=r'(required) ViWrap output directory of a finished run (from either "run" or "run_wo_reads"); multiple output directories can be provided, separated by ","')
+    parser.add_argument('--warehouse', '-w', dest='warehouse', required=False, default='./ViWrap_warehouse.sqlite', help=r'the sqlite database file to load results into; it will be created if it does not exist (default = ./ViWrap_warehouse.sqlite)')
+    parser.add_argument('--run_id', dest='run_id', required=False, default='none', help=r'the name to store the run under (default = the name of the output directory); only works when one output directory is provided')
+    parser.add_argument('--force', dest='force', action='store_true', required=False, default=False, help=r're-ingest runs even if their summary files have not changed since the last ingest')
+    parser.add_argument('--root_dir', dest='root_dir', required=False, default=root_dir,help=argparse.SUPPRESS)
+
+def main(args):
+    # Welcome and logger
+    print("### Welcome to ViWrap ###\n")
+
+	## Set up the logger
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(message)s",
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    logger = logging.getLogger(__name__)
+
+    # Step 1 Pre-check inputs
+    out_dirs = [out_dir for out_dir in args['out_dir'].split(',') if out_dir]
+    for out_dir in out_dirs:
+        if not os.path.exists(out_dir):
+            sys.exit(f"Make sure you give the correct path of ViWrap outdir: {out_dir}")
+
+    if args['run_id'] != 'none' and len(out_dirs) != 1:
+        sys.exit(f"The option of --run_id only works when one output directory is provided")
+
+    run_id2out_dir = {} # run_id => out_dir
+    for out_dir in out_dirs:
+        run_id = args['run_id'] if args['run_id'] != 'none' else Path(os.path.abspath(out_dir)).name
+        if run_id in run_id2out_dir:
+            sys.exit(f"Output directories of {run_id2out_dir[run_id]} and {out_dir} have the same name of {run_id}, please ingest them separately with --run_id")
+        run_id2out_dir[run_id] = out_dir
+
+    time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+    logger.info(f"{time_current} | Looks like the input parameters are correct")
+
+    # Step 2 Ingest each run
+    conn = scripts.warehouse.connect_warehouse(args['warehouse'])
+    for run_id in run_id2out_dir:
+        status = scripts.warehouse.ingest_run(conn, run_id2out_dir[run_id], run_id, args['force'])
+        time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+        if status == 'ingested':
+            logger.info(f"{time_current} | Ingest {run_id} into {args['warehouse']}. Finished")
+        elif status == 'skipped':
+            logger.info(f"{time_current} | {run_id} has not changed since the last ingest, skip it")
+        else:
+            logger.info(f"{time_current} | Could not find the summary outdir of a finished run in {run_id2out_dir[run_id]}, skip it")
+    conn.close()
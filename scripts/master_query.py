@@ -0,0 +1,61 @@
+import sys
+import os
+import argparse
+import scripts
+from scripts import warehouse
+
+
+def fetch_arguments(parser,root_dir,db_path_default):
+    parser.set_defaults(func=main)
+    parser.set_defaults(program="query")
+    parser.add_argument('--warehouse', '-w', dest='warehouse', required=False, default='./ViWrap_warehouse.sqlite', help=r'the sqlite database file made by "ViWrap ingest" (default = ./ViWrap_warehouse.sqlite)')
+    parser.add_argument('--ko', dest='ko', required=False, default='none', help=r'list viruses carrying these AMG KOs across all runs, separated by "," (e.g., K00018,K01497)')
+    parser.add_argument('--host', dest='host', required=False, default='none', help=r'list viruses whose predicted host taxonomy contains this text (e.g., g__Microcystis)')
+    parser.add_argument('--taxon', dest='taxon', required=False, default='none', help=r'list viruses whose taxonomy contains this text (e.g., Caudoviricetes)')
+    parser.add_argument('--genome', dest='genome', required=False, default='none', help=r'list the summary info of this virus genome in all runs')
+    parser.add_argument('--list_runs', dest='list_runs', action='store_true', required=False, default=False, help=r'list all ingested runs')
+    parser.add_argument('--sql', dest='sql', required=False, default='none', help=r'run a custom read-only SQL query; tables: runs, genome_info, species_clusters, genus_clusters, taxonomy, host_predictions, amg_proteins, abundance')
+    parser.add_argument('--output', dest='output', required=False, default='-', help=r'the output tsv file (default = print to stdout)')
+    parser.add_argument('--root_dir', dest='root_dir', required=False, default=root_dir,help=argparse.SUPPRESS)
+
+def get_query(args):
+    # Return the SQL and its parameters for the given query option
+    if args['list_runs']:
+        return 'SELECT * FROM runs ORDER BY run_id', ()
+    elif args['ko'] != 'none':
+        kos = args['ko'].split(',')
+        sql = f"""SELECT a.run_id, a.genome, s.species_rep, s.genus, a.protein, a.ko, a.ko_name, a.metabolism
+                  FROM amg_proteins a LEFT JOIN species_clusters s ON s.run_id = a.run_id AND s.genome = a.genome
+                  WHERE a.ko IN ({', '.join(['?'] * len(kos))}) ORDER BY a.ko, a.run_id, a.genome"""
+        return sql, tuple(kos)
+    elif args['host'] != 'none':
+        sql = """SELECT run_id, genome, level, host, host_taxonomy, confidence_score, methods
+                 FROM host_predictions WHERE host_taxonomy LIKE ? ORDER BY run_id, genome"""
+        return sql, (f"%{args['host']}%",)
+    elif args['taxon'] != 'none':
+        sql = """SELECT run_id, genome, lineage, method
+                 FROM taxonomy WHERE lineage LIKE ? ORDER BY run_id, genome"""
+        return sql, (f"%{args['taxon']}%",)
+    elif args['genome'] != 'none':
+        sql = """SELECT g.*, s.species_rep, s.genus, t.lineage
+                 FROM genome_info g LEFT JOIN species_clusters s ON s.run_id = g.run_id AND s.genome = g.genome
+                 LEFT JOIN taxonomy t ON t.run_id = g.run_id AND t.genome = g.genome
+                 WHERE g.genome = ? ORDER BY g.run_id"""
+        return sql, (args['genome'],)
+    else:
+        return args['sql'], ()
+
+def main(args):
+    query_options = [args['ko'] != 'none', args['host'] != 'none', args['taxon'] != 'none', args['genome'] != 'none', args['list_runs'], args['sql'] != 'none']
+    if query_options.count(True) != 1:
+        sys.exit(f"Please provide one of --ko, --host, --taxon, --genome, --list_runs, and --sql")
+
+    # The warehouse is opened read-only, so custom SQL can not change it
+    conn = scripts.warehouse.connect_warehouse(args['warehouse'], read_only = True)
+    sql, params = get_query(args)
+    try:
+        header, rows = scripts.warehouse.query_warehouse(conn, sql, params)
+        scripts.warehouse.write_down_query_result(header, rows, args['output'])
+    except Exception as e:
+        sys.exit(f"Query failed: {str(e)}")
+    conn.close()
@@ -4,6 +4,8 @@ import argparse
 import logging
 import scripts
 from scripts import module
+from scripts import memory_tracker
+from scripts import db_manifest
 from datetime import datetime
 from pathlib import Path
 from glob import glob
@@ -25,6 +27,12 @@ def fetch_arguments(parser,root_dir,db_path_default):
     parser.add_argument('--input_length_limit', dest='input_length_limit', required=False, default=2000, help=r'length in basepairs to limit input sequences (default=2000, can increase but not decrease); 2000 at least suggested for VIBRANT (vb)-based pipeline, 5000 at least suggested for VirSorter2 (vs)-based pipeline')
     parser.add_argument('--custom_MAGs_dir', dest='custom_MAGs_dir', required=False, default='none', help=r'custom MAGs dir that contains only *.fasta files for MAGs reconstructed from the same metagenome, this will be used in iPHoP for host prediction; note that it should be the absolute address path')	
     parser.add_argument('--iPHoP_db_custom_pre', dest='iPHoP_db_custom_pre', required=False, default='none', help=r'custom iPHoP db that has been made from the previous run, this will be used in iPHoP for host prediction by custom db; note that it should be the absolute address path')
+    parser.add_argument('--species_cluster_method', dest='species_cluster_method', required=False, default='drep', help=r'the method to cluster virus species within each genus: drep - run one dRep process per genus (default); shared_sketch - sketch all genomes once by Mash, and run ANI comparisons of all genera in one shared pool (the same clustering thresholds as dRep)')
+    parser.add_argument('--output_format', dest='output_format', required=False, default='tsv', help=r'the format of the summary tables: tsv - only write TSV/CSV tables (default); parquet - also write typed and compressed Parquet tables and a schema file (requires pyarrow), the visualization step will read the Parquet tables directly')
+    parser.add_argument('--gene_caller', dest='gene_caller', required=False, default='prodigal', help=r'the gene caller used to annotate viruses identified by VirSorter2 or DeepVirFinder: prodigal - run Prodigal on split fasta files (default); pyrodigal - call genes in memory by pyrodigal in a process pool and feed proteins to hmmsearch directly without temp files (requires pyrodigal in the ViWrap-VIBRANT conda env)')
+    parser.add_argument('--hmm_search_mode', dest='hmm_search_mode', required=False, default='separate', help=r'the way to search KEGG, Pfam, and VOG HMMs when annotating viruses identified by VirSorter2 or DeepVirFinder: separate - search the three databases one after another (default); merged - search all (database x protein chunk) pairs in one shared work queue, and read proteins only once')
+    parser.add_argument('--max_memory', dest='max_memory', required=False, default=0, help=r'the memory budget (in GB) of the ViWrap glue steps (the steps that ViWrap runs itself between the external tools); a warning is given once the memory usage reaches 80%% and 95%% of the budget, and the peak memory usage is reported in the end; it only monitors the memory usage, since the glue steps always stream sequences from disk instead of storing them (default = 0, no budget)')
+    parser.add_argument('--bgzip_intermediates', dest='bgzip_intermediates', action='store_true', required=False, default=False, help=r'compress the large intermediate sequence files kept in the output directory (all_vRhyme_faa.faa, all_vRhyme_fasta.Nlinked_viral_gn.fasta, and combined_viral_faa.faa) in bgzip format with samtools-compatible ".fai" and ".gzi" indexes at the end of the run, after their last use by ViWrap; it is for archiving the output directory, the indexes let "samtools faidx" look up single sequences later (requires biopython in the ViWrap conda env)')
     parser.add_argument('--root_dir', dest='root_dir', required=False, default=root_dir,help=argparse.SUPPRESS)
     
 
@@ -117,6 +125,40 @@ def main(args):
     
     if os.path.exists(args['iPHoP_db_custom']):
         sys.exit(f"Please make sure that {args['iPHoP_db_custom']} is not present before ViWrap run. If present, please remove the folder") 
+        
+    if args['iPHoP_db_custom_pre'] != 'none' and scripts.db_manifest.get_stale_components(args['iPHoP_db_custom_pre'], args['db_dir']):
+        sys.exit(f"The custom iPHoP db {args['iPHoP_db_custom_pre']} was made before these db components were updated: {', '.join(scripts.db_manifest.get_stale_components(args['iPHoP_db_custom_pre'], args['db_dir']))}. Please run without --iPHoP_db_custom_pre to make it again")
+
+    if args['species_cluster_method'] != 'drep' and args['species_cluster_method'] != 'shared_sketch':
+        sys.exit(f"The species cluster method should be one of these: drep and shared_sketch")
+
+    if args['gene_caller'] != 'prodigal' and args['gene_caller'] != 'pyrodigal':
+        sys.exit(f"The gene caller should be one of these: prodigal and pyrodigal")
+
+    if args['hmm_search_mode'] != 'separate' and args['hmm_search_mode'] != 'merged':
+        sys.exit(f"The HMM search mode should be one of these: separate and merged")
+        
+    if args['output_format'] != 'tsv' and args['output_format'] != 'parquet':
+        sys.exit(f"The output format should be one of these: tsv and parquet")
+    elif args['output_format'] == 'parquet':
+        try:
+            import pyarrow
+        except Exception as e:
+            sys.exit(f"The output format \"parquet\" needs pyarrow, please install it into the ViWrap conda env")
+
+    if args['bgzip_intermediates']:
+        try:
+            from Bio import bgzf
+        except Exception as e:
+            sys.exit(f"The option \"--bgzip_intermediates\" needs biopython, please install it into the ViWrap conda env")
+            
+    try:
+        args['max_memory'] = float(args['max_memory'])
+    except ValueError:
+        sys.exit(f"The memory budget (--max_memory) should be a number in GB")
+    if args['max_memory'] < 0:
+        sys.exit(f"The memory budget (--max_memory) should not be negative")
+    scripts.memory_tracker.start_memory_tracker(args['max_memory']) # Warn before the memory budget is exceeded, and track the peak memory
 
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Looks like the input metagenome and reads, database, and custom MAGs dir (if option used) are now set up well, start up to run ViWrap pipeline")
@@ -190,7 +232,7 @@ def main(args):
         time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
         logger.info(f"{time_current} | Run VIBRANT to check \"keep2\" and \"manual_check\" groups and get the final VirSorter2 virus sequences. Finished")  
 
-        os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT')} python {os.path.join(args['root_dir'],'scripts/run_annotate_by_VIBRANT_db.py')} {args['VIBRANT_db']} {args['identify_method']} {args['virsorter_outdir']} {args['dvf_outdir']} {args['out_dir']} {args['threads']}")
+        os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT')} python {os.path.join(args['root_dir'],'scripts/run_annotate_by_VIBRANT_db.py')} {args['VIBRANT_db']} {args['identify_method']} {args['virsorter_outdir']} {args['dvf_outdir']} {args['out_dir']} {args['threads']} {args['gene_caller']} {args['hmm_search_mode']}")
 
         time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
         logger.info(f"{time_current} | Use KEGG, Pfam, and VOG HMMs to annotate viruses. Finished") 
@@ -203,7 +245,7 @@ def main(args):
         time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
         logger.info(f"{time_current} | Run DeepVirFinder to identify viruses from input metagenome. Finished")   
 
-        os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT')} python {os.path.join(args['root_dir'],'scripts/run_annotate_by_VIBRANT_db.py')} {args['VIBRANT_db']} {args['identify_method']} {args['virsorter_outdir']} {args['dvf_outdir']} {args['out_dir']} {args['threads']}") 
+        os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT')} python {os.path.join(args['root_dir'],'scripts/run_annotate_by_VIBRANT_db.py')} {args['VIBRANT_db']} {args['identify_method']} {args['virsorter_outdir']} {args['dvf_outdir']} {args['out_dir']} {args['threads']} {args['gene_caller']} {args['hmm_search_mode']}") 
         
         time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
         logger.info(f"{time_current} | Use KEGG, Pfam, and VOG HMMs to annotate viruses. Finished") 
@@ -371,6 +413,8 @@ def main(args):
     
     else:
         sys.exit(f"Please make sure your input for --identify_method option is one of these: \"vb-vs\", \"vb-vs-dvf\", \"vb\", \"vs\", and \"dvf\"; you can also omit this in the command line, the default is \"vb\"")
+    
+    scripts.memory_tracker.check_memory('Identify and annotate viruses') # The memory usage is also checked at the end of each step below
 
 
     # Step 3 Metagenomic mapping
@@ -392,6 +436,7 @@ def main(args):
 
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Map reads to metagenome. Finished")
+    scripts.memory_tracker.check_memory('Map reads to metagenome')
    
 
     # Step 4 Run vRhyme
@@ -428,14 +473,17 @@ def main(args):
 
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Run vRhyme to bin viral scaffolds. Finished") 
+    scripts.memory_tracker.check_memory('Run vRhyme to bin viral scaffolds')
     
     
     # Step 5 Run vContact2
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Run vContact2 to cluster viral genomes. In processing...")    
-    ## Step 5.1 Make unbinned viral gn folder
+    ## Step 5.1 Make unbinned viral gn folder and index all viral genomes in the genome catalog
     vRhyme_unbinned_viral_gn_dir = os.path.join(args['vrhyme_outdir'], 'vRhyme_unbinned_viral_gn_fasta')
     scripts.module.make_unbinned_viral_gn(viral_scaffold, vRhyme_best_bin_dir_modified, vRhyme_unbinned_viral_gn_dir)
+    genome_catalog = os.path.join(args['vrhyme_outdir'], 'viral_genome_catalog.json')
+    scripts.module.make_genome_catalog([vRhyme_best_bin_dir_modified, vRhyme_unbinned_viral_gn_dir], genome_catalog)
 
     ## Step 5.2 Prepare pro2viral_gn map file
     pro2viral_gn_map = os.path.join(args['vrhyme_outdir'], 'pro2viral_gn_map.csv')
@@ -458,6 +506,7 @@ def main(args):
  
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Run vContact2 to cluster viral genomes. Finished")   
+    scripts.memory_tracker.check_memory('Run vContact2 to cluster viral genomes')
     
 
     # Step 6 Run CheckV
@@ -475,6 +524,7 @@ def main(args):
 
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Run CheckV to evaluate virus genome quality. Finished")
+    scripts.memory_tracker.check_memory('Run CheckV to evaluate virus genome quality')
     
     
     # Step 7 Run dRep to get viral species
@@ -482,16 +532,17 @@ def main(args):
     logger.info(f"{time_current} | Run dRep to cluster virus species. In processing...") 
     
     ## Step 7.1 Make gn list for each genus
-    scripts.module.get_gn_list_for_genus(genus_cluster_info, args['drep_outdir'], vRhyme_best_bin_dir_modified, vRhyme_unbinned_viral_gn_dir)  
+    scripts.module.get_gn_list_for_genus(genus_cluster_info, args['drep_outdir'], genome_catalog)  
 
     ## Step 7.2 Run dRep
     viral_genus_genome_list_dir = os.path.join(args['drep_outdir'], 'viral_genus_genome_list')
-    os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-dRep')} python {os.path.join(args['root_dir'],'scripts/run_dRep.py')} {args['drep_outdir']} {viral_genus_genome_list_dir} {args['threads']} 2000 >/dev/null 2>&1")
+    os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-dRep')} python {os.path.join(args['root_dir'],'scripts/run_dRep.py')} {args['drep_outdir']} {viral_genus_genome_list_dir} {args['threads']} 2000 {args['species_cluster_method']} >/dev/null 2>&1")
     species_cluster_info = os.path.join(args['out_dir'], 'Species_cluster_info.txt')
     scripts.module.parse_dRep(args['out_dir'], args['drep_outdir'], species_cluster_info, genus_cluster_info, viral_genus_genome_list_dir)
     
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Run dRep to cluster virus species. Finished") 
+    scripts.memory_tracker.check_memory('Run dRep to cluster virus species')
     
     
     # Step 8 Taxonomic charaterization
@@ -500,12 +551,12 @@ def main(args):
     
     ## Step 8.1 Run diamond to NCBI RefSeq viral protein db 
     tax_refseq_output = os.path.join(args['out_dir'], 'tax_refseq_output.txt')
-    os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-Tax')} python {os.path.join(args['root_dir'],'scripts/run_Tax_RefSeq.py')} {args['out_dir']} {vRhyme_best_bin_dir_modified} {vRhyme_unbinned_viral_gn_dir} {args['Tax_classification_db']} {pro2viral_gn_map} {args['threads']} {tax_refseq_output}")
+    os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-Tax')} python {os.path.join(args['root_dir'],'scripts/run_Tax_RefSeq.py')} {args['out_dir']} {vRhyme_best_bin_dir_modified} {vRhyme_unbinned_viral_gn_dir} {args['Tax_classification_db']} {pro2viral_gn_map} {args['threads']} {tax_refseq_output} {genome_catalog}")
 
     ## Step 8.2 Run hmmsearch to marker VOG HMM db
     vog_marker_table = os.path.join(args['Tax_classification_db'], 'VOG_marker_table.txt')
     tax_vog_output = os.path.join(args['out_dir'], 'tax_vog_output.txt')
-    os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-Tax')} python {os.path.join(args['root_dir'],'scripts/run_Tax_VOG.py')} {vog_marker_table} {args['out_dir']} {vRhyme_best_bin_dir_modified} {vRhyme_unbinned_viral_gn_dir} {args['Tax_classification_db']} {pro2viral_gn_map} {args['threads']} {tax_vog_output}")
+    os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-Tax')} python {os.path.join(args['root_dir'],'scripts/run_Tax_VOG.py')} {vog_marker_table} {args['out_dir']} {vRhyme_best_bin_dir_modified} {vRhyme_unbinned_viral_gn_dir} {args['Tax_classification_db']} {pro2viral_gn_map} {args['threads']} {tax_vog_output} {genome_catalog}")
 
     ## Step 8.3 Get taxonomy information from vContact2 result
     tax_vcontact2_output = os.path.join(args['out_dir'], 'tax_vcontact2_output.txt')
@@ -519,6 +570,7 @@ def main(args):
     
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Conduct taxonomic charaterization. Finished")  
+    scripts.memory_tracker.check_memory('Conduct taxonomic charaterization')
     
         
     # Step 9 Host prediction
@@ -531,6 +583,7 @@ def main(args):
 
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Conduct Host prediction by iPHoP. Finished")  
+    scripts.memory_tracker.check_memory('Conduct Host prediction by iPHoP')
     
     ## Step 9.2 Host prediction by iPHoP by adding custom MAGs to host db
     if args['custom_MAGs_dir'] != 'none' and args['iPHoP_db_custom_pre'] == 'none':
@@ -539,6 +592,7 @@ def main(args):
                
         os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-GTDBTk')} python {os.path.join(args['root_dir'],'scripts/add_custom_MAGs_to_host_db__make_gtdbtk_results.py')} {args['out_dir']} {args['custom_MAGs_dir']} {args['threads']} >/dev/null 2>&1")
         os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-iPHoP')} python {os.path.join(args['root_dir'],'scripts/add_custom_MAGs_to_host_db__add_to_db.py')} {args['out_dir']} {args['custom_MAGs_dir']} {args['iPHoP_db']} {args['iPHoP_db_custom']} >/dev/null 2>&1")
+        scripts.db_manifest.write_db_artifact_stamp(args['iPHoP_db_custom'], args['db_dir'], ['iphop', 'gtdb']) # So that a later run can tell if the custom iPHoP db is older than the iPHoP or GTDB-Tk db
         os.system(f"conda run -p {os.path.join(args['conda_env_dir'], 'ViWrap-iPHoP')} python {os.path.join(args['root_dir'],'scripts/run_iPHoP.py')} {all_vRhyme_fasta_Nlinked} {args['iphop_custom_outdir']} {args['iPHoP_db_custom']} {args['threads']} >/dev/null 2>&1")  
 
         time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
@@ -557,13 +611,14 @@ def main(args):
     os.mkdir(args['viwrap_summary_outdir'])
     os.system(f"mv {os.path.join(args['out_dir'],'*.txt')} {args['viwrap_summary_outdir']}")
     virus_raw_abundance = os.path.join(args['viwrap_summary_outdir'],'Virus_raw_abundance.txt')
-    scripts.module.get_virus_raw_abundance(args['mapping_outdir'], vRhyme_best_bin_dir_modified, vRhyme_unbinned_viral_gn_dir, virus_raw_abundance)
+    scripts.module.get_virus_raw_abundance(args['mapping_outdir'], genome_catalog, virus_raw_abundance)
     sample2read_info_file = os.path.join(args['viwrap_summary_outdir'],'Sample2read_info.txt')
     virus_normalized_abundance = os.path.join(args['viwrap_summary_outdir'],'Virus_normalized_abundance.txt')
     scripts.module.get_virus_normalized_abundance(args['mapping_outdir'], virus_raw_abundance, virus_normalized_abundance, sample2read_info, sample2read_info_file)
     
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Get virus genome abundance. Finished") 
+    scripts.memory_tracker.check_memory('Get virus genome abundance')
     
     
     # Step 11 Get all virus sequence information
@@ -577,13 +632,13 @@ def main(args):
     checkv_dict = scripts.module.get_checkv_useful_info(os.path.join(args['checkv_outdir'], 'CheckV_quality_summary.txt'))
     gn2lyso_lytic_result = {}
     if args['identify_method'] == 'vb' or args['identify_method'] == 'vb-vs-dvf' or args['identify_method'] == 'vb-vs':
-        gn2lyso_lytic_result = scripts.module.get_gn_lyso_lytic_result(scf2lytic_or_lyso_summary, vRhyme_best_bin_lytic_and_lysogenic_info, viral_gn_dir)
-    gn2size_and_scf_no_and_pro_count = scripts.module.get_viral_gn_size_and_scf_no_and_pro_count(viral_gn_dir)
+        gn2lyso_lytic_result = scripts.module.get_gn_lyso_lytic_result(scf2lytic_or_lyso_summary, vRhyme_best_bin_lytic_and_lysogenic_info, genome_catalog)
+    gn2size_and_scf_no_and_pro_count = scripts.module.get_viral_gn_size_and_scf_no_and_pro_count(genome_catalog)
     gn2long_scf2kos = ''
     if args['identify_method'] == 'vb':
-        gn2long_scf2kos = scripts.module.get_amg_info_for_vb(args['vibrant_outdir'], Path(args['input_metagenome']).stem, viral_gn_dir)
+        gn2long_scf2kos = scripts.module.get_amg_info_for_vb(args['vibrant_outdir'], Path(args['input_metagenome']).stem, genome_catalog)
     elif args['identify_method'] == 'vs' or args['identify_method'] == 'dvf' or args['identify_method'] == 'vb-vs-dvf' or args['identify_method'] == 'vb-vs':
-        gn2long_scf2kos = scripts.module.get_amg_info_for_vs_and_dvf(args, viral_gn_dir)
+        gn2long_scf2kos = scripts.module.get_amg_info_for_vs_and_dvf(args, genome_catalog)
     gn2amg_statistics = scripts.module.get_amg_statistics(gn2long_scf2kos)
     virus_summary_info = os.path.join(args['viwrap_summary_outdir'],'Virus_summary_info.txt')
     scripts.module.get_virus_summary_info(checkv_dict, gn2lyso_lytic_result, gn2size_and_scf_no_and_pro_count, gn2amg_statistics, virus_summary_info) 
@@ -605,20 +660,33 @@ def main(args):
     scripts.module.write_down_amg_pro2info(AMG_dir, amg_pro2info) # Write down the amg_pro2info dict
     scripts.module.pick_amg_pro(AMG_dir, amg_pro2info, viral_gn_dir) # Pick the AMG proteins and write down the AMG proteins
     
+    ## Step 11.6 Write down the summary tables in Parquet format
+    if args['output_format'] == 'parquet':
+        scripts.module.write_down_summary_tables_in_parquet(args['viwrap_summary_outdir'])
+        
+    ## Step 11.7 Compress and index the large intermediate sequence files
+    if args['bgzip_intermediates']:
+        intermediate_seq_files = [os.path.join(args['vrhyme_outdir'], 'all_vRhyme_faa.faa'), all_vRhyme_fasta_Nlinked, os.path.join(args['vrhyme_outdir'], 'combined_viral_faa.faa'), os.path.join(args['vcontact2_outdir'], 'combined_viral_faa.faa')]
+        scripts.module.bgzip_intermediate_seq_files(intermediate_seq_files)
+    
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Get virus sequence information. Finished")  
+    scripts.memory_tracker.check_memory('Get virus sequence information')
      
    
     # Step 12 Visualize the result
-    scripts.module.generate_result_visualization_inputs(args['viwrap_visualization_outdir'], args['viwrap_summary_outdir'], args['VIBRANT_db'])
+    scripts.module.generate_result_visualization_inputs(args['viwrap_visualization_outdir'], args['viwrap_summary_outdir'], args['VIBRANT_db'], args['output_format'])
     visualization_input_dir = os.path.join(args['viwrap_visualization_outdir'],'Result_visualization_inputs')
     os.system(f"python {os.path.join(args['root_dir'],'scripts/run_Visualization.py')} -i {visualization_input_dir} -r {args['out_dir']} -o '09_Virus_statistics_visualization/Result_visualization_outputs'")
     
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | Visualize the result. Finished")  
+    scripts.memory_tracker.check_memory('Visualize the result')
     
     
     end_time = datetime.now().replace(microsecond=0)
     duration = end_time - start_time
     logger.info(f"The total running time is {duration} (in \"hr:min:sec\" format)")  
+    peak_memory = scripts.memory_tracker.stop_memory_tracker()
+    logger.info(f"The peak memory usage of ViWrap glue steps is {scripts.memory_tracker.format_memory(peak_memory)}")
    
@@ -38,7 +38,7 @@ def main(args):
              
     # Step 2 Install conda env
  
-    os.system(f"mamba create -c bioconda -c conda-forge -p {os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT')} python=3.7 vibrant=1.2.1 scikit-learn=0.21.3 biopython -y >/dev/null 2>&1")
+    os.system(f"mamba create -c bioconda -c conda-forge -p {os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT')} python=3.7 vibrant=1.2.1 scikit-learn=0.21.3 biopython pyrodigal -y >/dev/null 2>&1")
     if os.path.exists(os.path.join(args['conda_env_dir'], 'ViWrap-VIBRANT/bin')):
         logger.info("ViWrap-VIBRANT conda env path has been checked")
     else:
@@ -75,7 +75,7 @@ def main(args):
     time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
     logger.info(f"{time_current} | ViWrap-CheckV conda env has been installed")
     
-    os.system(f"mamba create -c bioconda -c conda-forge -p {os.path.join(args['conda_env_dir'], 'ViWrap-dRep')} python=3 drep=3.4.0 mash mummer -y >/dev/null 2>&1")
+    os.system(f"mamba create -c bioconda -c conda-forge -p {os.path.join(args['conda_env_dir'], 'ViWrap-dRep')} python=3 drep=3.4.0 mash mummer fastani -y >/dev/null 2>&1")
     if os.path.exists(os.path.join(args['conda_env_dir'], 'ViWrap-dRep/bin')):
         logger.info("ViWrap-dRep conda env path has been checked")
     else:
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import logging
+    import resource
+    import threading
+    from datetime import datetime
+    warnings.filterwarnings("ignore")
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# Track the memory usage (RSS) of the ViWrap main process against the memory budget given by "--max_memory";
+# a background thread checks the RSS every few seconds, and a warning is logged once the RSS is close to the budget.
+# The external tools run as their own processes, so only the glue steps of ViWrap itself are tracked here
+
+logger = logging.getLogger(__name__)
+warning_levels = [0.8, 0.95] # Warn once at 80% and once at 95% of the memory budget
+memory_tracker_state = {'max_memory': 0, 'peak_memory': 0, 'warned_levels': set(), 'stop_event': None, 'thread': None}
+
+def get_current_memory():
+    # Return the current RSS in bytes; fall back to the max RSS if /proc is not available (e.g., on macOS)
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status', 'r') as lines:
+            for line in lines:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024 # In kB
+        lines.close()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss # In bytes on macOS
+    return max_rss * 1024 # In kB on Linux
+
+def format_memory(memory):
+    return f"{memory / 1024 ** 3:.2f} GB"
+
+def check_memory(step = ''):
+    # Update the peak memory, and warn if the RSS passes a warning level of the memory budget
+    current_memory = get_current_memory()
+    memory_tracker_state['peak_memory'] = max(memory_tracker_state['peak_memory'], current_memory)
+
+    max_memory = memory_tracker_state['max_memory']
+    if max_memory > 0:
+        for warning_level in warning_levels:
+            if current_memory >= max_memory * warning_level and warning_level not in memory_tracker_state['warned_levels']:
+                memory_tracker_state['warned_levels'].add(warning_level)
+                time_current = f"[{str(datetime.now().replace(microsecond=0))}]"
+                step_info = f" at \"{step}\"" if step else ''
+                logger.warning(f"{time_current} | The memory usage of ViWrap is {format_memory(current_memory)}{step_info}, which is {int(warning_level * 100)}% or more of the memory budget ({format_memory(max_memory)}). Consider increasing \"--max_memory\" or running on a node with more memory")
+    return current_memory
+
+def track_memory(stop_event, interval):
+    while not stop_event.wait(interval):
+        check_memory()
+
+def start_memory_tracker(max_memory_gb, interval = 2):
+    # max_memory_gb: the memory budget in GB; 0 means no budget, and only the peak memory is tracked
+    memory_tracker_state['max_memory'] = float(max_memory_gb) * 1024 ** 3
+    memory_tracker_state['peak_memory'] = 0
+    memory_tracker_state['warned_levels'] = set()
+    check_memory()
+
+    stop_event = threading.Event()
+    thread = threading.Thread(target = track_memory, args = (stop_event, interval), daemon = True) # A daemon thread will not block the exit of ViWrap
+    thread.start()
+    memory_tracker_state['stop_event'] = stop_event
+    memory_tracker_state['thread'] = thread
+
+def stop_memory_tracker():
+    # Stop the background thread and return the peak memory in bytes
+    if memory_tracker_state['thread']:
+        memory_tracker_state['stop_event'].set()
+        memory_tracker_state['thread'].join()
+        memory_tracker_state['thread'] = None
+    check_memory()
+    return memory_tracker_state['peak_memory']
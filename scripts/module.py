@@ -12,20 +12,40 @@ try:
     import pandas as pd
     from statistics import mean
     from collections import defaultdict
+    import json
+    import mmap
+    import gzip
+    import queue
+    import threading
+    import struct
     warnings.filterwarnings("ignore")
     from pathlib import Path
     from glob import glob
     import pyfastx # For fastq and fasta reading and parsing
+    from scripts.vibrant_metadata import load_vibrant_metadata
+    from scripts.genome_catalog import load_genome_catalog
 except Exception as e:
     sys.stderr.write(str(e) + "\n\n")
     exit(1)
  
  
+def open_seq_file(input_seq_file):
+    # Open a sequence file for reading; gzip and bgzip files (ended with ".gz") are read transparently
+    if input_seq_file.endswith('.gz'):
+        return gzip.open(input_seq_file, "rt")
+    return open(input_seq_file, "r")
+    
+def open_seq_file_binary(input_seq_file):
+    # The same as "open_seq_file", but in binary mode, so that the byte offsets of the records can be used to seek
+    if input_seq_file.endswith('.gz'):
+        return gzip.open(input_seq_file, "rb")
+    return open(input_seq_file, "rb")
+    
 def store_seq(input_seq_file): # The input sequence file should be a file with full path
     head = "" # Store the header line
     seq_dict = {} # Store the sequence dict
     
-    with open(input_seq_file, "r") as seq_lines:
+    with open_seq_file(input_seq_file) as seq_lines:
         for line in seq_lines:
             line = line.rstrip("\n") # Remove "\n" in the end
             if ">" in line:
@@ -48,11 +68,163 @@ def store_seq(input_seq_file): # The input sequence file should be a file with f
     
     return seq_dict
     
+def iter_seq(input_seq_file, full_head = False):
+    # The same as "store_seq", but yield (header, seq) one by one instead of storing all sequences;
+    # if full_head is True, the full header line is kept in the same way as "store_seq_with_full_head"
+    head = "" # Store the header line
+    seq_lines_list = [] # Store the sequence lines of the current header
+    
+    with open_seq_file(input_seq_file) as seq_lines:
+        for line in seq_lines:
+            line = line.rstrip("\n") # Remove "\n" in the end
+            if ">" in line:
+                if head:
+                    yield head, "".join(seq_lines_list)
+                if full_head:
+                    head = line
+                else:
+                    head = re.split('[ \t]', line, 1)[0] # Break at the first " " or "\t"
+                seq_lines_list = []
+            else:
+                seq_lines_list.append(line)
+    seq_lines.close()
+    
+    if head:
+        yield head, "".join(seq_lines_list)
+        
+def iter_seq_ids(input_seq_file):
+    # Only yield the headers (without '>') in the same way as "store_seq";
+    # the file is memory-mapped and scanned for "\n>", so sequence lines are never read into Python strings
+    if input_seq_file.endswith('.gz'): # A compressed file can not be memory-mapped, so only stream its header lines
+        with open_seq_file(input_seq_file) as seq_lines:
+            for line in seq_lines:
+                if line.startswith('>'):
+                    yield re.split('[ \t]', line.rstrip('\n'), 1)[0][1:] # Break at the first " " or "\t"
+        seq_lines.close()
+        return
+    with open(input_seq_file, "rb") as seq_file:
+        if os.fstat(seq_file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(seq_file.fileno(), 0, access = mmap.ACCESS_READ) as seq_mmap:
+            start = 0 if seq_mmap[:1] == b'>' else seq_mmap.find(b'\n>') # The position of the next header (or the "\n" before it)
+            while start != -1:
+                if seq_mmap[start:start + 1] == b'\n':
+                    start += 1
+                end = seq_mmap.find(b'\n', start)
+                if end == -1:
+                    end = len(seq_mmap)
+                yield re.split(rb'[ \t]', seq_mmap[start + 1:end], 1)[0].decode() # Break at the first " " or "\t"
+                start = seq_mmap.find(b'\n>', end)
+    seq_file.close()
+    
+def write_down_seq_by_filter(input_seq_file, keep_seq, path_to_file):
+    # Stream the input sequence file and only write down the sequences whose header (without '>') passes "keep_seq";
+    # only one sequence is held in memory at a time
+    seq_file = open(path_to_file,"w")
+    for head, seq in iter_seq(input_seq_file):
+        if keep_seq(head.replace('>', '', 1)):
+            seq_file.write(head + "\n")
+            seq_file.write(seq + "\n")
+    seq_file.close()
+    
+def extract_seq_by_ids(input_seq_file, path_to_file2ids):
+    # Write down the sequences whose header (without '>') is in the ID set of each output file, in one pass;
+    # path_to_file2ids: path_to_file => {ids}
+    # The input sequence file is streamed and only one sequence is held in memory at a time
+    seq_files = {path_to_file: open(path_to_file, "w") for path_to_file in path_to_file2ids}
+    for head, seq in iter_seq(input_seq_file):
+        head_wo_array = head.replace('>', '', 1)
+        for path_to_file in path_to_file2ids:
+            if head_wo_array in path_to_file2ids[path_to_file]:
+                seq_files[path_to_file].write(head + "\n")
+                seq_files[path_to_file].write(seq + "\n")
+    for path_to_file in seq_files:
+        seq_files[path_to_file].close()
+    
+def bgzip_seq_file(input_seq_file):
+    # Compress a sequence file into "{input_seq_file}.gz" in bgzip format, and write down the samtools-compatible ".gz.fai" and ".gz.gzi" indexes;
+    # the plain file is removed, and the path of the bgzip file is returned. Single sequences can then be looked up by "samtools faidx" without decompressing the whole file
+    bgzip_file = input_seq_file + '.gz'
+    
+    # Step 1 Get the faidx index (name, length, offset, line bases, line width) of each sequence from the plain file
+    fai_items = [] # [[name, length, offset, line_bases, line_width]]
+    is_indexable = True # Only sequences with the same line length (except the last line) can be indexed
+    offset = 0
+    with open(input_seq_file, "rb") as seq_lines:
+        for line in seq_lines:
+            offset += len(line)
+            if line.startswith(b'>'):
+                name = re.split(rb'[ \t\r\n]', line[1:], 1)[0].decode()
+                fai_items.append([name, 0, offset, 0, 0])
+                last_line_bases = -1
+            elif fai_items:
+                line_bases = len(line.rstrip(b'\r\n'))
+                fai_item = fai_items[-1]
+                if fai_item[3] == 0:
+                    fai_item[3], fai_item[4] = line_bases, len(line)
+                elif last_line_bases != fai_item[3] or line_bases > fai_item[3]:
+                    is_indexable = False # The previous line is shorter than the first line, but it is not the last line
+                fai_item[1] += line_bases
+                last_line_bases = line_bases
+    seq_lines.close()
+    
+    # Step 2 Compress the plain file
+    bgzip_seq = open_seq_handle(bgzip_file + '.part', 'bgzip')
+    with open(input_seq_file, "rb") as seq_file:
+        chunk = seq_file.read(4194304)
+        while chunk:
+            bgzip_seq.write(chunk)
+            chunk = seq_file.read(4194304)
+    seq_file.close()
+    bgzip_seq.close()
+    os.replace(bgzip_file + '.part', bgzip_file)
+    
+    # Step 3 Write down the ".gzi" index (compressed offset and uncompressed offset of each bgzip block except the first one) and the ".fai" index
+    block_offsets = get_bgzip_block_offsets(bgzip_file)
+    gzi_file = open(bgzip_file + '.gzi', "wb")
+    gzi_file.write(struct.pack('<Q', len(block_offsets) - 1))
+    for compressed_offset, uncompressed_offset in block_offsets[1:]:
+        gzi_file.write(struct.pack('<QQ', compressed_offset, uncompressed_offset))
+    gzi_file.close()
+    
+    if is_indexable:
+        fai_file = open(bgzip_file + '.fai', "w")
+        for fai_item in fai_items:
+            fai_file.write('\t'.join([str(x) for x in fai_item]) + '\n')
+        fai_file.close()
+    
+    os.remove(input_seq_file)
+    return bgzip_file
+    
+def get_bgzip_block_offsets(bgzip_file):
+    # Return [(compressed_offset, uncompressed_offset)] of all bgzip blocks (the empty EOF block is not included) by walking the block headers
+    block_offsets = []
+    compressed_offset, uncompressed_offset = 0, 0
+    with open(bgzip_file, "rb") as bgzip_seq:
+        header = bgzip_seq.read(18)
+        while len(header) == 18:
+            block_size = struct.unpack('<H', header[16:18])[0] + 1 # BSIZE is the total block size minus 1
+            bgzip_seq.seek(compressed_offset + block_size - 4)
+            block_uncompressed_size = struct.unpack('<I', bgzip_seq.read(4))[0] # ISIZE
+            if block_uncompressed_size:
+                block_offsets.append((compressed_offset, uncompressed_offset))
+            compressed_offset += block_size
+            uncompressed_offset += block_uncompressed_size
+            header = bgzip_seq.read(18)
+    bgzip_seq.close()
+    return block_offsets
+    
+def bgzip_intermediate_seq_files(intermediate_seq_files):
+    # Compress and index the intermediate sequence files by "bgzip_seq_file"; the files that are not present are skipped
+    for intermediate_seq_file in intermediate_seq_files:
+        if os.path.exists(intermediate_seq_file):
+            bgzip_seq_file(intermediate_seq_file)
+    
 def store_seq_with_full_head(input_seq_file): # The input sequence file should be a file with full path
     head = "" # Store the header line
     seq_dict = {} # Store the sequence dict
     
-    with open(input_seq_file, "r") as seq_lines:
+    with open_seq_file(input_seq_file) as seq_lines:
         for line in seq_lines:
             line = line.replace("\n","") # Remove "\n"
             if line[0] == ">":
@@ -88,25 +260,129 @@ def get_gene_seq(input_gene_file): # Add the filename to the header;
             
     return gene_dict   
 
-def write_down_seq(seq_dict, path_to_file): 
+def write_down_seq(seq_dict, path_to_file, line_width = 0, compress = 'none'): 
     # Two inputs are required:
     # (1) The dict of the sequence
     # (2) The path that you want to write your sequence down
-    
-    seq_file = open(path_to_file,"w")
-    for head in seq_dict:
-        seq_file.write(head + "\n")
-        seq_file.write(seq_dict[head] + "\n")
-    seq_file.close()       
+    # Two optional inputs:
+    # (3) line_width: wrap the sequence lines at this width (default = 0, no wrapping)
+    # (4) compress: none, gzip, or bgzip (default = none)
+    # Records are joined into large chunks before being written, and the file only appears under its name when it is complete
+    
+    seq_writer = open_seq_writer(path_to_file, compress)
+    try:
+        for chunk in get_seq_chunks(seq_dict.items(), line_width):
+            write_seq_chunk(seq_writer, chunk)
+    except BaseException:
+        close_seq_writer(seq_writer, keep = False)
+        raise
+    close_seq_writer(seq_writer)
+    
+def write_down_seqs(path_to_file2seq_dict, line_width = 0, compress = 'none'):
+    # The batch mode of "write_down_seq" for many small files (e.g., one file per genome); path_to_file2seq_dict: path_to_file => seq_dict
+    # Each file is joined in one reused line buffer and written by one call; small files are compressed in the main thread
+    seq_lines = [] # The reused line buffer
+    for path_to_file in path_to_file2seq_dict:
+        seq_lines.clear()
+        add_seq_lines(seq_lines, path_to_file2seq_dict[path_to_file].items(), line_width)
+        seq_lines.append('') # End the last line with "\n"
+        
+        part_file = path_to_file + '.part'
+        seq_file = open_seq_handle(part_file, compress)
+        seq_file.write("\n".join(seq_lines).encode())
+        seq_file.close()
+        os.replace(part_file, path_to_file)
+    seq_lines.clear()
+    
+def add_seq_lines(seq_lines, seq_items, line_width = 0):
+    # Add the header and sequence lines of each (head, seq) to seq_lines, and return the number of added characters
+    size = 0
+    for head, seq in seq_items:
+        if line_width > 0 and len(seq) > line_width:
+            seq = "\n".join(seq[i:i + line_width] for i in range(0, len(seq), line_width))
+        seq_lines.append(head)
+        seq_lines.append(seq)
+        size += len(head) + len(seq) + 2
+    return size
+    
+def get_seq_chunks(seq_items, line_width = 0, chunk_size = 4194304):
+    # Yield the joined text of about chunk_size (default = 4 MB) characters from (head, seq) items
+    seq_lines = []
+    size = 0
+    for seq_item in seq_items:
+        size += add_seq_lines(seq_lines, [seq_item], line_width)
+        if size >= chunk_size:
+            seq_lines.append('') # End the last line with "\n"
+            yield "\n".join(seq_lines)
+            seq_lines = []
+            size = 0
+    if seq_lines:
+        seq_lines.append('')
+        yield "\n".join(seq_lines)
+    
+def open_seq_handle(path_to_file, compress = 'none'):
+    # Open a binary file handle for writing; compress: none, gzip, or bgzip (bgzip requires biopython)
+    if compress == 'none':
+        return open(path_to_file, 'wb')
+    elif compress == 'gzip':
+        return gzip.open(path_to_file, 'wb', compresslevel = 6)
+    elif compress == 'bgzip':
+        try:
+            from Bio import bgzf
+        except Exception as e:
+            sys.exit(f"The bgzip output needs biopython, please install it into the ViWrap conda env")
+        return bgzf.BgzfWriter(path_to_file, 'wb')
+    else:
+        sys.exit(f"The compression of sequence files should be one of these: none, gzip, and bgzip")
+    
+def open_seq_writer(path_to_file, compress = 'none'):
+    # The output is written into "{path_to_file}.part" and renamed to path_to_file on close, so that an interrupted run never leaves a truncated file;
+    # compressed output is written by a compression thread (zlib releases the GIL), so that joining the next chunk and compressing the last one run at the same time
+    part_file = path_to_file + '.part'
+    seq_writer = {'path_to_file': path_to_file, 'part_file': part_file, 'handle': open_seq_handle(part_file, compress), 'queue': None, 'thread': None, 'error': None}
+    if compress != 'none':
+        seq_writer['queue'] = queue.Queue(maxsize = 4) # At most 4 chunks wait for compression
+        seq_writer['thread'] = threading.Thread(target = compress_seq_chunks, args = (seq_writer,), daemon = True)
+        seq_writer['thread'].start()
+    return seq_writer
+    
+def compress_seq_chunks(seq_writer):
+    # Run in the compression thread until it gets None
+    while True:
+        chunk = seq_writer['queue'].get()
+        if chunk is None:
+            break
+        if seq_writer['error'] is None:
+            try:
+                seq_writer['handle'].write(chunk)
+            except Exception as e:
+                seq_writer['error'] = e # Keep taking chunks, so that the main thread is not blocked
+    
+def write_seq_chunk(seq_writer, chunk):
+    if seq_writer['queue']:
+        seq_writer['queue'].put(chunk.encode())
+    else:
+        seq_writer['handle'].write(chunk.encode())
+    
+def close_seq_writer(seq_writer, keep = True):
+    # Rename the part file to the final file, or remove it if keep is False or the compression thread failed
+    if seq_writer['thread']:
+        seq_writer['queue'].put(None)
+        seq_writer['thread'].join()
+    seq_writer['handle'].close()
+    if keep and seq_writer['error'] is None:
+        os.replace(seq_writer['part_file'], seq_writer['path_to_file'])
+    else:
+        os.remove(seq_writer['part_file'])
+        if seq_writer['error'] is not None:
+            raise seq_writer['error']       
     
 def make_unbinned_viral_gn(viral_scaffold, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir):
+    # All the sequence files are streamed instead of being stored; the proteins (and genes) of a bin are grouped by the scaffold order of the bin fasta file
     viral_scaffold_faa = viral_scaffold.rsplit(".", 1)[0] + ".faa"
     viral_scaffold_ffn = viral_scaffold.rsplit(".", 1)[0] + ".faa"       
-    viral_scaffold_fasta_dict = store_seq_with_full_head(viral_scaffold)
-    viral_scaffold_faa_dict = store_seq_with_full_head(viral_scaffold_faa)
-    viral_scaffold_ffn_dict = store_seq_with_full_head(viral_scaffold_ffn)
     
-    # Step 1 Make unnbinned fasta dict and write down unbinned viral genome fasta file
+    # Step 1 Store the binned scaffolds
     viral_scaffold_fasta_binned_dict = {} # scaffold_id (NODE_10610_length_8667_cov_0.658730) => bin_name (vRhyme_10)
 
     walk = os.walk(vRhyme_best_bin_dir)
@@ -122,116 +398,107 @@ def make_unbinned_viral_gn(viral_scaffold, vRhyme_best_bin_dir, vRhyme_unbinned_
                             scaffold_id = line.replace(">", "", 1).split("__", 1)[1]
                             viral_scaffold_fasta_binned_dict[scaffold_id] = bin_name
                 fasta_lines.close() 
-
-    viral_scaffold_fasta_unbinned_dict = {} # scaffold_id (NODE_10610_length_8667_cov_0.658730) => unbinned_gn_name (vRhyme_unbinned_1)
+                
+    # Step 2 Stream viral scaffolds, name the unbinned ones, and write down unbinned viral genome fasta files
+    scaffold2gn = {} # scaffold_id => gn_name (vRhyme_unbinned_1 or vRhyme_10) 
+    gn2scaffolds = defaultdict(list) # gn_name => [scaffold_ids]
+    faa_gn2path_to_file = {} # gn_name => gn faa file 
+    ffn_gn2path_to_file = {} # gn_name => gn ffn file 
+    
+    os.mkdir(vRhyme_unbinned_viral_gn_dir)
+    
+    unbinned_fasta_batch = {} # path_to_file => seq_dict, written down by "write_down_seqs" whenever it holds about 64 MB of sequences
+    batch_size = 0
     i = 1 
-    for header in viral_scaffold_fasta_dict:
+    for header, seq in iter_seq(viral_scaffold, full_head = True):
         scaffold_id = header.replace(">", "", 1)
-        if scaffold_id not in viral_scaffold_fasta_binned_dict:
-            viral_scaffold_fasta_unbinned_dict[scaffold_id] = f'vRhyme_unbinned_{i}'
+        if scaffold_id not in viral_scaffold_fasta_binned_dict and scaffold_id not in scaffold2gn:
+            unbinned_gn_name = f'vRhyme_unbinned_{i}'
             i += 1
-    
-    os.mkdir(vRhyme_unbinned_viral_gn_dir)    
-    
-    for scaffold_id in viral_scaffold_fasta_unbinned_dict:
-        unbinned_fasta_file = open(f'{vRhyme_unbinned_viral_gn_dir}/{viral_scaffold_fasta_unbinned_dict[scaffold_id]}.fasta',"w")
-        unbinned_fasta_file.write(f'>{viral_scaffold_fasta_unbinned_dict[scaffold_id]}__{scaffold_id}\n')
-        scaffold_id_w_array = ">" + scaffold_id
-        unbinned_fasta_file.write(f'{viral_scaffold_fasta_dict[scaffold_id_w_array]}\n')
-        unbinned_fasta_file.close()
-        
-    # Step 2 Write down unbinned viral genome faa file    
-    viral_scaffold_faa_unbinned_dict = {} # pro_id (NODE_10811_length_8534_cov_0.218494_1  (1..228)        1       PF02229.16      Transcriptional Coactivator p15 (PC4)) => unbinned_gn_name (vRhyme_unbinned_1)
-    for header in viral_scaffold_faa_dict:
-        pro_id = header.replace(">", "", 1)
-        scaffold_id = pro_id.split("\t", 1)[0].rsplit("_", 1)[0]
-        if scaffold_id in viral_scaffold_fasta_unbinned_dict:
-            viral_scaffold_faa_unbinned_dict[pro_id] = viral_scaffold_fasta_unbinned_dict[scaffold_id]
-   
-    
-    for scaffold_id in viral_scaffold_fasta_unbinned_dict:
-        unbinned_faa_file = open(f'{vRhyme_unbinned_viral_gn_dir}/{viral_scaffold_fasta_unbinned_dict[scaffold_id]}.faa',"w")
-        for pro_id in viral_scaffold_faa_unbinned_dict:
-            scaffold_id_within = pro_id.split("\t", 1)[0].rsplit("_", 1)[0]
-            if (scaffold_id_within == scaffold_id):
-                unbinned_faa_file.write(f'>{viral_scaffold_faa_unbinned_dict[pro_id]}__{pro_id}\n')
-                pro_id_w_array = ">" + pro_id
-                unbinned_faa_file.write(f'{viral_scaffold_faa_dict[pro_id_w_array]}\n')
-        unbinned_faa_file.close()    
-        
-    # Step 3 Write down unbinned viral genome ffn file    
-    viral_scaffold_ffn_unbinned_dict = {} # pro_id (NODE_10811_length_8534_cov_0.218494_1  (1..228)        1       PF02229.16      Transcriptional Coactivator p15 (PC4)) => unbinned_gn_name (vRhyme_unbinned_1)
-    for header in viral_scaffold_ffn_dict:
-        pro_id = header.replace(">", "", 1)
-        scaffold_id = pro_id.split("\t", 1)[0].rsplit("_", 1)[0]
-        if scaffold_id in viral_scaffold_fasta_unbinned_dict:
-            viral_scaffold_ffn_unbinned_dict[pro_id] = viral_scaffold_fasta_unbinned_dict[scaffold_id]
-    
-    for scaffold_id in viral_scaffold_fasta_unbinned_dict:
-        unbinned_ffn_file = open(f'{vRhyme_unbinned_viral_gn_dir}/{viral_scaffold_fasta_unbinned_dict[scaffold_id]}.ffn',"w")
-        for pro_id in viral_scaffold_ffn_unbinned_dict:
-            scaffold_id_within = pro_id.split("\t", 1)[0].rsplit("_", 1)[0]
-            if (scaffold_id_within == scaffold_id):
-                unbinned_ffn_file.write(f'>{viral_scaffold_ffn_unbinned_dict[pro_id]}__{pro_id}\n')
-                pro_id_w_array = ">" + pro_id
-                unbinned_ffn_file.write(f'{viral_scaffold_ffn_dict[pro_id_w_array]}\n')
-        unbinned_ffn_file.close()  
-        
-    # Step 4 Write down best bin faa file
-    viral_scaffold_faa_binned_dict = {} # pro_id (NODE_10811_length_8534_cov_0.218494_1  (1..228)        1       PF02229.16      Transcriptional Coactivator p15 (PC4)) => unbinned_gn_name (vRhyme_bin_1)
-    for header in viral_scaffold_faa_dict:
-        pro_id = header.replace(">", "", 1)
-        scaffold_id = pro_id.split("\t", 1)[0].rsplit("_", 1)[0]
-        if scaffold_id in viral_scaffold_fasta_binned_dict:
-            viral_scaffold_faa_binned_dict[pro_id] = viral_scaffold_fasta_binned_dict[scaffold_id]
-
-    binned_faa_name2scaffolds = {} # binned_faa_name to scaffolds
+            unbinned_fasta_batch[f'{vRhyme_unbinned_viral_gn_dir}/{unbinned_gn_name}.fasta'] = {f'>{unbinned_gn_name}__{scaffold_id}': seq}
+            batch_size += len(seq)
+            if batch_size >= 67108864:
+                write_down_seqs(unbinned_fasta_batch)
+                unbinned_fasta_batch, batch_size = {}, 0
+            scaffold2gn[scaffold_id] = unbinned_gn_name
+            gn2scaffolds[unbinned_gn_name].append(scaffold_id)
+            faa_gn2path_to_file[unbinned_gn_name] = f'{vRhyme_unbinned_viral_gn_dir}/{unbinned_gn_name}.faa'
+            ffn_gn2path_to_file[unbinned_gn_name] = f'{vRhyme_unbinned_viral_gn_dir}/{unbinned_gn_name}.ffn'
+    write_down_seqs(unbinned_fasta_batch)
+            
     for scaffold_id in viral_scaffold_fasta_binned_dict:
-        binned_faa_name = viral_scaffold_fasta_binned_dict[scaffold_id].replace("vRhyme","vRhyme_bin",1)
-        if binned_faa_name not in binned_faa_name2scaffolds:
-            binned_faa_name2scaffolds[binned_faa_name] = scaffold_id
-        else:
-            binned_faa_name2scaffolds[binned_faa_name] += "\t" + scaffold_id
-
-    for binned_faa_name in binned_faa_name2scaffolds:
-        binned_faa_file = open(f'{vRhyme_best_bin_dir}/{binned_faa_name}.faa',"w") 
-        scaffolds = binned_faa_name2scaffolds[binned_faa_name].split("\t")
-        for scaffold_id in scaffolds:
-            for pro_id in viral_scaffold_faa_binned_dict:
-                scaffold_id_within = pro_id.split("\t", 1)[0].rsplit("_", 1)[0]
-                if (scaffold_id_within == scaffold_id):
-                    binned_faa_file.write(f'>{viral_scaffold_faa_binned_dict[pro_id]}__{pro_id}\n')
-                    pro_id_w_array = ">" + pro_id
-                    binned_faa_file.write(f'{viral_scaffold_faa_dict[pro_id_w_array]}\n')
-        binned_faa_file.close()
+        bin_name = viral_scaffold_fasta_binned_dict[scaffold_id]
+        scaffold2gn[scaffold_id] = bin_name
+        gn2scaffolds[bin_name].append(scaffold_id)
+        faa_gn2path_to_file[bin_name] = f'{vRhyme_best_bin_dir}/{bin_name.replace("vRhyme","vRhyme_bin",1)}.faa'
+        ffn_gn2path_to_file[bin_name] = f'{vRhyme_best_bin_dir}/{bin_name.replace("vRhyme","vRhyme_bin",1)}.ffn'
         
-    # Step 5 Write down best bin ffn file
-    viral_scaffold_ffn_binned_dict = {} # pro_id (NODE_10811_length_8534_cov_0.218494_1  (1..228)        1       PF02229.16      Transcriptional Coactivator p15 (PC4)) => unbinned_gn_name (vRhyme_bin_1)
-    for header in viral_scaffold_ffn_dict:
-        pro_id = header.replace(">", "", 1)
-        scaffold_id = pro_id.split("\t", 1)[0].rsplit("_", 1)[0]
-        if scaffold_id in viral_scaffold_fasta_binned_dict:
-            viral_scaffold_ffn_binned_dict[pro_id] = viral_scaffold_fasta_binned_dict[scaffold_id]
-
-    binned_ffn_name2scaffolds = {} # binned_ffn_name to scaffolds
-    for scaffold_id in viral_scaffold_fasta_binned_dict:
-        binned_ffn_name = viral_scaffold_fasta_binned_dict[scaffold_id].replace("vRhyme","vRhyme_bin",1)
-        if binned_ffn_name not in binned_ffn_name2scaffolds:
-            binned_ffn_name2scaffolds[binned_ffn_name] = scaffold_id
-        else:
-            binned_ffn_name2scaffolds[binned_ffn_name] += "\t" + scaffold_id
-
-    for binned_ffn_name in binned_ffn_name2scaffolds:
-        binned_ffn_file = open(f'{vRhyme_best_bin_dir}/{binned_ffn_name}.ffn',"w") 
-        scaffolds = binned_ffn_name2scaffolds[binned_ffn_name].split("\t")
-        for scaffold_id in scaffolds:
-            for pro_id in viral_scaffold_ffn_binned_dict:
-                scaffold_id_within = pro_id.split("\t", 1)[0].rsplit("_", 1)[0]
-                if (scaffold_id_within == scaffold_id):
-                    binned_ffn_file.write(f'>{viral_scaffold_ffn_binned_dict[pro_id]}__{pro_id}\n')
-                    pro_id_w_array = ">" + pro_id
-                    binned_ffn_file.write(f'{viral_scaffold_ffn_dict[pro_id_w_array]}\n')
-        binned_ffn_file.close()         
+    # Step 3 Index viral proteins and genes by scaffold, and write down viral genome faa and ffn files   
+    write_down_pro_seq_by_gn(viral_scaffold_faa, scaffold2gn, gn2scaffolds, faa_gn2path_to_file)
+    write_down_pro_seq_by_gn(viral_scaffold_ffn, scaffold2gn, gn2scaffolds, ffn_gn2path_to_file)
+    
+def write_down_pro_seq_by_gn(input_pro_seq_file, scaffold2gn, gn2scaffolds, gn2path_to_file):
+    # Write down the proteins (or genes) of each genome with the header of ">{gn_name}__{pro_id}", grouped by the scaffold order of the genome;
+    # only the byte range of each protein is held in memory (scaffold_id => [(start, end)]), and the sequences are read back from disk by seeking
+    scaffold2pro_ranges = defaultdict(list) # scaffold_id => [(start, end)] of the protein records in the input file
+    with open_seq_file_binary(input_pro_seq_file) as seq_lines:
+        scaffold_id, start, offset = None, 0, 0
+        for line in seq_lines:
+            if b">" in line:
+                if scaffold_id in scaffold2gn:
+                    scaffold2pro_ranges[scaffold_id].append((start, offset))
+                scaffold_id = line[1:].rstrip(b"\n").decode().split("\t", 1)[0].rsplit("_", 1)[0]
+                start = offset
+            offset += len(line)
+        if scaffold_id in scaffold2gn:
+            scaffold2pro_ranges[scaffold_id].append((start, offset))
+    seq_lines.close()
+    
+    with open_seq_file_binary(input_pro_seq_file) as seq_file:
+        for gn_name in gn2path_to_file:
+            gn_file = open(gn2path_to_file[gn_name], "w")
+            for scaffold_id in gn2scaffolds[gn_name]:
+                for start, end in scaffold2pro_ranges.get(scaffold_id, []):
+                    seq_file.seek(start)
+                    record_lines = seq_file.read(end - start).decode().rstrip("\n").split("\n")
+                    gn_file.write(f'>{gn_name}__{record_lines[0].replace(">", "", 1)}\n')
+                    gn_file.write(f'{"".join(record_lines[1:])}\n')
+            gn_file.close()
+    seq_file.close()
+    
+def make_genome_catalog(viral_gn_dirs, genome_catalog):
+    # Index all viral genomes once, so that the downstream steps do not need to glob and re-read every genome file
+    gn2info = {} # gn => {fasta, faa, ffn, scaffolds, size, pro_count}
+    for viral_gn_dir in viral_gn_dirs:
+        all_gn_addrs = glob(f'{viral_gn_dir}/*.fasta')
+        for gn_addr in all_gn_addrs:
+            gn = Path(gn_addr).stem
+            gn_seq = store_seq(gn_addr)
+            
+            size = 0
+            for header in gn_seq:
+                size += len(gn_seq[header])
+            
+            gn_faa_addr = gn_addr.rsplit('.', 1)[0] + '.faa'
+            gn_ffn_addr = gn_addr.rsplit('.', 1)[0] + '.ffn'
+            pro_count = 0
+            if os.path.exists(gn_faa_addr):
+                with open(gn_faa_addr, 'r') as lines:
+                    for line in lines:
+                        if line.startswith('>'):
+                            pro_count += 1
+                lines.close()
+            
+            gn2info[gn] = {'fasta': os.path.abspath(gn_addr),
+                           'faa': os.path.abspath(gn_faa_addr) if os.path.exists(gn_faa_addr) else '',
+                           'ffn': os.path.abspath(gn_ffn_addr) if os.path.exists(gn_ffn_addr) else '',
+                           'scaffolds': [x.replace('>', '', 1) for x in gn_seq],
+                           'size': size,
+                           'pro_count': pro_count}
+            
+    with open(genome_catalog, 'w') as f:
+        json.dump(gn2info, f)
+    f.close()
     
 def get_pro2viral_gn_map(vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, pro2viral_gn_map):
     pro2viral_gn_dict = {}
@@ -275,9 +542,7 @@ def get_pro2viral_gn_map_for_wo_reads(args, pro2viral_gn_map):
     pro2viral_gn_dict = {}
 
     final_virus_faa_file = os.path.join(args['viwrap_summary_outdir'], 'final_virus.faa')
-    final_virus_faa_seq = store_seq(final_virus_faa_file)
-    for header in final_virus_faa_seq:
-        pro = header.replace('>', '' ,1)
+    for pro in iter_seq_ids(final_virus_faa_file):
         viral_gn = pro.rsplit('_', 1)[0]
         pro2viral_gn_dict[pro] = viral_gn
                                      
@@ -339,50 +604,59 @@ def move_virus_genome_files_and_annotation_file(args):
         os.system(f"cp {final_overlapped_virus_faa_file} {final_virus_faa_file}")
         os.system(f"cp {final_overlapped_virus_annotation_file} {final_virus_annotation_file}")      
    
+def combine_seq_files(seq_files, path_to_file):
+    # Stream the sequence files one by one and write down all of them into one file;
+    # only the headers are kept in memory to skip the repeated sequences
+    seen_heads = set()
+    combined_seq_file = open(path_to_file,"w")
+    for seq_file in seq_files:
+        for head, seq in iter_seq(seq_file):
+            if head not in seen_heads:
+                seen_heads.add(head)
+                combined_seq_file.write(head + "\n")
+                combined_seq_file.write(seq + "\n")
+    combined_seq_file.close()
+   
 def combine_all_vRhyme_faa(vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, all_vRhyme_faa):
     walk = os.walk(vRhyme_best_bin_dir)
     walk2 = os.walk(vRhyme_unbinned_viral_gn_dir)
-    all_vRhyme_faa_dict = {}
+    all_vRhyme_faa_files = []
     
     for path, dir_list, file_list in walk:
         for file_name in file_list:
             if "faa" in file_name:
                 file_name_with_path = os.path.join(path, file_name)
-                each_vRhyme_faa_dict = store_seq(file_name_with_path)
-                all_vRhyme_faa_dict.update(each_vRhyme_faa_dict) # Add dict from one to another one
+                all_vRhyme_faa_files.append(file_name_with_path)
 
     for path, dir_list, file_list in walk2:
         for file_name in file_list:
             if "faa" in file_name:
                 file_name_with_path = os.path.join(path, file_name)
-                each_vRhyme_faa_dict = store_seq(file_name_with_path)
-                all_vRhyme_faa_dict.update(each_vRhyme_faa_dict) # Add dict from one to another one
+                all_vRhyme_faa_files.append(file_name_with_path)
                 
-    write_down_seq(all_vRhyme_faa_dict, all_vRhyme_faa)       
+    combine_seq_files(all_vRhyme_faa_files, all_vRhyme_faa)       
 
 def combine_all_vRhyme_fasta(vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, all_vRhyme_fasta):
     walk = os.walk(vRhyme_best_bin_dir)
     walk2 = ''
     if vRhyme_unbinned_viral_gn_dir:
         walk2 = os.walk(vRhyme_unbinned_viral_gn_dir)
-    all_vRhyme_fasta_dict = {}
+    all_vRhyme_fasta_files = []
     
     for path, dir_list, file_list in walk:
         for file_name in file_list:
             if "fasta" in file_name:
                 file_name_with_path = os.path.join(path, file_name)
-                each_vRhyme_faa_dict = store_seq(file_name_with_path)
-                all_vRhyme_fasta_dict.update(each_vRhyme_faa_dict) # Add dict from one to another one
+                all_vRhyme_fasta_files.append(file_name_with_path)
 
     if walk2:
         for path, dir_list, file_list in walk2:
             for file_name in file_list:
                 if "fasta" in file_name:
                     file_name_with_path = os.path.join(path, file_name)
-                    each_vRhyme_faa_dict = store_seq(file_name_with_path)
-                    all_vRhyme_fasta_dict.update(each_vRhyme_faa_dict) # Add dict from one to another one
+                    all_vRhyme_fasta_files.append(file_name_with_path)
                 
-    write_down_seq(all_vRhyme_fasta_dict, all_vRhyme_fasta)     
+    combine_seq_files(all_vRhyme_fasta_files, all_vRhyme_fasta)     
    
 def get_genus_cluster_info(genome_by_genome_file, genus_cluster_info, ref_pro2viral_gn_map):
     genus_cluster_dict = {} # VC => VC, all gn
@@ -483,7 +757,7 @@ def parse_checkv_result(input_dir, outfile):
         f.write(line + "\n")
     f.close()    
     
-def get_gn_list_for_genus(genus_cluster_info, dRep_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir):
+def get_gn_list_for_genus(genus_cluster_info, dRep_outdir, genome_catalog):
     genus_dict = {} # VC => gns
     with open(genus_cluster_info, "r") as genus_cluster:
         for line in genus_cluster:
@@ -493,22 +767,7 @@ def get_gn_list_for_genus(genus_cluster_info, dRep_outdir, vRhyme_best_bin_dir,
                 genus_dict[VC] = line.split(",", 1)[1]
     genus_cluster.close()            
 
-    gn_address = {} # gn stem name => the full path to each genome
-    walk = os.walk(vRhyme_best_bin_dir)
-    for path, dir_list, file_list in walk:
-        for file_name in file_list:
-            if "fasta" in file_name:
-                file_name_with_path = os.path.join(path, file_name)
-                file_name_stem = Path(file_name).stem
-                gn_address[file_name_stem] = file_name_with_path
-   
-    walk2 = os.walk(vRhyme_unbinned_viral_gn_dir)
-    for path, dir_list, file_list in walk2:
-        for file_name in file_list:
-            if "fasta" in file_name:
-                file_name_with_path = os.path.join(path, file_name)
-                file_name_stem = Path(file_name).stem
-                gn_address[file_name_stem] = file_name_with_path
+    gn2info = load_genome_catalog(genome_catalog) # gn => {fasta, faa, ffn, scaffolds, size, pro_count}
 
     os.mkdir(dRep_outdir)   
     os.mkdir(f'{dRep_outdir}/viral_genus_genome_list')      
@@ -517,40 +776,13 @@ def get_gn_list_for_genus(genus_cluster_info, dRep_outdir, vRhyme_best_bin_dir,
         f = open(f'{dRep_outdir}/viral_genus_genome_list/viral_genus_genome_list.{VC}.txt', "w")
         gns = genus_dict[VC].split(";")
         for gn in gns:
-            gn_w_full_path = gn_address[gn]
+            gn_w_full_path = gn2info[gn]['fasta']
             f.write(gn_w_full_path + "\n")
         f.close()      
 
-def get_gn_list_for_genus_for_wo_reads(genus_cluster_info, dRep_outdir, split_viral_gn_dir):
-    genus_dict = {} # VC => gns
-    with open(genus_cluster_info, "r") as genus_cluster:
-        for line in genus_cluster:
-            line = line.rstrip("\n")
-            if 'VC' in line.split(",", 1)[0] and line[0] != '#':
-                VC = line.split(",", 1)[0]
-                genus_dict[VC] = line.split(",", 1)[1]
-    genus_cluster.close()            
+def get_gn_list_for_genus_for_wo_reads(genus_cluster_info, dRep_outdir, genome_catalog):
+    get_gn_list_for_genus(genus_cluster_info, dRep_outdir, genome_catalog)
 
-    gn_address = {} # gn stem name => the full path to each genome
-    walk = os.walk(split_viral_gn_dir)
-    for path, dir_list, file_list in walk:
-        for file_name in file_list:
-            if "fasta" in file_name:
-                file_name_with_path = os.path.join(path, file_name)
-                file_name_stem = Path(file_name).stem
-                gn_address[file_name_stem] = file_name_with_path
-   
-    os.mkdir(dRep_outdir)   
-    os.mkdir(f'{dRep_outdir}/viral_genus_genome_list')      
-    
-    for VC in genus_dict:
-        f = open(f'{dRep_outdir}/viral_genus_genome_list/viral_genus_genome_list.{VC}.txt', "w")
-        gns = genus_dict[VC].split(";")
-        for gn in gns:
-            gn_w_full_path = gn_address[gn]
-            f.write(gn_w_full_path + "\n")
-        f.close()          
-    
 def parse_dRep(viwrap_outdir, dRep_outdir, species_cluster_info, genus_cluster_info, viral_genus_genome_list_dir):
     gn2VC = {} # gn => VC or UnclusteredGenus
     with open(genus_cluster_info, "r") as genus_cluster:
@@ -565,75 +797,61 @@ def parse_dRep(viwrap_outdir, dRep_outdir, species_cluster_info, genus_cluster_i
     
     species_cluster_dict = {} # species_rep => species_rep, gns, genus
 
-    walk = os.walk(dRep_outdir)
-    for path, dir_list, file_list in walk:   
-        for dir_name in dir_list:
-            if 'Output' in dir_name:
-                dir_name_with_path = os.path.join(path, dir_name)
-                Cdb = dir_name_with_path + "/data_tables/Cdb.csv"
-                Wdb = dir_name_with_path + "/data_tables/Wdb.csv"
-                Bdb = dir_name_with_path + "/data_tables/Bdb.csv"
-                
-                cluster2species_rep = {} # cluster => species_rep (within this genus)
-                gn2cluster = {}
-                
-                if os.path.exists(Cdb) and os.path.exists(Wdb):
-                    with open(Wdb, "r") as Wdb_file:
-                        for line in Wdb_file:
-                            line = line.rstrip("/n")
-                            if line.split(",", 1)[0] != 'genome':
-                                species_rep = line.split(",", 1)[0].rsplit(".", 1)[0]
-                                cluster = line.split(",")[1]
-                                cluster2species_rep[cluster] = species_rep
-                    Wdb_file.close()            
-                                
-                    with open(Cdb, "r") as Cdb_file:
-                        for line in Cdb_file:
-                            line = line.rstrip("/n")
-                            if line.split(",", 1)[0] != 'genome':
-                                gn = line.split(",", 1)[0].rsplit(".", 1)[0]
-                                cluster = line.split(",")[1]
-                                gn2cluster[gn] = cluster
-                    Cdb_file.close()  
-                else:
-                    with open(Bdb, "r") as Bdb_file:
-                        for line in Bdb_file:
-                            line = line.rstrip("/n")
-                            if line.split(",", 1)[0] != 'genome':
-                                species_rep = line.split(",", 1)[0].rsplit(".", 1)[0]
-                                cluster = line.split(",")[1]
-                                cluster2species_rep[cluster] = species_rep
-                                gn2cluster[species_rep] = cluster
-                    Bdb_file.close()                      
-                    
-                for cluster in cluster2species_rep:
-                    species_rep = cluster2species_rep[cluster]
-                    species_cluster_dict[species_rep] = ['', '', '']
-                    species_cluster_dict[species_rep][0] = species_rep
-                    species_cluster_dict[species_rep][2] = gn2VC[species_rep]
-                        
-                    gns = [] # Store the genomes within this cluster
-                    for gn in gn2cluster:
-                        if gn2cluster[gn] == cluster:
-                            gns.append(gn)
-                            
-                    species_cluster_dict[species_rep][1] = ';'.join(gns)       
-                                
+    # Only the top-level "Output.VC_*" dirs hold dRep results, so scan dRep_outdir once instead of walking the whole tree
+    dRep_output_dirs = []
+    with os.scandir(dRep_outdir) as entries:
+        for entry in entries:
+            if entry.is_dir() and 'Output' in entry.name:
+                dRep_output_dirs.append(entry.path)
+
+    for dir_name_with_path in dRep_output_dirs:
+        Cdb = dir_name_with_path + "/data_tables/Cdb.csv"
+        Wdb = dir_name_with_path + "/data_tables/Wdb.csv"
+        Bdb = dir_name_with_path + "/data_tables/Bdb.csv"
+
+        cluster2species_rep = {} # cluster => species_rep (within this genus)
+        cluster2gns = defaultdict(list) # cluster => [gns] (within this genus)
+
+        if os.path.exists(Cdb) and os.path.exists(Wdb):
+            with open(Wdb, "r") as Wdb_file:
+                for line in Wdb_file:
+                    tmp = line.rstrip("\n").split(",")
+                    if tmp[0] != 'genome':
+                        species_rep = tmp[0].rsplit(".", 1)[0]
+                        cluster2species_rep[tmp[1]] = species_rep
+            Wdb_file.close()
+
+            with open(Cdb, "r") as Cdb_file:
+                for line in Cdb_file:
+                    tmp = line.rstrip("\n").split(",")
+                    if tmp[0] != 'genome':
+                        gn = tmp[0].rsplit(".", 1)[0]
+                        cluster2gns[tmp[1]].append(gn)
+            Cdb_file.close()
+        elif os.path.exists(Bdb):
+            with open(Bdb, "r") as Bdb_file:
+                for line in Bdb_file:
+                    tmp = line.rstrip("\n").split(",")
+                    if tmp[0] != 'genome':
+                        species_rep = tmp[0].rsplit(".", 1)[0]
+                        cluster2species_rep[tmp[1]] = species_rep
+                        cluster2gns[tmp[1]].append(species_rep)
+            Bdb_file.close()
+
+        for cluster in cluster2species_rep:
+            species_rep = cluster2species_rep[cluster]
+            species_cluster_dict[species_rep] = [species_rep, ';'.join(cluster2gns[cluster]), gn2VC[species_rep]]
+
+    # Singleton genus lists only have one line, so stop reading each list at the second line
     viral_genus_genome_lists = glob(f'{viral_genus_genome_list_dir}/viral_genus_genome_list.*.txt')
-    viral_genus_genome_lists_singleton = []
     for viral_genus_genome_list in viral_genus_genome_lists:
         with open(viral_genus_genome_list, 'r') as fp:
-            line_num = len(fp.readlines())
-            if line_num == 1:
-                viral_genus_genome_lists_singleton.append(viral_genus_genome_list)
-    
-    for viral_genus_genome_list in viral_genus_genome_lists_singleton:
-        with open(viral_genus_genome_list, 'r') as lines:
-            for line in lines:
-                line = line.rstrip('\n')
-                singeton_gn = Path(line).stem
-                species_cluster_dict[singeton_gn] = [singeton_gn, singeton_gn, gn2VC[singeton_gn]]              
-              
+            first_line = fp.readline().rstrip('\n')
+            second_line = fp.readline()
+        if first_line and not second_line:
+            singeton_gn = Path(first_line).stem
+            species_cluster_dict[singeton_gn] = [singeton_gn, singeton_gn, gn2VC[singeton_gn]]
+
     # Store UnclusteredGenus
     for gn in gn2VC:
         if 'UnclusteredGenus' in gn2VC[gn]:
@@ -648,18 +866,13 @@ def parse_dRep(viwrap_outdir, dRep_outdir, species_cluster_info, genus_cluster_i
         f.write(f'{species_rep},{gns},{genus}\n')
     f.close()    
 
-def get_virus_raw_abundance(mapping_result_dir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, virus_raw_abundance):
+def get_virus_raw_abundance(mapping_result_dir, genome_catalog, virus_raw_abundance):
     # Step 1 Get gn2scaffolds dict
     gn2scaffolds = {} # gn => [scaffolds]
     
-    all_gn_addrs1 = glob(f'{vRhyme_best_bin_dir}/*.fasta')
-    all_gn_addrs2 = glob(f'{vRhyme_unbinned_viral_gn_dir}/*.fasta')
-    all_gn_addrs = all_gn_addrs1 + all_gn_addrs2
-    
-    for gn_adds in all_gn_addrs: 
-        gn = Path(gn_adds).stem
-        seqs = store_seq(gn_adds)
-        scaffolds = [x.replace('>', '', 1).split('__', 1)[1] for x in seqs]
+    gn2info = load_genome_catalog(genome_catalog)
+    for gn in gn2info: 
+        scaffolds = [x.split('__', 1)[1] for x in gn2info[gn]['scaffolds']]
         gn2scaffolds[gn] = scaffolds
         
     # Step 2 Store coverm raw coverage table  
@@ -796,13 +1009,10 @@ def parse_vibrant_lytic_and_lysogenic_info(vibrant_outdir, metagenomic_scaffold_
     scf2lytic_or_lyso = {} # scf => [lytic_or_lyso_or_integrated_prophage, integrase_presence_or_absence]
     # lytic_or_lyso_or_integrated_prophage can contain: lytic_scaffold, integrated_prophage (parent scaffold), and lysogenic_scaffold
     # integrase_presence_or_absence can contain: integrase_present and integrase_absent
-    lytic_fasta_seq = store_seq(lytic_fasta_addr)
-    lytic_scf2lytic = {x.replace('>', '', 1):'lytic_scaffold' for x in lytic_fasta_seq}
+    lytic_scf2lytic = {x:'lytic_scaffold' for x in iter_seq_ids(lytic_fasta_addr)}
 
-    lysogenic_fasta_seq = store_seq(lysogenic_fasta_addr)
     lysogenic_scf2lyso = {} # scf => lyso
-    for header in lysogenic_fasta_seq:
-        header_wo_array = header.replace('>', '', 1)
+    for header_wo_array in iter_seq_ids(lysogenic_fasta_addr):
         if '_fragment_' in header_wo_array:
             parent_scaffold = header_wo_array.split('_fragment_', 1)[0]
             lysogenic_scf2lyso[header_wo_array] = f"integrated_prophage ({parent_scaffold})"
@@ -845,10 +1055,9 @@ def get_vRhyme_best_bin_lytic_and_lysogenic_info(vRhyme_best_bin_dir, vrhyme_out
     vRhyme_bin_addrs = glob(os.path.join(vRhyme_best_bin_dir, '*.fasta'))
     for vRhyme_bin_addr in vRhyme_bin_addrs:
         vRhyme_bin = Path(vRhyme_bin_addr).stem
-        vRhyme_bin_seq = store_seq(vRhyme_bin_addr)
         scfs = []
-        for header in vRhyme_bin_seq:
-            scf = header.replace('>', '', 1).split('__', 1)[1]
+        for header_wo_array in iter_seq_ids(vRhyme_bin_addr):
+            scf = header_wo_array.split('__', 1)[1]
             scfs.append(scf)
         vRhyme_bin2scf[vRhyme_bin] = scfs
 
@@ -981,10 +1190,8 @@ def parse_vibrant_lytic_and_lysogenic_info_for_wo_reads(vibrant_outdir, metageno
     lytic_fasta_addr = f'{vibrant_outdir}/VIBRANT_phages_{metagenomic_scaffold_stem_name}/{metagenomic_scaffold_stem_name}.phages_lytic.fna'
     
     scf2lytic_or_lyso = {} # scf => 'lytic' or 'lysogenic'
-    lysogenic_fasta_seq = store_seq(lysogenic_fasta_addr)
-    lysogenic_scf2lyso = {x.replace('>', '', 1):'lysogenic' for x in lysogenic_fasta_seq}
-    lytic_fasta_seq = store_seq(lytic_fasta_addr)
-    lytic_scf2lytic = {x.replace('>', '', 1):'lytic' for x in lytic_fasta_seq}
+    lysogenic_scf2lyso = {x:'lysogenic' for x in iter_seq_ids(lysogenic_fasta_addr)}
+    lytic_scf2lytic = {x:'lytic' for x in iter_seq_ids(lytic_fasta_addr)}
     scf2lytic_or_lyso.update(lysogenic_scf2lyso)
     scf2lytic_or_lyso.update(lytic_scf2lytic)
     
@@ -996,55 +1203,83 @@ def get_checkv_useful_info(CheckV_quality_summary):
     checkv_dict = checkv_table.to_dict() # col => row => value
     return checkv_dict
     
-def get_viral_gn_size_and_scf_no_and_pro_count(viral_gn_dir):
+def get_viral_gn_size_and_scf_no_and_pro_count(genome_catalog):
     gn2size_and_scf_no_and_pro_count = {} # gn => [size, scf_no, pro_count]
-    all_gn_addrs = glob(f'{viral_gn_dir}/*.fasta')
-    for gn_addr in all_gn_addrs:
-        gn = Path(gn_addr).stem
-        gn_seq = store_seq(gn_addr)
-    
-        size = 0
-        for header in gn_seq:
-            size += len(gn_seq[header])
-            
-        scf_no = len(gn_seq)
-        
-        gn_faa_addr = gn_addr.replace('.fasta', '.faa', 1)
-        gn_faa_seq = store_seq(gn_faa_addr)
-        pro_count = len(gn_faa_seq)
-        
-        gn2size_and_scf_no_and_pro_count[gn] = [size, scf_no, pro_count]
+    gn2info = load_genome_catalog(genome_catalog)
+    for gn in gn2info:
+        gn2size_and_scf_no_and_pro_count[gn] = [gn2info[gn]['size'], len(gn2info[gn]['scaffolds']), gn2info[gn]['pro_count']]
     return gn2size_and_scf_no_and_pro_count 
 
-def get_viral_gn_size_and_scf_no_and_pro_count_for_wo_reads(final_virus_fasta_file):
+def get_viral_gn_summary_for_wo_reads(final_virus_fasta_file, final_virus_annotation_file, scf2lytic_or_lyso_summary):
+    # Get genome size, scaffold number, protein count, AMG KO statistics, and lytic state in one streaming pass over each file
     gn2size_and_scf_no_and_pro_count = {} # gn => [size, scf_no, pro_count]
+    gn2amg_statistics = {} # gn => amg_statistics; for example, K00018(3);K01953(4)
+    gn2lyso_lytic_result = {} # gn => lyso_lytic_property
+    
+    # Step 1 Get genome size from final_virus_fasta_file (each scaffold is treated as a genome)
+    gn = ''
+    with open(final_virus_fasta_file, 'r') as lines:
+        for line in lines:
+            line = line.rstrip('\n')
+            if line.startswith('>'):
+                gn = line[1:]
+                if ' ' in gn: # Break at the first " " or "\t", the same as "store_seq"
+                    gn = re.split(' |\t', gn, 1)[0]
+                gn2size_and_scf_no_and_pro_count[gn] = [0, 1, 0]
+            else:
+                gn2size_and_scf_no_and_pro_count[gn][0] += len(line)
+    lines.close()
+    
+    # Step 2 Get protein count from final_virus_faa_file (only the headers are read)
     final_virus_faa_file = final_virus_fasta_file.replace('.fasta', '.faa', 1)
-    final_virus_fasta_file_seq = store_seq(final_virus_fasta_file)
-    final_virus_faa_file_seq = store_seq(final_virus_faa_file)
-    for header in final_virus_fasta_file_seq:
-        header_wo_array = header.replace('>', '', 1)
-        gn = header_wo_array
-        size = len(final_virus_fasta_file_seq[header])
-        scf_no = 1
-        pro_count = 0
-        for pro_header in final_virus_faa_file_seq:
-            gn_from_pro_header = pro_header.replace('>', '', 1).rsplit('_', 1)[0]
-            if gn_from_pro_header == gn:
-                pro_count = pro_count + 1
-        gn2size_and_scf_no_and_pro_count[gn] = [size, scf_no, pro_count]       
-    return gn2size_and_scf_no_and_pro_count     
-    
-def get_amg_info_for_vb(vibrant_outdir, metagenomic_scaffold_stem_name, viral_gn_dir):
+    with open(final_virus_faa_file, 'r') as lines:
+        for line in lines:
+            if line.startswith('>'):
+                pro = line.rstrip('\n')[1:]
+                if ' ' in pro:
+                    pro = re.split(' |\t', pro, 1)[0]
+                gn_from_pro = pro.rsplit('_', 1)[0]
+                if gn_from_pro in gn2size_and_scf_no_and_pro_count:
+                    gn2size_and_scf_no_and_pro_count[gn_from_pro][2] += 1
+    lines.close()
+    
+    # Step 3 Get AMG KO statistics from final_virus_annotation_file (only AMG KO will be counted)
+    gn2ko2hit_num = defaultdict(dict) # gn => ko => hit_num
+    with open(final_virus_annotation_file, 'r') as lines:
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line.startswith('protein\t'):
+                tmp = line.split('\t')
+                if tmp[3] == 'AMG':
+                    gn2ko2hit_num[tmp[1]][tmp[2]] = gn2ko2hit_num[tmp[1]].get(tmp[2], 0) + 1
+    lines.close()
+    
+    for gn in gn2ko2hit_num:
+        gn2amg_statistics[gn] = ';'.join([f'{ko}({hit_num})' for ko, hit_num in gn2ko2hit_num[gn].items()])
+        
+    # Step 4 Get lytic state from scf2lytic_or_lyso_summary (only for VIBRANT-based methods)
+    if scf2lytic_or_lyso_summary:
+        scf2lytic_or_lyso = {} # scf => lytic_or_lyso_or_integrated_prophage
+        with open(scf2lytic_or_lyso_summary, 'r') as lines:
+            for line in lines:
+                tmp = line.rstrip('\n').split('\t')
+                if tmp[0] != 'scaffold':
+                    scf2lytic_or_lyso[tmp[0]] = tmp[1].split(' (', 1)[0]
+        lines.close()
+        
+        for gn in gn2size_and_scf_no_and_pro_count:
+            gn2lyso_lytic_result[gn] = scf2lytic_or_lyso[gn]
+            
+    return gn2size_and_scf_no_and_pro_count, gn2amg_statistics, gn2lyso_lytic_result
+    
+def get_amg_info_for_vb(vibrant_outdir, metagenomic_scaffold_stem_name, genome_catalog):
     gn2long_scf2kos = defaultdict(dict) # gn => long_scf => [kos]
     
     # Step 1 Get gn2long_scfs dict
     gn2long_scfs = {} # gn => [long_scfs]
-    all_gn_addrs = glob(f'{viral_gn_dir}/*.fasta')
-    for gn_addr in all_gn_addrs:
-        gn = Path(gn_addr).stem
-        gn_seq = store_seq(gn_addr)
-        long_scfs = [x.replace('>', '', 1) for x in gn_seq]
-        gn2long_scfs[gn] = long_scfs 
+    gn2info = load_genome_catalog(genome_catalog)
+    for gn in gn2info:
+        gn2long_scfs[gn] = gn2info[gn]['scaffolds']
         
     # Step 2 Get scf2kos dict
     scf2kos = defaultdict(list) # scf => [kos]; kos here only include AMG KOs
@@ -1068,61 +1303,20 @@ def get_amg_info_for_vb(vibrant_outdir, metagenomic_scaffold_stem_name, viral_gn
 def get_amg_pro_info(AMG_dir, virus_annotation_result_file, VIBRANT_db):
     amg_pro2info = {} # amg_pro => [long_scf, ko, ko_name, metabolisms, pathways, categories]
     
-    # Step 1 Store the metabolism and pathway kos
-    metabolism2kos = {} # metabolism => [kos]
-    pathway2kos = {} # pathway => [kos]
-    KEGG_pathway_file = os.path.join(VIBRANT_db, 'files/VIBRANT_KEGG_pathways_summary.tsv')
-    with open(KEGG_pathway_file,  'rU') as lines: # 'U' to deal with either dos or unix file format
-        for line in lines:
-            line = line.rstrip('\n')
-            tmp = line.split('\t')
-            if 'map' in tmp[0]:
-                metabolism, pathway, ko_arrary = tmp[1], tmp[2], tmp[3]
-                if metabolism[0] == '"' and metabolism[-1] == '"':
-                    metabolism = metabolism.strip('"').rstrip('"')
-                if pathway[0] == '"' and pathway[-1] == '"':
-                    pathway = pathway.strip('"').rstrip('"')                 
-                kos = ko_arrary.split('~')
-                metabolism2kos[metabolism] = kos
-                pathway2kos[pathway] = kos
-    lines.close()            
+    # Step 1 Load the KO => metabolisms, pathways, and categories indexes
+    vibrant_metadata = load_vibrant_metadata(VIBRANT_db)
+    all_amg_kos = vibrant_metadata['amg_kos'] # Store all the amg kos
     
-    all_amg_kos = [] # Store all the amg kos
-    VIBRANT_AMGs_file = os.path.join(VIBRANT_db, 'files/VIBRANT_AMGs.tsv')
-    with open(VIBRANT_AMGs_file,  'rU') as lines: # 'U' to deal with either dos or unix file format  
-        for line in lines:
-            line = line.rstrip('\n')
-            if line != 'KO' and line.startswith('K'):
-                all_amg_kos.append(line)
-    lines.close()                
-                
-    # Step 2 Store category kos
-    category2kos = {} # category => [kos]
-    # XXXXXXXXX ADD LATER
-    
-    
-    # Step 3 Store ko2metablisms, ko2pathways, ko2categories dicts
+    # Step 2 Store ko2metablisms, ko2pathways, ko2categories dicts for AMG kos
     ko2metablisms = {} # ko => metabolisms
     ko2pathways = {} # ko => pathways
     ko2categories = {} # ko => categories
     for ko in all_amg_kos:
-        metabolism_hits = set()
-        pathway_hits = set()
-        category_hits = set()
-        for metabolism in metabolism2kos:
-            if ko in metabolism2kos[metabolism]:
-                metabolism_hits.add(metabolism)
-        for pathway in pathway2kos:
-            if ko in pathway2kos[pathway]:
-                pathway_hits.add(pathway)                
-        for category in category2kos:
-            if ko in category2kos[category]:
-                category_hits.add(category)
-        ko2metablisms[ko] = ' | '.join(list(metabolism_hits))
-        ko2pathways[ko] = ' | '.join(list(pathway_hits)) 
-        ko2categories[ko] = ' | '.join(list(category_hits))                                 
-    
-    # Step 4 Parse virus_annotation_result to get useful information for AMG KOs
+        ko2metablisms[ko] = ' | '.join(vibrant_metadata['ko2metabolisms'].get(ko, []))
+        ko2pathways[ko] = ' | '.join(vibrant_metadata['ko2pathways'].get(ko, []))
+        ko2categories[ko] = ' | '.join(vibrant_metadata['ko2categories'].get(ko, []))
+    
+    # Step 3 Parse virus_annotation_result to get useful information for AMG KOs
     with open(virus_annotation_result_file, 'r') as lines:
         for line in lines:
             line = line.rstrip('\n')
@@ -1143,61 +1337,20 @@ def get_amg_pro_info(AMG_dir, virus_annotation_result_file, VIBRANT_db):
 def get_amg_pro_info_for_wo_reads(AMG_dir, virus_annotation_result_file, VIBRANT_db):
     amg_pro2info = {} # amg_pro => [scf, ko, ko_name, metabolisms, pathways, categories]
     
-    # Step 1 Store the metabolism and pathway kos
-    metabolism2kos = {} # metabolism => [kos]
-    pathway2kos = {} # pathway => [kos]
-    KEGG_pathway_file = os.path.join(VIBRANT_db, 'files/VIBRANT_KEGG_pathways_summary.tsv')
-    with open(KEGG_pathway_file,  'rU') as lines: # 'U' to deal with either dos or unix file format
-        for line in lines:
-            line = line.rstrip('\n')
-            tmp = line.split('\t')
-            if 'map' in tmp[0]:
-                metabolism, pathway, ko_arrary = tmp[1], tmp[2], tmp[3]
-                if metabolism[0] == '"' and metabolism[-1] == '"':
-                    metabolism = metabolism.strip('"').rstrip('"')
-                if pathway[0] == '"' and pathway[-1] == '"':
-                    pathway = pathway.strip('"').rstrip('"')                 
-                kos = ko_arrary.split('~')
-                metabolism2kos[metabolism] = kos
-                pathway2kos[pathway] = kos
-    lines.close()            
+    # Step 1 Load the KO => metabolisms, pathways, and categories indexes
+    vibrant_metadata = load_vibrant_metadata(VIBRANT_db)
+    all_amg_kos = vibrant_metadata['amg_kos'] # Store all the amg kos
     
-    all_amg_kos = [] # Store all the amg kos
-    VIBRANT_AMGs_file = os.path.join(VIBRANT_db, 'files/VIBRANT_AMGs.tsv')
-    with open(VIBRANT_AMGs_file,  'rU') as lines: # 'U' to deal with either dos or unix file format  
-        for line in lines:
-            line = line.rstrip('\n')
-            if line != 'KO' and line.startswith('K'):
-                all_amg_kos.append(line)
-    lines.close()                
-                
-    # Step 2 Store category kos
-    category2kos = {} # category => [kos]
-    # XXXXXXXXX ADD LATER
-    # XXXX 合并kos
-    
-    # Step 3 Store ko2metablisms, ko2pathways, ko2categories dicts
+    # Step 2 Store ko2metablisms, ko2pathways, ko2categories dicts for AMG kos
     ko2metablisms = {} # ko => metabolisms
     ko2pathways = {} # ko => pathways
     ko2categories = {} # ko => categories
     for ko in all_amg_kos:
-        metabolism_hits = set()
-        pathway_hits = set()
-        category_hits = set()
-        for metabolism in metabolism2kos:
-            if ko in metabolism2kos[metabolism]:
-                metabolism_hits.add(metabolism)
-        for pathway in pathway2kos:
-            if ko in pathway2kos[pathway]:
-                pathway_hits.add(pathway)                
-        for category in category2kos:
-            if ko in category2kos[category]:
-                category_hits.add(category)
-        ko2metablisms[ko] = ' | '.join(list(metabolism_hits))
-        ko2pathways[ko] = ' | '.join(list(pathway_hits)) 
-        ko2categories[ko] = ' | '.join(list(category_hits))                                 
-    
-    # Step 4 Parse virus_annotation_result to get useful information for AMG KOs
+        ko2metablisms[ko] = ' | '.join(vibrant_metadata['ko2metabolisms'].get(ko, []))
+        ko2pathways[ko] = ' | '.join(vibrant_metadata['ko2pathways'].get(ko, []))
+        ko2categories[ko] = ' | '.join(vibrant_metadata['ko2categories'].get(ko, []))
+    
+    # Step 3 Parse virus_annotation_result to get useful information for AMG KOs
     with open(virus_annotation_result_file, 'r') as lines:
         for line in lines:
             line = line.rstrip('\n')
@@ -1254,25 +1407,16 @@ def pick_amg_pro(AMG_dir, amg_pro2info, viral_gn_dir):
 def pick_amg_pro_for_wo_reads(AMG_dir, amg_pro2info, final_virus_faa_file):
     amg_pro_seq_file = os.path.join(AMG_dir,'AMG_pros.faa')  # sequence file for AMG proteins 
     
-    all_amg_pro_seq = {} # Store all the AMG proteins
-    faa_seq = store_seq(final_virus_faa_file) 
-    for header_w_array in faa_seq:
-        header = header_w_array.replace('>', '', 1)
-        if header in amg_pro2info:
-            all_amg_pro_seq[header_w_array] = faa_seq[header_w_array]
-    write_down_seq(all_amg_pro_seq, amg_pro_seq_file)     
-
-def get_amg_info_for_vs_and_dvf(args, viral_gn_dir):
+    write_down_seq_by_filter(final_virus_faa_file, lambda header: header in amg_pro2info, amg_pro_seq_file) # Stream all the proteins and only keep the AMG proteins    
+
+def get_amg_info_for_vs_and_dvf(args, genome_catalog):
     gn2long_scf2kos = defaultdict(dict) # gn => long_scf => [kos]
     
     # Step 1 Get gn2long_scfs dict
     gn2long_scfs = {} # gn => [long_scfs]
-    all_gn_addrs = glob(f'{viral_gn_dir}/*.fasta')
-    for gn_addr in all_gn_addrs:
-        gn = Path(gn_addr).stem
-        gn_seq = store_seq(gn_addr)
-        long_scfs = [x.replace('>', '', 1) for x in gn_seq]
-        gn2long_scfs[gn] = long_scfs 
+    gn2info = load_genome_catalog(genome_catalog)
+    for gn in gn2info:
+        gn2long_scfs[gn] = gn2info[gn]['scaffolds']
         
     # Step 2 Get scf2kos dict
     scf2kos = defaultdict(list) # scf => [kos]
@@ -1319,33 +1463,6 @@ def get_amg_statistics(gn2long_scf2kos):
         
     return gn2amg_statistics 
 
-def get_amg_statistics_for_wo_reads(final_virus_annotation_file):
-    gn2amg_statistics = {} # gn => amg_statistics; for example, K00018(3);K01953(4)
-    # Step 1 Parse final_virus_annotation_file to get gn2kos dict (only AMG KO will be counted)
-    gn2kos = defaultdict(list) # gn => [kos]
-    with open(final_virus_annotation_file,'r') as lines:
-        for line in lines:
-            line = line.rstrip('\n')
-            if not line.startswith('protein\t'):
-                tmp = line.split('\t')
-                gn, ko = tmp[1], tmp[2]
-                if tmp[3] == 'AMG':
-                    gn2kos[gn].append(ko)    
-    
-    # Step 2 Parse to get gn2amg_statistics
-    for gn in gn2kos:
-        amg_statistics_list = []
-        ko2hit_num = {} # ko => hit_num
-        kos = gn2kos[gn]
-        for ko in kos:
-            ko2hit_num[ko] = ko2hit_num.get(ko, 0) + 1
-        for ko in ko2hit_num:
-            hit_num = ko2hit_num[ko]
-            amg_statistics_list.append(f'{ko}({hit_num})')
-        gn2amg_statistics[gn] = ';'.join(amg_statistics_list)    
-        
-    return gn2amg_statistics
-
 def write_down_gn2amg_statistics(AMG_dir, gn2amg_statistics):
     f = open(os.path.join(AMG_dir,'Gn2amg_statistics.txt'), 'w')  # The name of the output file
     header = 'Gn\tAMG_KOs\n'
@@ -1389,6 +1506,12 @@ def get_run_input_arguments(args):
     argu_items.append('--input_length_limit' + ' ' + str(args['input_length_limit']))
     if args['custom_MAGs_dir'] != 'none': argu_items.append('--custom_MAGs_dir' + ' ' + args['custom_MAGs_dir'])
     if args['iPHoP_db_custom_pre'] != 'none': argu_items.append('--iPHoP_db_custom_pre' + ' ' + args['iPHoP_db_custom_pre'])
+    if args['species_cluster_method'] != 'drep': argu_items.append('--species_cluster_method' + ' ' + args['species_cluster_method'])
+    if args['output_format'] != 'tsv': argu_items.append('--output_format' + ' ' + args['output_format'])
+    if args['gene_caller'] != 'prodigal': argu_items.append('--gene_caller' + ' ' + args['gene_caller'])
+    if args['hmm_search_mode'] != 'separate': argu_items.append('--hmm_search_mode' + ' ' + args['hmm_search_mode'])
+    if str(args['max_memory']) != '0': argu_items.append('--max_memory' + ' ' + str(args['max_memory']))
+    if args['bgzip_intermediates']: argu_items.append('--bgzip_intermediates')
     
     command += " ".join(argu_items)
     return command
@@ -1405,6 +1528,11 @@ def get_run_input_arguments_wo_reads(args):
     if args['virome']: argu_items.append('--virome')
     argu_items.append('--input_length_limit' + ' ' + str(args['input_length_limit']))
     if args['custom_MAGs_dir'] != 'none': argu_items.append('--custom_MAGs_dir' + ' ' + args['custom_MAGs_dir'])
+    if args['species_cluster_method'] != 'drep': argu_items.append('--species_cluster_method' + ' ' + args['species_cluster_method'])
+    if args['gene_caller'] != 'prodigal': argu_items.append('--gene_caller' + ' ' + args['gene_caller'])
+    if args['hmm_search_mode'] != 'separate': argu_items.append('--hmm_search_mode' + ' ' + args['hmm_search_mode'])
+    if str(args['max_memory']) != '0': argu_items.append('--max_memory' + ' ' + str(args['max_memory']))
+    if args['bgzip_intermediates']: argu_items.append('--bgzip_intermediates')
     
     command += " ".join(argu_items)
     return command    
@@ -1677,22 +1805,7 @@ def get_keep2_mc_seq(virsorter_outdir, keep2_list_file, manual_check_list_file,
     lines.close()  
 
     # Step 2 Make keep2_fasta, manual_check_fasta
-    all_seq = store_seq(os.path.join(virsorter_outdir, 'pass2/final-viral-combined.fa'))
-    
-    all_seq_keep2 = {}
-    for header in all_seq:
-        header_wo_array = header.replace('>', '', 1)
-        if header_wo_array in keep2_list:
-            all_seq_keep2[header] = all_seq[header]
-            
-    all_seq_manual_check = {}
-    for header in all_seq:
-        header_wo_array = header.replace('>', '', 1)
-        if header_wo_array in manual_check_list:
-            all_seq_manual_check[header] = all_seq[header] 
-            
-    write_down_seq(all_seq_keep2, keep2_fasta) 
-    write_down_seq(all_seq_manual_check, manual_check_fasta) 
+    extract_seq_by_ids(os.path.join(virsorter_outdir, 'pass2/final-viral-combined.fa'), {keep2_fasta: set(keep2_list), manual_check_fasta: set(manual_check_list)})
 
 def get_keep2_vb_passed_list(virsorter_outdir, keep2_vb_result, keep2_list_vb_passed_file):
     # Step 1 Store keep2_list
@@ -1709,9 +1822,7 @@ def get_keep2_vb_passed_list(virsorter_outdir, keep2_vb_result, keep2_list_vb_pa
     lines.close()
   
     keep2_list_vb_passed = {} # seq => [length, score, hallmark, viral_gene, host_gene]
-    keep2_vb_result_seq = store_seq(keep2_vb_result)
-    for header in keep2_vb_result_seq:
-        header_wo_array = header.replace('>', '', 1)
+    for header_wo_array in iter_seq_ids(keep2_vb_result):
         if '_fragment' in header_wo_array:
             header_wo_array = header_wo_array.rsplit('_fragment', 1)[0]
         keep2_list_vb_passed[header_wo_array] = keep2_list[header_wo_array]
@@ -1737,9 +1848,7 @@ def get_manual_check_vb_passed_list(virsorter_outdir, manual_check_vb_result, ma
     lines.close()
   
     manual_check_list_vb_passed = {} # seq => [length, score, hallmark, viral_gene, host_gene]
-    manual_check_vb_result_seq = store_seq(manual_check_vb_result)
-    for header in manual_check_vb_result_seq:
-        header_wo_array = header.replace('>', '', 1)
+    for header_wo_array in iter_seq_ids(manual_check_vb_result):
         if '_fragment' in header_wo_array:
             header_wo_array = header_wo_array.rsplit('_fragment', 1)[0]
         manual_check_list_vb_passed[header_wo_array] = manual_check_list[header_wo_array]
@@ -1785,19 +1894,12 @@ def get_final_vs2_virus(virsorter_outdir, keep1_list_file, keep2_list_vb_passed_
         lines.close()  
 
     # Step 2 Make final_vs2_virus.fasta
-    all_seq = store_seq(os.path.join(virsorter_outdir, 'pass2/final-viral-combined.fa'))
-    
-    all_seq_final = {}
-    for header in all_seq:
-        header_wo_array = header.replace('>', '', 1)
-        if header_wo_array in keep1_list or header_wo_array in keep2_list_vb_passed or header_wo_array in manual_check_list_vb_passed:
-            all_seq_final[header] = all_seq[header] 
-            
-    write_down_seq(all_seq_final, final_vs2_virus_fasta_file)    
+    final_vs2_virus_ids = set(keep1_list) | set(keep2_list_vb_passed) | set(manual_check_list_vb_passed)
+    extract_seq_by_ids(os.path.join(virsorter_outdir, 'pass2/final-viral-combined.fa'), {final_vs2_virus_fasta_file: final_vs2_virus_ids})
     
 def get_dvf_result_seq(args, inner_dvf_outdir, final_dvf_virus_fasta_file):
     # Step 1 Store and filter dvfpred.txt
-    dvf_passed_seq = [] 
+    dvf_passed_seq = set() 
     with open(os.path.join(inner_dvf_outdir, f"{Path(args['input_metagenome']).stem}.fasta_gt{args['input_length_limit']}bp_dvfpred.txt"),'r') as lines:
         for line in lines:
             line = line.rstrip('\n')
@@ -1807,41 +1909,28 @@ def get_dvf_result_seq(args, inner_dvf_outdir, final_dvf_virus_fasta_file):
                 score = tmp[2]
                 pvalue = tmp[3]
                 if float(score) >= 0.95 and float(pvalue) < 0.05: 
-                    dvf_passed_seq.append(seq)
+                    dvf_passed_seq.add(seq)
                 else:
                     continue
              
     # Step 2 get the final_dvf_virus_fasta_file
-    all_seq = store_seq(args['input_metagenome'])
-    
-    all_seq_final = {}
-    for header in all_seq:
-        header_wo_array = header.replace('>', '', 1)
-        if header_wo_array in dvf_passed_seq:
-            all_seq_final[header] = all_seq[header] 
-            
-    write_down_seq(all_seq_final, final_dvf_virus_fasta_file)  
+    extract_seq_by_ids(args['input_metagenome'], {final_dvf_virus_fasta_file: dvf_passed_seq})  
     
 def get_vb_result_seq(args, final_vb_virus_fasta_file, final_vb_virus_ffn_file, final_vb_virus_faa_file, final_vb_virus_annotation_file): 
     # Step 1 get final_vb_virus_fasta 
-    final_vb_virus_fasta_seq = store_seq(os.path.join(args['vibrant_outdir'], f"VIBRANT_phages_{Path(args['input_metagenome']).stem}", f"{Path(args['input_metagenome']).stem}.phages_combined.fna"))
-    write_down_seq(final_vb_virus_fasta_seq, final_vb_virus_fasta_file)  
+    write_down_seq_by_filter(os.path.join(args['vibrant_outdir'], f"VIBRANT_phages_{Path(args['input_metagenome']).stem}", f"{Path(args['input_metagenome']).stem}.phages_combined.fna"), lambda header: True, final_vb_virus_fasta_file) # Stream a copy with the same headers as "store_seq"
     # Step 2 get final_vb_virus_ffn
-    final_vb_virus_ffn_seq = store_seq(os.path.join(args['vibrant_outdir'], f"VIBRANT_phages_{Path(args['input_metagenome']).stem}", f"{Path(args['input_metagenome']).stem}.phages_combined.ffn"))
-    write_down_seq(final_vb_virus_ffn_seq, final_vb_virus_ffn_file)  
+    write_down_seq_by_filter(os.path.join(args['vibrant_outdir'], f"VIBRANT_phages_{Path(args['input_metagenome']).stem}", f"{Path(args['input_metagenome']).stem}.phages_combined.ffn"), lambda header: True, final_vb_virus_ffn_file) # Stream a copy with the same headers as "store_seq"
     # Step 3 get final_vb_virus_faa
-    final_vb_virus_faa_seq = store_seq(os.path.join(args['vibrant_outdir'], f"VIBRANT_phages_{Path(args['input_metagenome']).stem}", f"{Path(args['input_metagenome']).stem}.phages_combined.faa"))
-    write_down_seq(final_vb_virus_faa_seq, final_vb_virus_faa_file)    
+    write_down_seq_by_filter(os.path.join(args['vibrant_outdir'], f"VIBRANT_phages_{Path(args['input_metagenome']).stem}", f"{Path(args['input_metagenome']).stem}.phages_combined.faa"), lambda header: True, final_vb_virus_faa_file) # Stream a copy with the same headers as "store_seq"
     # Step 4 get final_vb_virus_annotation
     final_vb_virus_annotation_file_old_addr = os.path.join(args['vibrant_outdir'], f"VIBRANT_results_{Path(args['input_metagenome']).stem}", f"VIBRANT_annotations_{Path(args['input_metagenome']).stem}.tsv")
     os.system(f"cp {final_vb_virus_annotation_file_old_addr} {final_vb_virus_annotation_file}")
                  
 def get_overlapped_viral_scaffolds(final_vb_virus_fasta_file, final_vs2_virus_fasta_file, final_dvf_virus_fasta_file, final_vb_virus_annotation_file, overlap_outdir):    
-    # Step 1 Store vb_viral_scaffold_ids (both include and exclude 'fragment')
-    vb_viral_scaffold_ids_include_fragment = set()
+    # Step 1 Store vb_viral_scaffold_ids (both include and exclude 'fragment'); only headers are read in Steps 1-3
+    vb_viral_scaffold_ids_include_fragment = set(iter_seq_ids(final_vb_virus_fasta_file))
     vb_viral_scaffold_ids = set()
-    final_vb_virus_fasta_file_seqs = store_seq(final_vb_virus_fasta_file)
-    vb_viral_scaffold_ids_include_fragment = set([x.replace('>', '', 1) for x in final_vb_virus_fasta_file_seqs])
     for scaffold_id in vb_viral_scaffold_ids_include_fragment:
         if '_fragment' not in scaffold_id:
             vb_viral_scaffold_ids.add(scaffold_id)
@@ -1849,15 +1938,12 @@ def get_overlapped_viral_scaffolds(final_vb_virus_fasta_file, final_vs2_virus_fa
             vb_viral_scaffold_ids.add(scaffold_id.split('_fragment', 1)[0])
         
     # Step 2 Store vs_viral_scaffold_ids (exclude info after '||')
-    vs_viral_scaffold_ids = set()
-    final_vs_virus_fasta_file_seqs = store_seq(final_vs2_virus_fasta_file)
-    vs_viral_scaffold_ids = set([x.replace('>', '', 1).split('||', 1)[0] for x in final_vs_virus_fasta_file_seqs])
+    vs_viral_scaffold_ids = set([x.split('||', 1)[0] for x in iter_seq_ids(final_vs2_virus_fasta_file)])
     
     # Step 3 Store dvf_viral_scaffold_ids
     dvf_viral_scaffold_ids = set()
     if final_dvf_virus_fasta_file:
-        final_dvf_virus_fasta_file_seqs = store_seq(final_dvf_virus_fasta_file)
-        dvf_viral_scaffold_ids = set([x.replace('>', '', 1) for x in final_dvf_virus_fasta_file_seqs])
+        dvf_viral_scaffold_ids = set(iter_seq_ids(final_dvf_virus_fasta_file))
     
     # Step 4 Get the final overlapped viral scaffold ids (mainly based on vb viral scaffold ids, include 'fragment')
     overlapped_viral_scaffold_ids = set()
@@ -1870,67 +1956,69 @@ def get_overlapped_viral_scaffolds(final_vb_virus_fasta_file, final_vs2_virus_fa
         if scaffold_id.split('_fragment', 1)[0] in overlapped_viral_scaffold_ids:
             overlapped_viral_scaffold_ids_include_fragment.add(scaffold_id)
     
-    # Step 5 Get related files: ffn, faa, and annotation file
+    # Step 5 Get related files: ffn, faa, and annotation file; each file is streamed and only matched records are written down
     ## Step 5.1 Make fasta file
     os.mkdir(overlap_outdir) 
-    final_overlapped_virus_fasta_file_seqs = {}
-    for scaffold_id in overlapped_viral_scaffold_ids_include_fragment:
-        scaffold_id_w_array = '>' + scaffold_id
-        final_overlapped_virus_fasta_file_seqs[scaffold_id_w_array] = final_vb_virus_fasta_file_seqs[scaffold_id_w_array]
-    write_down_seq(final_overlapped_virus_fasta_file_seqs, os.path.join(overlap_outdir, 'final_overlapped_virus.fasta'))
+    write_down_seq_by_filter(final_vb_virus_fasta_file, lambda x: x in overlapped_viral_scaffold_ids_include_fragment, os.path.join(overlap_outdir, 'final_overlapped_virus.fasta'))
 
     ## Step 5.2 Make ffn file      
-    final_vb_virus_ffn_file_seqs = store_seq(final_vb_virus_fasta_file.replace('.fna', '.ffn', 1))
-    final_overlapped_virus_ffn_file_seqs = {}
-    for scaffold_id_w_array in final_vb_virus_ffn_file_seqs:
-        if scaffold_id_w_array.replace('>', '', 1).rsplit('_', 1)[0] in overlapped_viral_scaffold_ids_include_fragment:
-            final_overlapped_virus_ffn_file_seqs[scaffold_id_w_array] = final_vb_virus_ffn_file_seqs[scaffold_id_w_array]
-    write_down_seq(final_overlapped_virus_ffn_file_seqs, os.path.join(overlap_outdir, 'final_overlapped_virus.ffn')) 
+    write_down_seq_by_filter(final_vb_virus_fasta_file.replace('.fna', '.ffn', 1), lambda x: x.rsplit('_', 1)[0] in overlapped_viral_scaffold_ids_include_fragment, os.path.join(overlap_outdir, 'final_overlapped_virus.ffn')) 
 
     ## Step 5.3 Make faa file      
-    final_vb_virus_faa_file_seqs = store_seq(final_vb_virus_fasta_file.replace('.fna', '.faa', 1))
-    final_overlapped_virus_faa_file_seqs = {}
-    for scaffold_id_w_array in final_vb_virus_faa_file_seqs:
-        if scaffold_id_w_array.replace('>', '', 1).rsplit('_', 1)[0] in overlapped_viral_scaffold_ids_include_fragment:
-            final_overlapped_virus_faa_file_seqs[scaffold_id_w_array] = final_vb_virus_faa_file_seqs[scaffold_id_w_array]
-    write_down_seq(final_overlapped_virus_faa_file_seqs, os.path.join(overlap_outdir, 'final_overlapped_virus.faa'))      
+    write_down_seq_by_filter(final_vb_virus_fasta_file.replace('.fna', '.faa', 1), lambda x: x.rsplit('_', 1)[0] in overlapped_viral_scaffold_ids_include_fragment, os.path.join(overlap_outdir, 'final_overlapped_virus.faa'))      
         
-    ## Step 5.4 Make annotation file
-    final_vb_virus_annotation = pd.read_csv(final_vb_virus_annotation_file, sep = '\t')
-    final_overlapped_virus_faa_ids = [x.replace('>', '', 1) for x in final_overlapped_virus_faa_file_seqs]
-    final_overlapped_virus_annotation = final_vb_virus_annotation[final_vb_virus_annotation['protein'].isin(final_overlapped_virus_faa_ids)]
-    final_overlapped_virus_annotation.to_csv(os.path.join(overlap_outdir, 'final_overlapped_virus.annotation.txt'), sep='\t', index=False)
+    ## Step 5.4 Make annotation file (read and filter by chunks)
+    final_overlapped_virus_annotation_file = os.path.join(overlap_outdir, 'final_overlapped_virus.annotation.txt')
+    is_first_chunk = True
+    for final_vb_virus_annotation in pd.read_csv(final_vb_virus_annotation_file, sep = '\t', dtype = str, keep_default_na = False, chunksize = 100000): # Keep values as they are, since dtypes could be inferred differently among chunks
+        final_overlapped_virus_annotation = final_vb_virus_annotation[final_vb_virus_annotation['protein'].map(lambda x: x.rsplit('_', 1)[0] in overlapped_viral_scaffold_ids_include_fragment)]
+        final_overlapped_virus_annotation.to_csv(final_overlapped_virus_annotation_file, sep='\t', index=False, mode = 'w' if is_first_chunk else 'a', header = is_first_chunk)
+        is_first_chunk = False
     
 def get_split_viral_gn(final_virus_fasta_file, split_viral_gn_dir):
-    # Step 1 Store final_virus_fasta seq and final_virus_faa seq
-    final_virus_fasta_seq = store_seq(final_virus_fasta_file)
-    final_virus_faa_file = final_virus_fasta_file.replace('.fasta', '.faa', 1)
-    final_virus_faa_seq = store_seq(final_virus_faa_file)
-    
-    # Step 2 Make split_viral_gn_dir and write down individual fasta and faa files
+    # Step 1 Make split_viral_gn_dir and write down individual fasta files by streaming final_virus_fasta
     os.mkdir(split_viral_gn_dir)
-    for header in final_virus_fasta_seq:
+    final_virus_fasta_ids = set() # Store the headers (without '>') of final_virus_fasta
+    each_fasta_batch = {} # path_to_file => seq_dict, written down by "write_down_seqs" whenever it holds about 64 MB of sequences
+    batch_size = 0
+    for header, seq in iter_seq(final_virus_fasta_file):
         header_wo_array = header.replace('>', '', 1)
-        seq = final_virus_fasta_seq[header]
+        final_virus_fasta_ids.add(header_wo_array)
         
-        each_fasta_seq_dict = {}
-        each_fasta_seq_dict[header] = seq
         each_fasta_seq_file = os.path.join(split_viral_gn_dir, f"{header_wo_array}.fasta")
         if '||' in each_fasta_seq_file:
             each_fasta_seq_file = each_fasta_seq_file.replace('||', '__', 1)
-        write_down_seq(each_fasta_seq_dict, each_fasta_seq_file)
+        each_fasta_batch[each_fasta_seq_file] = {header: seq}
+        batch_size += len(seq)
+        if batch_size >= 67108864:
+            write_down_seqs(each_fasta_batch)
+            each_fasta_batch, batch_size = {}, 0
+    write_down_seqs(each_fasta_batch)
         
-        each_faa_seq_dict = {}
-        for pro_header in final_virus_faa_seq:
-            header_wo_array_from_pro_header = pro_header.replace('>', '', 1).rsplit('_', 1)[0]
-            if header_wo_array_from_pro_header == header_wo_array:
-                each_faa_seq_dict[pro_header] = final_virus_faa_seq[pro_header]
-                each_faa_seq_file = os.path.join(split_viral_gn_dir, f"{header_wo_array}.faa")
-                if '||' in each_faa_seq_file:
-                    each_faa_seq_file = each_faa_seq_file.replace('||', '__', 1)
-                write_down_seq(each_faa_seq_dict, each_faa_seq_file)
+    # Step 2 Write down individual faa files by streaming final_virus_faa; 
+    # the proteins of a scaffold are next to each other, so each faa file is only reopened when the scaffold changes
+    final_virus_faa_file = final_virus_fasta_file.replace('.fasta', '.faa', 1)
+    made_faa_files = set()
+    each_faa_seq = None
+    each_faa_seq_file_current = ''
+    for pro_header, seq in iter_seq(final_virus_faa_file):
+        header_wo_array = pro_header.replace('>', '', 1).rsplit('_', 1)[0]
+        if header_wo_array in final_virus_fasta_ids:
+            each_faa_seq_file = os.path.join(split_viral_gn_dir, f"{header_wo_array}.faa")
+            if '||' in each_faa_seq_file:
+                each_faa_seq_file = each_faa_seq_file.replace('||', '__', 1)
+            if each_faa_seq_file != each_faa_seq_file_current:
+                if each_faa_seq:
+                    each_faa_seq.close()
+                each_faa_seq = open(each_faa_seq_file, "a" if each_faa_seq_file in made_faa_files else "w")
+                made_faa_files.add(each_faa_seq_file)
+                each_faa_seq_file_current = each_faa_seq_file
+            each_faa_seq.write(pro_header + "\n")
+            each_faa_seq.write(seq + "\n")
+    if each_faa_seq:
+        each_faa_seq.close()
                 
-def get_gn_lyso_lytic_result(scf2lytic_or_lyso_summary, vRhyme_best_bin_lytic_and_lysogenic_info, viral_gn_dir):
+def get_gn_lyso_lytic_result(scf2lytic_or_lyso_summary, vRhyme_best_bin_lytic_and_lysogenic_info, genome_catalog):
     gn2lyso_lytic_result = {} # gn => lyso_lytic_property
    
     # Step 1 Store scf2lytic_or_lyso dict
@@ -1955,50 +2043,56 @@ def get_gn_lyso_lytic_result(scf2lytic_or_lyso_summary, vRhyme_best_bin_lytic_an
                 if tmp[2] != 'split into scaffolds':
                     vRhyme_bin2lytic_and_lysogenic_info[tmp[0]] = tmp[2]
 
-    # Step 3 Store lyso_lytic_result for vRhyme_bin
-    vRhyme_bin_addrs = glob(os.path.join(viral_gn_dir, 'vRhyme_bin_*.fasta'))
-    for vRhyme_bin_addr in vRhyme_bin_addrs:
-        vRhyme_bin = Path(vRhyme_bin_addr).stem
-        gn2lyso_lytic_result[vRhyme_bin] = vRhyme_bin2lytic_and_lysogenic_info[vRhyme_bin]
-        
-    # Step 4 Store lyso_lytic_result for vRhyme_unbinned  vRhyme_unbinned_5.fasta        
-    vRhyme_unbinned_addrs = glob(os.path.join(viral_gn_dir, 'vRhyme_unbinned_*.fasta')) 
-    for vRhyme_unbinned_addr in vRhyme_unbinned_addrs:
-        vRhyme_unbinned = Path(vRhyme_unbinned_addr).stem
-        scf = ''
-        vRhyme_unbinned_seq = store_seq(vRhyme_unbinned_addr)
-        for header in vRhyme_unbinned_seq:
-            scf = header.replace('>', '', 1).split('__', 1)[1]
-        gn2lyso_lytic_result[vRhyme_unbinned] = scf2lytic_or_lyso[scf][0] 
+    # Step 3 Store lyso_lytic_result for vRhyme_bin and vRhyme_unbinned
+    gn2info = load_genome_catalog(genome_catalog)
+    for gn in gn2info:
+        if gn.startswith('vRhyme_bin_'):
+            gn2lyso_lytic_result[gn] = vRhyme_bin2lytic_and_lysogenic_info[gn]
+        elif gn.startswith('vRhyme_unbinned_'):
+            scf = gn2info[gn]['scaffolds'][-1].split('__', 1)[1]
+            gn2lyso_lytic_result[gn] = scf2lytic_or_lyso[scf][0] 
 
     return gn2lyso_lytic_result       
 
-def get_gn_lyso_lytic_result_for_wo_reads(scf2lytic_or_lyso_summary, final_virus_fasta_file): 
-    gn2lyso_lytic_result = {} # gn => lyso_lytic_property
-    
-    # Step 1 Store scf2lytic_or_lyso dict
-    scf2lytic_or_lyso = {} # scf => [lytic_or_lyso_or_integrated_prophage, integrase_presence_or_absence]; scf here is the short scf name
-    with open(scf2lytic_or_lyso_summary, 'r') as lines:
-        for line in lines:
-            line = line.rstrip('\n')
-            tmp = line.split('\t')
-            if tmp[0] != 'scaffold':
-                scf, lytic_or_lyso_or_integrated_prophage, integrase_presence_or_absence = tmp[0], tmp[1], tmp[2]
-                if ' (' in lytic_or_lyso_or_integrated_prophage:
-                    lytic_or_lyso_or_integrated_prophage = lytic_or_lyso_or_integrated_prophage.split(' (', 1)[0]
-                scf2lytic_or_lyso[scf] = [lytic_or_lyso_or_integrated_prophage, integrase_presence_or_absence]  
-
-    # Step 2 Store gn list
-    final_virus_fasta_seq = store_seq(final_virus_fasta_file)
-    gn_list = [x.replace('>', '', 1) for x in final_virus_fasta_seq]
-    
-    # Step 3 Store gn2lyso_lytic_result
-    for gn in gn_list:
-        gn2lyso_lytic_result[gn] = scf2lytic_or_lyso[gn][0]
+def write_down_summary_tables_in_parquet(viwrap_summary_outdir):
+    # Write typed and compressed Parquet copies of the summary tables, and a schema file describing them
+    try:
+        import pyarrow.parquet as pq
+    except Exception as e:
+        sys.exit(f"Writing Parquet tables needs pyarrow, please install it into the ViWrap conda env: {str(e)}")
         
-    return gn2lyso_lytic_result  
-
-def generate_result_visualization_inputs(viwrap_visualization_outdir, viwrap_summary_outdir, VIBRANT_db):
+    summary_tables = {} # table name => [table file, separator, index column]
+    summary_tables['Virus_annotation_results'] = ['Virus_annotation_results.txt', '\t', None]
+    summary_tables['Virus_raw_abundance'] = ['Virus_raw_abundance.txt', '\t', 0]
+    summary_tables['Virus_normalized_abundance'] = ['Virus_normalized_abundance.txt', '\t', 0]
+    summary_tables['Virus_summary_info'] = ['Virus_summary_info.txt', '\t', 0]
+    summary_tables['Host_prediction_to_genome_m90'] = ['Host_prediction_to_genome_m90.csv', ',', None]
+    summary_tables['Host_prediction_to_genus_m90'] = ['Host_prediction_to_genus_m90.csv', ',', None]
+    
+    table2schema = {} # table name => schema
+    for table_name in summary_tables:
+        table_file, sep, index_col = summary_tables[table_name]
+        table_file = os.path.join(viwrap_summary_outdir, table_file)
+        if not os.path.exists(table_file):
+            continue
+        table_df = pd.read_csv(table_file, sep = sep, index_col = index_col)
+        if index_col != None and table_df.index.name == None:
+            table_df.index.name = 'genome'
+        parquet_file = os.path.join(viwrap_summary_outdir, f'{table_name}.parquet')
+        table_df.to_parquet(parquet_file, engine = 'pyarrow', compression = 'zstd', index = (index_col != None))
+        
+        parquet_schema = pq.read_schema(parquet_file)
+        table2schema[table_name] = {'source': Path(table_file).name, 
+                                    'file': Path(parquet_file).name,
+                                    'index': table_df.index.name if index_col != None else None,
+                                    'rows': int(table_df.shape[0]),
+                                    'columns': [{'name': field.name, 'type': str(field.type)} for field in parquet_schema if not field.name.startswith('__')]}
+        
+    with open(os.path.join(viwrap_summary_outdir, 'ViWrap_summary_tables.schema.json'), 'w') as f:
+        json.dump(table2schema, f, indent = 4)
+    f.close()    
+    
+def generate_result_visualization_inputs(viwrap_visualization_outdir, viwrap_summary_outdir, VIBRANT_db, output_format = 'tsv'):
     os.mkdir(viwrap_visualization_outdir)
     Result_visualization_inputs_folder = os.path.join(viwrap_visualization_outdir, 'Result_visualization_inputs')
     os.mkdir(Result_visualization_inputs_folder)
@@ -2007,7 +2101,10 @@ def generate_result_visualization_inputs(viwrap_visualization_outdir, viwrap_sum
     virus_statistics_file = os.path.join(Result_visualization_inputs_folder, 'virus_statistics.txt')
     f = open(virus_statistics_file, 'w')
     f.write('viral scaffold no.\tvirus no.\tspecies cluster no.\tgenus cluster no.\tno. of virus taxonomy info\tno. of virus with host prediction\n')
-    virus_summary_info_df = pd.read_csv(os.path.join(viwrap_summary_outdir, 'Virus_summary_info.txt'), sep = '\t', index_col = 0) # Column 0 used as the row labels of the dataframe
+    if output_format == 'parquet':
+        virus_summary_info_df = pd.read_parquet(os.path.join(viwrap_summary_outdir, 'Virus_summary_info.parquet'))
+    else:    
+        virus_summary_info_df = pd.read_csv(os.path.join(viwrap_summary_outdir, 'Virus_summary_info.txt'), sep = '\t', index_col = 0) # Column 0 used as the row labels of the dataframe
     viral_scaffold_no = virus_summary_info_df['scaffold_num'].sum()
     virus_no = virus_summary_info_df.shape[0] # Give the number of rows
     species_cluster_no = len(open(os.path.join(viwrap_summary_outdir, 'Species_cluster_info.txt')).readlines(  )) - 1
@@ -2018,14 +2115,18 @@ def generate_result_visualization_inputs(viwrap_visualization_outdir, viwrap_sum
     genus_cluster_no = str(genus_cluster_no)
     no_of_virus_taxonomy_info = len(open(os.path.join(viwrap_summary_outdir, 'Tax_classification_result.txt')).readlines(  ))
     virus_with_host_prediction_set = set()
-    with open(os.path.join(viwrap_summary_outdir, 'Host_prediction_to_genus_m90.csv'), 'r') as lines:
-        for line in lines:
-            line = line.rstrip('\n')
-            tmp = line.split(',')
-            if tmp[0] != 'Virus':
-                if tmp[0] not in virus_with_host_prediction_set:
-                    virus_with_host_prediction_set.add(tmp[0])
-    lines.close()
+    if output_format == 'parquet':
+        host_pred_to_genus_df = pd.read_parquet(os.path.join(viwrap_summary_outdir, 'Host_prediction_to_genus_m90.parquet'), columns = ['Virus'])
+        virus_with_host_prediction_set = set(host_pred_to_genus_df['Virus'])
+    else:    
+        with open(os.path.join(viwrap_summary_outdir, 'Host_prediction_to_genus_m90.csv'), 'r') as lines:
+            for line in lines:
+                line = line.rstrip('\n')
+                tmp = line.split(',')
+                if tmp[0] != 'Virus':
+                    if tmp[0] not in virus_with_host_prediction_set:
+                        virus_with_host_prediction_set.add(tmp[0])
+        lines.close()
     no_of_virus_with_host_prediction = len(virus_with_host_prediction_set)
     f.write(f"{viral_scaffold_no}\t{virus_no}\t{species_cluster_no}\t{genus_cluster_no}\t{no_of_virus_taxonomy_info}\t{no_of_virus_with_host_prediction}\n")
     f.close()
@@ -2034,14 +2135,20 @@ def generate_result_visualization_inputs(viwrap_visualization_outdir, viwrap_sum
     family2rel_abun = {} # family => rel_abun
     
     virus2rel_abun = {} # virus => rel_abun
-    with open(os.path.join(viwrap_summary_outdir, 'Virus_normalized_abundance.txt'), 'r') as lines:
-        for line in lines:
-            line = line.rstrip('\n')
-            tmp = line.split('\t')
-            if tmp[0] and 'vRhyme_' in tmp[0]:
-                virus, rel_abun = tmp[0], (float(tmp[-1]) / 100)
-                virus2rel_abun[virus] = rel_abun
-    lines.close()            
+    if output_format == 'parquet':
+        virus_normalized_abundance_df = pd.read_parquet(os.path.join(viwrap_summary_outdir, 'Virus_normalized_abundance.parquet'))
+        for virus, percent in virus_normalized_abundance_df.iloc[:, -1].items(): # The last column is "MeanCov.Percent"
+            if 'vRhyme_' in virus:
+                virus2rel_abun[virus] = float(percent) / 100
+    else:            
+        with open(os.path.join(viwrap_summary_outdir, 'Virus_normalized_abundance.txt'), 'r') as lines:
+            for line in lines:
+                line = line.rstrip('\n')
+                tmp = line.split('\t')
+                if tmp[0] and 'vRhyme_' in tmp[0]:
+                    virus, rel_abun = tmp[0], (float(tmp[-1]) / 100)
+                    virus2rel_abun[virus] = rel_abun
+        lines.close()            
     
     virus2family = {} # virus => family
     with open(os.path.join(viwrap_summary_outdir, 'Tax_classification_result.txt'), 'r') as lines:
@@ -2085,20 +2192,15 @@ def generate_result_visualization_inputs(viwrap_visualization_outdir, viwrap_sum
     ko2rel_abun = {} # ko => rel_abun
     
     sum_rel_abun_of_ko = 0
-    with open(os.path.join(viwrap_summary_outdir, 'Virus_summary_info.txt'), 'r') as lines:
-        for line in lines:
-            line = line.rstrip('\n')
-            tmp = line.split('\t')
-            if tmp[0]:
-                virus, AMG_KOs = tmp[0], tmp[4]
-                if AMG_KOs:
-                    for item in AMG_KOs.split(';'):
-                        ko, copy = item.split('(')[0], int(item.split('(')[1].replace(')', '', 1))
-                        if ko not in ko2rel_abun:
-                            ko2rel_abun[ko] = copy * virus2rel_abun[virus]
-                        else:
-                            ko2rel_abun[ko] = copy * virus2rel_abun[virus] + ko2rel_abun[ko]
-                        sum_rel_abun_of_ko = sum_rel_abun_of_ko + (copy * virus2rel_abun[virus])
+    for virus, AMG_KOs in virus_summary_info_df['AMG_KOs'].items():
+        if isinstance(AMG_KOs, str) and AMG_KOs:
+            for item in AMG_KOs.split(';'):
+                ko, copy = item.split('(')[0], int(item.split('(')[1].replace(')', '', 1))
+                if ko not in ko2rel_abun:
+                    ko2rel_abun[ko] = copy * virus2rel_abun[virus]
+                else:
+                    ko2rel_abun[ko] = copy * virus2rel_abun[virus] + ko2rel_abun[ko]
+                sum_rel_abun_of_ko = sum_rel_abun_of_ko + (copy * virus2rel_abun[virus])
 
     for ko in ko2rel_abun:
         ko2rel_abun[ko] = ko2rel_abun[ko] / sum_rel_abun_of_ko
@@ -2110,31 +2212,15 @@ def generate_result_visualization_inputs(viwrap_visualization_outdir, viwrap_sum
     f.close()        
         
     # Step 4 Make input for pie-chart 2 - KO metabolism relative abundance 
-    metabolism2kos = {} # metabolism => [kos]
-    KEGG_pathway_file = os.path.join(VIBRANT_db, 'files/VIBRANT_KEGG_pathways_summary.tsv')
-    with open(KEGG_pathway_file,  'rU') as lines:
-        for line in lines:
-            line = line.rstrip('\n')
-            tmp = line.split('\t')
-            if 'map' in tmp[0]:
-                metabolism, ko_arrary = tmp[1], tmp[3]
-                if metabolism[0] == '"' and metabolism[-1] == '"':
-                    metabolism = metabolism.strip('"').rstrip('"')
-                kos = ko_arrary.split('~')
-                metabolism2kos[metabolism] = kos
-    lines.close()            
-                
+    vibrant_metadata = load_vibrant_metadata(VIBRANT_db)
     metabolism2rel_abun = {} # metabolism => rel_abun
+    for metabolism in vibrant_metadata['metabolism2kos']:
+        metabolism2rel_abun[metabolism] = 0
     sum_rel_abun_of_metabolism = 0
-    for metabolism in metabolism2kos:
-        rel_abun = 0
-        kos = metabolism2kos[metabolism]
-        for ko in ko2rel_abun:
-            if ko in kos:
-                rel_abun = rel_abun + ko2rel_abun[ko]
-                
-        metabolism2rel_abun[metabolism] = rel_abun
-        sum_rel_abun_of_metabolism = sum_rel_abun_of_metabolism + rel_abun
+    for ko in ko2rel_abun:
+        for metabolism in vibrant_metadata['ko2metabolisms'].get(ko, []):
+            metabolism2rel_abun[metabolism] = metabolism2rel_abun[metabolism] + ko2rel_abun[ko]
+            sum_rel_abun_of_metabolism = sum_rel_abun_of_metabolism + ko2rel_abun[ko]
         
     for metabolism in metabolism2rel_abun:
          metabolism2rel_abun[metabolism] = metabolism2rel_abun[metabolism] / sum_rel_abun_of_metabolism
@@ -2146,17 +2232,16 @@ def generate_result_visualization_inputs(viwrap_visualization_outdir, viwrap_sum
     f.close()          
                 
 def change_vertical_bar_to_underscore(final_vs2_virus_fasta_file):    
-    # Step 1 Store seq
-    final_vs2_virus_fasta_file_seq = store_seq(final_vs2_virus_fasta_file)
-
-    # Step 2 Change vertical bar to underscore
-    final_vs2_virus_fasta_file_seq_new = {}
-    for header in final_vs2_virus_fasta_file_seq:
+    # Step 1 Stream seq and change vertical bar to underscore
+    final_vs2_virus_fasta_file_new = final_vs2_virus_fasta_file + '.new'
+    seq_file = open(final_vs2_virus_fasta_file_new, "w")
+    for header, seq in iter_seq(final_vs2_virus_fasta_file):
         header_new = header.replace('||', '__', 1)
-        final_vs2_virus_fasta_file_seq_new[header_new] = final_vs2_virus_fasta_file_seq[header]
+        seq_file.write(header_new + "\n")
+        seq_file.write(seq + "\n")
+    seq_file.close()
         
-    # Step 3 Remove the old fasta file and write down the new one
-    os.system(f"rm {final_vs2_virus_fasta_file}")
-    write_down_seq(final_vs2_virus_fasta_file_seq_new, final_vs2_virus_fasta_file)
+    # Step 2 Replace the old fasta file with the new one
+    os.system(f"mv {final_vs2_virus_fasta_file_new} {final_vs2_virus_fasta_file}")
         
       
\ No newline at end of file
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+# Shared parsers for hmmsearch tblout and DIAMOND tabular results; only the standard library is used,
+# so they can be imported by scripts running in any of the ViWrap conda envs
+
+def get_hmmsearch_result_from_lines(lines):
+    pro2info = {} # pro => [query, query_accession, evalue, score]
+    pro2score = {} # pro => score (float) of the best hit
+    for line in lines:
+        if not line.startswith('#'):
+            # Only split the first 6 columns (target, target_accession, query, query_accession, evalue, score);
+            # runs of spaces are treated as one separator
+            tmp = line.split(None, 6)
+            if len(tmp) < 6:
+                continue
+            pro, score = tmp[0], float(tmp[5])
+            if pro not in pro2score or score > pro2score[pro]: # Keep the best hit (the highest score) for each protein
+                pro2score[pro] = score
+                pro2info[pro] = [tmp[2], tmp[3], tmp[4], tmp[5]]
+    return pro2info
+
+def get_hmmsearch_result(hmmsearch_result):
+    with open(hmmsearch_result, 'r') as lines:
+        pro2info = get_hmmsearch_result_from_lines(lines)
+    lines.close()
+    return pro2info
+
+def get_diamond_best_hits(diamond_outfile):
+    # Feasible even if the diamond out file is not ordered by bit score
+    pro2best_hit = {} # pro => [best_hit, bit_score]
+    pro2bit_score = {} # pro => bit_score (float) of the best hit
+    with open(diamond_outfile, 'r') as lines:
+        for line in lines:
+            pro, hit, rest = line.split('\t', 2)
+            bit_score = rest.rsplit('\t', 1)[-1].rstrip('\n') # The bit score is the last column
+            if pro not in pro2bit_score or float(bit_score) >= pro2bit_score[pro]:
+                pro2bit_score[pro] = float(bit_score)
+                pro2best_hit[pro] = [hit, bit_score]
+    lines.close()
+    return pro2best_hit
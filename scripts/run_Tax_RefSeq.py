@@ -8,6 +8,9 @@ try:
     from pathlib import Path
     import subprocess
     from subprocess import DEVNULL, STDOUT, check_call  
+    from result_parser import get_diamond_best_hits
+    from genome_catalog import get_gn2faa
+    from tax_db import get_pro2tax
     warnings.filterwarnings("ignore")
 except Exception as e:
     sys.stderr.write(str(e) + "\n\n")
@@ -15,48 +18,37 @@ except Exception as e:
     
     
 def find_best_hits(input_diamond_outfile):
-    # Feasible even if the diamond out file is not ordered by bit score
-    pro2best_hit = {} # pro => [best_hit, bit_score]
-    
-    with open(input_diamond_outfile, "r") as lines:
-        for line in lines:
-            line = line.rstrip("\n")
-            pro, hit, bit_score = line.split("\t")[0], line.split("\t")[1], line.split("\t")[-1]
-            
-            if pro not in pro2best_hit:
-                pro2best_hit[pro] = [hit, bit_score]
-            else:
-                if float(bit_score) >= float(pro2best_hit[pro][1]):
-                    pro2best_hit[pro] = [hit, bit_score]
-    lines.close()
-
     result = {} # pro => best_hit
+    pro2best_hit = get_diamond_best_hits(input_diamond_outfile) # pro => [best_hit, bit_score]
     for pro in pro2best_hit:
         result[pro] = pro2best_hit[pro][0]
         
     return result    
    
-def run_diamond_to_RefSeq_viral_protein_db(viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, NCBI_RefSeq_viral_protein_db_dir, pro2viral_gn_map, threads, output):
+def run_diamond_to_RefSeq_viral_protein_db(viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, NCBI_RefSeq_viral_protein_db_dir, pro2viral_gn_map, threads, output, genome_catalog):
     tmp_outdir = f'{viwrap_outdir}/tmp_dir_refseq'
     os.mkdir(tmp_outdir)
     
     # Step 1 Run diamond
     bin2addr = {} # bin => addr to the bin; i.e., vRhyme_bin_10 => path/to/the/dir/vRhyme_bin_10.faa
-    walk = os.walk(vRhyme_best_bin_dir)
-    for path, dir_list, file_list in walk:
-        for file_name in file_list:
-            if "faa" in file_name: 
-                file_name_with_path = os.path.join(path, file_name)
-                bin_name = Path(file_name_with_path).stem
-                bin2addr[bin_name] = file_name_with_path
-                
-    walk2 = os.walk(vRhyme_unbinned_viral_gn_dir)
-    for path, dir_list, file_list in walk2:
-        for file_name in file_list:
-            if "faa" in file_name: 
-                file_name_with_path = os.path.join(path, file_name)
-                bin_name = Path(file_name_with_path).stem
-                bin2addr[bin_name] = file_name_with_path  
+    if genome_catalog:
+        bin2addr = get_gn2faa(genome_catalog)
+    else:
+        walk = os.walk(vRhyme_best_bin_dir)
+        for path, dir_list, file_list in walk:
+            for file_name in file_list:
+                if "faa" in file_name: 
+                    file_name_with_path = os.path.join(path, file_name)
+                    bin_name = Path(file_name_with_path).stem
+                    bin2addr[bin_name] = file_name_with_path
+                    
+        walk2 = os.walk(vRhyme_unbinned_viral_gn_dir)
+        for path, dir_list, file_list in walk2:
+            for file_name in file_list:
+                if "faa" in file_name: 
+                    file_name_with_path = os.path.join(path, file_name)
+                    bin_name = Path(file_name_with_path).stem
+                    bin2addr[bin_name] = file_name_with_path  
 
     diamond_cmd = []
     for bin_name in bin2addr:
@@ -84,15 +76,7 @@ def run_diamond_to_RefSeq_viral_protein_db(viwrap_outdir, vRhyme_best_bin_dir, v
                 bin2pro_num[bin_name] = bin2pro_num.get(bin_name, 0) + 1
     lines.close()
     
-    # Store 2.2 Store the diamond db pro 2 tax info
-    NCBI_RefSeq_viral_protein2tax = {} # pro => tax
-    with open(f'{NCBI_RefSeq_viral_protein_db_dir}/pro2ictv_8_rank_tax.txt' ,"r") as lines:
-        for line in lines:
-            line = line.rstrip("\n")
-            pro, tax = line.split("\t", 1)[0], line.split("\t", 1)[1]
-            NCBI_RefSeq_viral_protein2tax[pro] = tax
-
-    # Store 2.3 Store the best hits and to see whether >= 30% of the proteins for a bin have a hit to Viral RefSeq
+    # Store 2.2 Store the best hits and to see whether >= 30% of the proteins for a bin have a hit to Viral RefSeq
     bin2best_hits = {} # bin_name => [best_hits]
     # Only record this if >= 30% of the proteins for a faa have a hit to Viral RefSeq
     for bin_name in bin2addr:
@@ -121,6 +105,12 @@ def run_diamond_to_RefSeq_viral_protein_db(viwrap_outdir, vRhyme_best_bin_dir, v
                         best_hits.append(best_hit)
                         bin2best_hits[bin_name2] = best_hits
                 
+    # Store 2.3 Store the diamond db pro 2 tax info, only for the best hits (looked up in the compiled tax db if it is present)
+    best_hit_set = set() # Store all the best hits of all bins
+    for bin_name in bin2best_hits:
+        best_hit_set.update(bin2best_hits[bin_name])
+    NCBI_RefSeq_viral_protein2tax = get_pro2tax(NCBI_RefSeq_viral_protein_db_dir, best_hit_set) # pro => tax
+    
     # Store 2.4 Get the consensus affiliation based on the best hits of individual proteins (>= 50 majority rule)
     bin2consensus_tax = {} # bin => consensus_tax
     for bin_name in bin2best_hits:
@@ -155,4 +145,5 @@ def run_diamond_to_RefSeq_viral_protein_db(viwrap_outdir, vRhyme_best_bin_dir, v
     f.close()    
     
 viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, NCBI_RefSeq_viral_protein_db_dir, pro2viral_gn_map, threads, output = sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5], sys.argv[6], sys.argv[7]
-run_diamond_to_RefSeq_viral_protein_db(viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, NCBI_RefSeq_viral_protein_db_dir, pro2viral_gn_map, threads, output)    
\ No newline at end of file
+genome_catalog = sys.argv[8] if len(sys.argv) > 8 else '' # Optional genome catalog made by "make_genome_catalog"
+run_diamond_to_RefSeq_viral_protein_db(viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, NCBI_RefSeq_viral_protein_db_dir, pro2viral_gn_map, threads, output, genome_catalog)    
\ No newline at end of file
@@ -9,36 +9,28 @@ try:
     from glob import glob
     import subprocess
     from subprocess import DEVNULL, STDOUT, check_call      
+    from result_parser import get_hmmsearch_result
+    from genome_catalog import get_gn2faa
     warnings.filterwarnings("ignore")
 except Exception as e:
     sys.stderr.write(str(e) + "\n\n")
     exit(1) 
     
-def get_hmmsearch_result(hmmsearch_result):
-    pro2info = {} # pro => [query, score, evalue]
-    with open(hmmsearch_result, 'r') as lines:
-        for line in lines:
-            if not line.startswith('#'):
-                line = line.rstrip("\n")
-                line = re.sub(' +', ' ', line)
-                tmp = line.split(' ')
-                pro, query, score, evalue = tmp[0], tmp[2], tmp[5], tmp[4]
-                pro2info[pro] = [query, score, evalue] 
-    lines.close()            
-    return pro2info         
- 
-def run_hmmsearch_to_marker_VOG_HMM_db(vog_marker_table, viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, tax_classification_db_dir, pro2viral_gn_map, threads, output):
+def run_hmmsearch_to_marker_VOG_HMM_db(vog_marker_table, viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, tax_classification_db_dir, pro2viral_gn_map, threads, output, genome_catalog):
     tmp_outdir = f'{viwrap_outdir}/tmp_dir_vog'
     os.mkdir(tmp_outdir)
     
     # Step 1 Run hmmsearch
     bin2addr = {} # bin => addr to the bin; i.e., vRhyme_bin_10 => path/to/the/dir/vRhyme_bin_10.faa
-    file_names1 = glob(f'{vRhyme_best_bin_dir}/*.faa')
-    file_names2 = glob(f'{vRhyme_unbinned_viral_gn_dir}/*.faa')
-    file_names = file_names1 + file_names2
-    for file_name in file_names:
-        bin_name = Path(file_name).stem
-        bin2addr[bin_name] = file_name
+    if genome_catalog:
+        bin2addr = get_gn2faa(genome_catalog)
+    else:            
+        file_names1 = glob(f'{vRhyme_best_bin_dir}/*.faa')
+        file_names2 = glob(f'{vRhyme_unbinned_viral_gn_dir}/*.faa')
+        file_names = file_names1 + file_names2
+        for file_name in file_names:
+            bin_name = Path(file_name).stem
+            bin2addr[bin_name] = file_name
   
     hmmsearch_cmd = []
     for bin_name in bin2addr:
@@ -68,7 +60,7 @@ def run_hmmsearch_to_marker_VOG_HMM_db(vog_marker_table, viwrap_outdir, vRhyme_b
     for hmmsearch_result in hmmsearch_results: 
         pro2info = get_hmmsearch_result(hmmsearch_result)
         for pro in pro2info: 
-            vog, score, evalue = pro2info[pro][0], pro2info[pro][1], pro2info[pro][2]
+            vog, score, evalue = pro2info[pro][0], pro2info[pro][3], pro2info[pro][2]
             if float(score) >= 40 and float(evalue) <= 0.00001:
                 pro2vog[pro] = vog
      
@@ -120,4 +112,5 @@ def run_hmmsearch_to_marker_VOG_HMM_db(vog_marker_table, viwrap_outdir, vRhyme_b
 
     
 vog_marker_table, viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, tax_classification_db_dir, pro2viral_gn_map, threads, output = sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5], sys.argv[6], sys.argv[7], sys.argv[8]
-run_hmmsearch_to_marker_VOG_HMM_db(vog_marker_table, viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, tax_classification_db_dir, pro2viral_gn_map, threads, output)    
\ No newline at end of file
+genome_catalog = sys.argv[9] if len(sys.argv) > 9 else '' # Optional genome catalog made by "make_genome_catalog"
+run_hmmsearch_to_marker_VOG_HMM_db(vog_marker_table, viwrap_outdir, vRhyme_best_bin_dir, vRhyme_unbinned_viral_gn_dir, tax_classification_db_dir, pro2viral_gn_map, threads, output, genome_catalog)    
\ No newline at end of file
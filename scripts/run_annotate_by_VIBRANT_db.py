@@ -7,10 +7,15 @@ try:
     import re
     from pathlib import Path  
     import math
+    import json
     from collections import defaultdict  
     from glob import glob    
     import subprocess
-    from subprocess import DEVNULL, STDOUT, check_call    
+    from subprocess import DEVNULL, STDOUT, PIPE, check_call    
+    from multiprocessing import Pool
+    from concurrent.futures import ThreadPoolExecutor
+    from result_parser import get_hmmsearch_result, get_hmmsearch_result_from_lines
+    from vibrant_metadata import load_vibrant_metadata
     warnings.filterwarnings("ignore")
 except Exception as e:
     sys.stderr.write(str(e) + "\n\n")
@@ -43,6 +48,26 @@ def store_seq(input_seq_file): # The input sequence file should be a file with f
     
     return seq_dict
 
+def iter_seq(input_seq_file):
+    # The same as "store_seq", but yield (header, seq) one by one instead of storing all sequences
+    head = "" # Store the header line
+    seq_lines_list = [] # Store the sequence lines of the current header
+    
+    with open(input_seq_file, "r") as seq_lines:
+        for line in seq_lines:
+            line = line.rstrip("\n") # Remove "\n" in the end
+            if ">" in line:
+                if head:
+                    yield head, "".join(seq_lines_list)
+                head = re.split('[ \t]', line, 1)[0] # Break at the first " " or "\t"
+                seq_lines_list = []
+            else:
+                seq_lines_list.append(line)
+    seq_lines.close()
+    
+    if head:
+        yield head, "".join(seq_lines_list)
+
 def write_down_seq(seq_dict, path_to_file): 
     # Two inputs are required:
     # (1) The dict of the sequence
@@ -95,33 +120,81 @@ def split_seq(input_seq, split_num, output_seq_folder):
         output_seq_file = os.path.join(output_seq_folder, f"{stem_name}.chunk_{j}{suffix}")
         write_down_seq(seq_dict, output_seq_file)
         
-def get_hmmsearch_result(hmmsearch_result):
-    pro2info = {} # pro => [query, query_accession, evalue, score]
-    with open(hmmsearch_result, 'r') as lines:
-        for line in lines:
-            if not line.startswith('#'):
-                line = line.rstrip("\n")
-                line = re.sub(' +', ' ', line)
-                tmp = line.split(' ')
-                pro, query, query_accession, evalue, score = tmp[0], tmp[2], tmp[3], tmp[4], tmp[5]
-                pro2info[pro] = [query, query_accession, evalue, score]
-    lines.close()            
-    return pro2info         
-    
-def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dvf_outdir, out_dir, threads):
-    final_virus_fasta_file = ''
-    KEGG_hmm_file = os.path.join(VIBRANT_db, 'databases/KEGG_profiles_prokaryotes.HMM')
-    Pfam_hmm_file = os.path.join(VIBRANT_db, 'databases/Pfam-A_v32.HMM')
-    VOG_hmm_file = os.path.join(VIBRANT_db, 'databases/VOGDB94_phage.HMM')
+def get_hmm_shards(hmm_file):
+    # Return the pressed shards of an HMM db made by "ViWrap download --hmm_shard_num",
+    # or the HMM db itself if there is no shard or the shards are not made from the same db
+    manifest_file = os.path.join(os.path.dirname(hmm_file), 'shards', f"{Path(hmm_file).stem}.shards.json")
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+        f.close()
+        hmm_shards = [os.path.join(os.path.dirname(manifest_file), shard['file']) for shard in manifest['shards']]
+        if manifest['source_size'] == os.path.getsize(hmm_file) and all([os.path.exists(f"{hmm_shard}.h3m") for hmm_shard in hmm_shards]):
+            return hmm_shards
+    return [hmm_file]
     
-    if identify_method == 'vs':
-        final_virus_fasta_file = os.path.join(virsorter_outdir, 'final_vs2_virus.fasta')
-    elif identify_method == 'dvf':
-        final_virus_fasta_file = os.path.join(dvf_outdir, 'final_dvf_virus.fasta')
+def update_best_hits(pro2best_info, pro2info):
+    # Keep the hit with the highest score for each protein when merging results from different shards or chunks
+    for pro in pro2info:
+        if pro not in pro2best_info or float(pro2info[pro][3]) > float(pro2best_info[pro][3]):
+            pro2best_info[pro] = pro2info[pro]
 
+def init_gene_finder():
+    # Each worker process keeps its own metagenomic-mode gene finder (the same as "prodigal -p meta")
+    global gene_finder
+    import pyrodigal
+    if hasattr(pyrodigal, 'GeneFinder'):
+        gene_finder = pyrodigal.GeneFinder(meta=True)
+    else:
+        gene_finder = pyrodigal.OrfFinder(meta=True) # pyrodigal < 3.0
+    
+def call_genes_for_seq(header_and_seq):
+    header, seq = header_and_seq
+    faa_records = [] # [(pro_header, pro_seq)]
+    ffn_records = [] # [(pro_header, gene_seq)]
+    genes = gene_finder.find_genes(seq.encode())
+    for i in range(len(genes)):
+        # Prodigal names the genes of each scaffold as "scaffold_1", "scaffold_2", ...
+        pro_header = f"{header}_{i + 1}"
+        faa_records.append((pro_header, genes[i].translate()))
+        ffn_records.append((pro_header, genes[i].sequence()))
+    return faa_records, ffn_records
+    
+def call_genes_by_pyrodigal(input_seq, threads):
+    # Call genes in a process pool over the sequence stream, and keep all proteins and genes in memory
+    all_faa_seq = {} # pro_header => pro_seq
+    all_ffn_seq = {} # pro_header => gene_seq
+    with Pool(int(threads), initializer=init_gene_finder) as pool:
+        for faa_records, ffn_records in pool.imap(call_genes_for_seq, iter_seq(input_seq), chunksize=10):
+            all_faa_seq.update(faa_records)
+            all_ffn_seq.update(ffn_records)
+    return all_faa_seq, all_ffn_seq
+
+def run_hmmsearch_on_pro_seq(hmm_file, pro_seq_dict, cpu):
+    # Feed proteins to hmmsearch by stdin and read the tblout from stdout, no temp files are written
+    pro_seq_text = ''.join([f"{pro_header}\n{pro_seq_dict[pro_header]}\n" for pro_header in pro_seq_dict])
+    hmmsearch_cmd = ['hmmsearch', '--tblout', '/dev/stdout', '--noali', '-T', '40', '--cpu', str(cpu), '-o', '/dev/null', '--tformat', 'fasta', hmm_file, '-']
+    p = subprocess.Popen(hmmsearch_cmd, stdin=PIPE, stdout=PIPE, stderr=DEVNULL, universal_newlines=True)
+    hmmsearch_output = p.communicate(pro_seq_text)[0]
+    return get_hmmsearch_result_from_lines(hmmsearch_output.splitlines())
+
+def run_hmmsearch_on_pro_seq_chunks(hmm_file, list_of_pro_seq_dicts, threads):
+    pro2info = {} # pro => [query, query_accession, evalue, score]
+    n = int(threads) # The number of parallel processes
+    tasks = [] # [(hmm_shard, pro_seq_dict)]
+    for hmm_shard in get_hmm_shards(hmm_file):
+        for pro_seq_dict in list_of_pro_seq_dicts:
+            tasks.append((hmm_shard, pro_seq_dict))
+    cpu = max(int(n * len(list_of_pro_seq_dicts) / max(len(tasks), 1)), 1) # Keep the total number of CPUs the same as without shards
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        for each_pro2info in executor.map(lambda task: run_hmmsearch_on_pro_seq(task[0], task[1], cpu), tasks):
+            update_best_hits(pro2info, each_pro2info)
+    return pro2info
+    
+def call_genes_by_prodigal(input_seq, out_dir, threads):
     # Step 1 Get all split fasta addresses
     output_seq_folder = os.path.join(out_dir, 'tmp_dir_split_fasta')
-    split_seq(final_virus_fasta_file, threads, output_seq_folder)
+    split_seq(input_seq, threads, output_seq_folder)
     all_fasta_addrs = glob(os.path.join(output_seq_folder, '*.fasta'))  
     
     # Step 2 Prodigal annotate all fasta files
@@ -142,6 +215,62 @@ def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dv
             p.wait() 
     
     all_faa_addrs = glob(f"{output_seq_folder}/*.faa")
+    return output_seq_folder, all_faa_addrs
+    
+def split_pro_seq(all_faa_seq, threads):
+    all_faa_seq_keys_list = list(all_faa_seq.keys())
+    chunk_size = max(math.ceil(len(all_faa_seq_keys_list) / int(threads)), 1)
+    list_of_pro_seq_dicts = [] # [pro_seq_dicts]
+    for chunk in chuncker(all_faa_seq_keys_list, chunk_size):
+        if chunk:
+            list_of_pro_seq_dicts.append({pro_header: all_faa_seq[pro_header] for pro_header in chunk})
+    return list_of_pro_seq_dicts
+    
+def run_hmmsearch_in_one_queue(KEGG_hmm_file, Pfam_hmm_file, VOG_hmm_file, list_of_pro_seq_dicts, threads):
+    # Schedule all (database shard x protein chunk) searches as one work queue, each task uses one cpu,
+    # so that all workers stay busy until the last task instead of waiting at the end of each database
+    hmm_files = {'KEGG': KEGG_hmm_file, 'Pfam': Pfam_hmm_file, 'VOG': VOG_hmm_file} # db => hmm_file
+    tasks = [] # [(db, hmm_shard, pro_seq_dict)]
+    for db in hmm_files:
+        for hmm_shard in get_hmm_shards(hmm_files[db]):
+            for pro_seq_dict in list_of_pro_seq_dicts:
+                tasks.append((db, hmm_shard, pro_seq_dict))
+            
+    db2pro2info = defaultdict(dict) # db => pro => [query, query_accession, evalue, score]
+    with ThreadPoolExecutor(max_workers=int(threads)) as executor:
+        for db, pro2info in executor.map(lambda task: (task[0], run_hmmsearch_on_pro_seq(task[1], task[2], 1)), tasks):
+            update_best_hits(db2pro2info[db], pro2info)
+            
+    # Merge the best-hit tables of three databases
+        #KEGG-> query
+        #Pfam -> query_accession
+        #VOG -> query  
+    KEGG_hmm_result = {pro: [info[0], info[2], info[3]] for pro, info in db2pro2info['KEGG'].items()} # pro => [query, evalue, score]
+    Pfam_hmm_result = {pro: [info[1], info[2], info[3]] for pro, info in db2pro2info['Pfam'].items()} # pro => [query_accession, evalue, score]
+    VOG_hmm_result = {pro: [info[0], info[2], info[3]] for pro, info in db2pro2info['VOG'].items()} # pro => [query, evalue, score]
+    return KEGG_hmm_result, Pfam_hmm_result, VOG_hmm_result
+    
+def annotate_by_prodigal(final_virus_fasta_file, KEGG_hmm_file, Pfam_hmm_file, VOG_hmm_file, out_dir, threads, hmm_search_mode):
+    # Step 1 Prodigal annotate all split fasta files
+    output_seq_folder, all_faa_addrs = call_genes_by_prodigal(final_virus_fasta_file, out_dir, threads)
+    
+    if hmm_search_mode == 'merged':
+        # Step 2 Read all proteins once and search KEGG, Pfam, and VOG databases in one work queue
+        list_of_pro_seq_dicts = [store_seq(faa_addr) for faa_addr in all_faa_addrs]
+        KEGG_hmm_result, Pfam_hmm_result, VOG_hmm_result = run_hmmsearch_in_one_queue(KEGG_hmm_file, Pfam_hmm_file, VOG_hmm_file, list_of_pro_seq_dicts, threads)
+        
+        # Step 3 Store all proteins and genes, and remove the tmp dir
+        all_faa_seq = {}
+        for pro_seq_dict in list_of_pro_seq_dicts:
+            all_faa_seq.update(pro_seq_dict)
+            
+        all_ffn_seq = {}
+        for ffn_addr in glob(f"{output_seq_folder}/*.ffn"):
+            all_ffn_seq.update(store_seq(ffn_addr))
+            
+        os.system(f"rm -rf {output_seq_folder}")
+        
+        return KEGG_hmm_result, Pfam_hmm_result, VOG_hmm_result, all_faa_seq, all_ffn_seq
 
     # Step 3 Run hmmsearch against KEGG database
     tmp_dir_kegg_hmmsearch_results = os.path.join(out_dir, 'tmp_dir_kegg_hmmsearch_results')
@@ -152,11 +281,13 @@ def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dv
     
     kegg_hmmsearch_cmds = []
     for faa_addr in all_faa_addrs:
-        faa_stem = Path(faa_addr).stem
-        kegg_hmmtbl = os.path.join(tmp_dir_kegg_hmmsearch_results, f"{faa_stem}.KEGG.hmmtbl")
-        kegg_temp = os.path.join(tmp_dir_kegg_hmmsearch_results, f"{faa_stem}_temp.txt")
-        each_cmd = f"hmmsearch --tblout {kegg_hmmtbl} --noali -T 40 --cpu {int(threads)} -o {kegg_temp} {KEGG_hmm_file} {faa_addr}"
-        kegg_hmmsearch_cmds.append(each_cmd)
+        for hmm_shard in get_hmm_shards(KEGG_hmm_file):
+            faa_stem = Path(faa_addr).stem
+            hmm_shard_stem = Path(hmm_shard).stem
+            kegg_hmmtbl = os.path.join(tmp_dir_kegg_hmmsearch_results, f"{faa_stem}.{hmm_shard_stem}.KEGG.hmmtbl")
+            kegg_temp = os.path.join(tmp_dir_kegg_hmmsearch_results, f"{faa_stem}.{hmm_shard_stem}_temp.txt")
+            each_cmd = f"hmmsearch --tblout {kegg_hmmtbl} --noali -T 40 --cpu {int(threads)} -o {kegg_temp} {hmm_shard} {faa_addr}"
+            kegg_hmmsearch_cmds.append(each_cmd)
     
     n = int(threads) # The number of parallel processes
     for j in range(max(int(len(kegg_hmmsearch_cmds)/n + 1), 1)):
@@ -173,11 +304,13 @@ def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dv
     
     pfam_hmmsearch_cmds = []
     for faa_addr in all_faa_addrs:
-        faa_stem = Path(faa_addr).stem
-        pfam_hmmtbl = os.path.join(tmp_dir_pfam_hmmsearch_results, f"{faa_stem}.Pfam.hmmtbl")
-        pfam_temp = os.path.join(tmp_dir_pfam_hmmsearch_results, f"{faa_stem}_temp.txt")
-        each_cmd = f"hmmsearch --tblout {pfam_hmmtbl} --noali -T 40 --cpu {int(threads)} -o {pfam_temp} {Pfam_hmm_file} {faa_addr}"
-        pfam_hmmsearch_cmds.append(each_cmd)
+        for hmm_shard in get_hmm_shards(Pfam_hmm_file):
+            faa_stem = Path(faa_addr).stem
+            hmm_shard_stem = Path(hmm_shard).stem
+            pfam_hmmtbl = os.path.join(tmp_dir_pfam_hmmsearch_results, f"{faa_stem}.{hmm_shard_stem}.Pfam.hmmtbl")
+            pfam_temp = os.path.join(tmp_dir_pfam_hmmsearch_results, f"{faa_stem}.{hmm_shard_stem}_temp.txt")
+            each_cmd = f"hmmsearch --tblout {pfam_hmmtbl} --noali -T 40 --cpu {int(threads)} -o {pfam_temp} {hmm_shard} {faa_addr}"
+            pfam_hmmsearch_cmds.append(each_cmd)
     
     n = int(threads) # The number of parallel processes
     for j in range(max(int(len(pfam_hmmsearch_cmds)/n + 1), 1)):
@@ -194,11 +327,13 @@ def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dv
     
     vog_hmmsearch_cmds = []
     for faa_addr in all_faa_addrs:
-        faa_stem = Path(faa_addr).stem
-        vog_hmmtbl = os.path.join(tmp_dir_vog_hmmsearch_results, f"{faa_stem}.VOG.hmmtbl")
-        vog_temp = os.path.join(tmp_dir_vog_hmmsearch_results, f"{faa_stem}_temp.txt")
-        each_cmd = f"hmmsearch --tblout {vog_hmmtbl} --noali -T 40 --cpu {int(threads)} -o {vog_temp} {VOG_hmm_file} {faa_addr}"
-        vog_hmmsearch_cmds.append(each_cmd)
+        for hmm_shard in get_hmm_shards(VOG_hmm_file):
+            faa_stem = Path(faa_addr).stem
+            hmm_shard_stem = Path(hmm_shard).stem
+            vog_hmmtbl = os.path.join(tmp_dir_vog_hmmsearch_results, f"{faa_stem}.{hmm_shard_stem}.VOG.hmmtbl")
+            vog_temp = os.path.join(tmp_dir_vog_hmmsearch_results, f"{faa_stem}.{hmm_shard_stem}_temp.txt")
+            each_cmd = f"hmmsearch --tblout {vog_hmmtbl} --noali -T 40 --cpu {int(threads)} -o {vog_temp} {hmm_shard} {faa_addr}"
+            vog_hmmsearch_cmds.append(each_cmd)
     
     n = int(threads) # The number of parallel processes
     for j in range(max(int(len(vog_hmmsearch_cmds)/n + 1), 1)):
@@ -213,59 +348,106 @@ def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dv
     ## Step 6.1 Parse KEGG hmmsearch results
     KEGG_hmm_result = {} # pro => [query, evalue, score]
     KEGG_hmmtbls = glob(os.path.join(tmp_dir_kegg_hmmsearch_results, '*.KEGG.hmmtbl'))
+    pro2best_info = {} # pro => [query, query_accession, evalue, score]
     for hmmtbl in KEGG_hmmtbls:
-        pro2info = get_hmmsearch_result(hmmtbl)
-        for pro in pro2info:
-            query, evalue, score = pro2info[pro][0], pro2info[pro][2], pro2info[pro][3]
-            KEGG_hmm_result[pro] = [query, evalue, score]
+        update_best_hits(pro2best_info, get_hmmsearch_result(hmmtbl))
+    for pro in pro2best_info:
+        query, evalue, score = pro2best_info[pro][0], pro2best_info[pro][2], pro2best_info[pro][3]
+        KEGG_hmm_result[pro] = [query, evalue, score]
             
     ## Step 6.2 Parse Pfam hmmsearch results
     Pfam_hmm_result = {} # pro => [query_accession, evalue, score]
     Pfam_hmmtbls = glob(os.path.join(tmp_dir_pfam_hmmsearch_results, '*.Pfam.hmmtbl'))
+    pro2best_info = {} # pro => [query, query_accession, evalue, score]
     for hmmtbl in Pfam_hmmtbls:
-        pro2info = get_hmmsearch_result(hmmtbl)
-        for pro in pro2info:
-            query_accession, evalue, score = pro2info[pro][1], pro2info[pro][2], pro2info[pro][3]
-            Pfam_hmm_result[pro] = [query_accession, evalue, score]
+        update_best_hits(pro2best_info, get_hmmsearch_result(hmmtbl))
+    for pro in pro2best_info:
+        query_accession, evalue, score = pro2best_info[pro][1], pro2best_info[pro][2], pro2best_info[pro][3]
+        Pfam_hmm_result[pro] = [query_accession, evalue, score]
 
     ## Step 6.3 Parse VOG hmmsearch results
     VOG_hmm_result = {} # pro => [query, evalue, score]
     VOG_hmmtbls = glob(os.path.join(tmp_dir_vog_hmmsearch_results, '*.VOG.hmmtbl'))
+    pro2best_info = {} # pro => [query, query_accession, evalue, score]
     for hmmtbl in VOG_hmmtbls:
-        pro2info = get_hmmsearch_result(hmmtbl)
-        for pro in pro2info:
-            query, evalue, score = pro2info[pro][0], pro2info[pro][2], pro2info[pro][3]
-            VOG_hmm_result[pro] = [query, evalue, score]            
+        update_best_hits(pro2best_info, get_hmmsearch_result(hmmtbl))
+    for pro in pro2best_info:
+        query, evalue, score = pro2best_info[pro][0], pro2best_info[pro][2], pro2best_info[pro][3]
+        VOG_hmm_result[pro] = [query, evalue, score]
+
+    # Step 7 Store all proteins and genes, and remove all tmp dirs
+    all_faa_seq = {}
+    for faa_addr in all_faa_addrs:
+        all_faa_seq.update(store_seq(faa_addr))
+        
+    all_ffn_seq = {}
+    for ffn_addr in glob(f"{output_seq_folder}/*.ffn"):
+        all_ffn_seq.update(store_seq(ffn_addr))
+        
+    os.system(f"rm -rf {output_seq_folder} {tmp_dir_kegg_hmmsearch_results} {tmp_dir_pfam_hmmsearch_results} {tmp_dir_vog_hmmsearch_results}")
+    
+    return KEGG_hmm_result, Pfam_hmm_result, VOG_hmm_result, all_faa_seq, all_ffn_seq
+    
+def annotate_by_pyrodigal(final_virus_fasta_file, KEGG_hmm_file, Pfam_hmm_file, VOG_hmm_file, threads, hmm_search_mode):
+    # Step 1 Call genes by pyrodigal in memory
+    all_faa_seq, all_ffn_seq = call_genes_by_pyrodigal(final_virus_fasta_file, threads)
+    
+    # Step 2 Split proteins into chunks
+    list_of_pro_seq_dicts = split_pro_seq(all_faa_seq, threads)
+    
+    if hmm_search_mode == 'merged':
+        # Step 3 Search KEGG, Pfam, and VOG databases in one work queue
+        KEGG_hmm_result, Pfam_hmm_result, VOG_hmm_result = run_hmmsearch_in_one_queue(KEGG_hmm_file, Pfam_hmm_file, VOG_hmm_file, list_of_pro_seq_dicts, threads)
+        return KEGG_hmm_result, Pfam_hmm_result, VOG_hmm_result, all_faa_seq, all_ffn_seq
             
-    ## Step 6.4 Store KO, Pfam, VOG info
-    KO2info = {} # KO => [AMG, KO name]
-    Pfam2info = {} # Pfam => Pfam name
-    VOG2info = {} # VOG => VOG name
-    AMG_KO = [] # [KO] Store the AMG KOs
-    with open(os.path.join(VIBRANT_db, 'files/VIBRANT_AMGs.tsv'),'r') as lines:
-        for line in lines:
-            line = line.rstrip('\n')
-            if not line.startswith('KO'):
-                KO = line
-                AMG_KO.append(KO)
-    lines.close()
+    # Step 3 Run hmmsearch against KEGG, Pfam, and VOG databases
+        #KEGG-> query
+        #Pfam -> query_accession
+        #VOG -> query  
+    KEGG_hmm_result = {} # pro => [query, evalue, score]
+    pro2info = run_hmmsearch_on_pro_seq_chunks(KEGG_hmm_file, list_of_pro_seq_dicts, threads)
+    for pro in pro2info:
+        KEGG_hmm_result[pro] = [pro2info[pro][0], pro2info[pro][2], pro2info[pro][3]]
+        
+    Pfam_hmm_result = {} # pro => [query_accession, evalue, score]
+    pro2info = run_hmmsearch_on_pro_seq_chunks(Pfam_hmm_file, list_of_pro_seq_dicts, threads)
+    for pro in pro2info:
+        Pfam_hmm_result[pro] = [pro2info[pro][1], pro2info[pro][2], pro2info[pro][3]]
+        
+    VOG_hmm_result = {} # pro => [query, evalue, score]
+    pro2info = run_hmmsearch_on_pro_seq_chunks(VOG_hmm_file, list_of_pro_seq_dicts, threads)
+    for pro in pro2info:
+        VOG_hmm_result[pro] = [pro2info[pro][0], pro2info[pro][2], pro2info[pro][3]]
+        
+    return KEGG_hmm_result, Pfam_hmm_result, VOG_hmm_result, all_faa_seq, all_ffn_seq
+    
+def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dvf_outdir, out_dir, threads, gene_caller, hmm_search_mode):
+    final_virus_fasta_file = ''
+    KEGG_hmm_file = os.path.join(VIBRANT_db, 'databases/KEGG_profiles_prokaryotes.HMM')
+    Pfam_hmm_file = os.path.join(VIBRANT_db, 'databases/Pfam-A_v32.HMM')
+    VOG_hmm_file = os.path.join(VIBRANT_db, 'databases/VOGDB94_phage.HMM')
+    
+    if identify_method == 'vs':
+        final_virus_fasta_file = os.path.join(virsorter_outdir, 'final_vs2_virus.fasta')
+    elif identify_method == 'dvf':
+        final_virus_fasta_file = os.path.join(dvf_outdir, 'final_dvf_virus.fasta')
 
-    with open(os.path.join(VIBRANT_db, 'files/VIBRANT_names.tsv'),'r') as lines:
-        for line in lines:
-            line = line.rstrip('\n')
-            tmp = line.split('\t')
-            if tmp[0].startswith('VOG'):
-                VOG2info[tmp[0]] = tmp[1]
-            elif tmp[0].startswith('K'):
-                if tmp[0] in AMG_KO:
-                    KO2info[tmp[0]] = ['AMG', tmp[1]]
-                else:
-                    KO2info[tmp[0]] = ['', tmp[1]]
-            else:
-                Pfam2info[tmp[0]] = tmp[1]
-    lines.close()            
+    # Step 1 Call genes and run hmmsearch against KEGG, Pfam, and VOG databases
+    if gene_caller == 'pyrodigal':
+        KEGG_hmm_result, Pfam_hmm_result, VOG_hmm_result, all_faa_seq, all_ffn_seq = annotate_by_pyrodigal(final_virus_fasta_file, KEGG_hmm_file, Pfam_hmm_file, VOG_hmm_file, threads, hmm_search_mode)
+    else:
+        KEGG_hmm_result, Pfam_hmm_result, VOG_hmm_result, all_faa_seq, all_ffn_seq = annotate_by_prodigal(final_virus_fasta_file, KEGG_hmm_file, Pfam_hmm_file, VOG_hmm_file, out_dir, threads, hmm_search_mode)
+        
+    # Step 2 Store KO, Pfam, VOG info
+    vibrant_metadata = load_vibrant_metadata(VIBRANT_db)
+    AMG_KO = vibrant_metadata['amg_kos'] # {KO} Store the AMG KOs
+    KO2info = {} # KO => [AMG, KO name]
+    for KO, KO_name in vibrant_metadata['ko2name'].items():
+        KO2info[KO] = ['AMG' if KO in AMG_KO else '', KO_name]
+    Pfam2info = vibrant_metadata['pfam2name'] # Pfam => Pfam name
+    VOG2info = vibrant_metadata['vog2name'] # VOG => VOG name
                 
-    # Step 7 Write down annotation result
+    # Step 3 Write down annotation result
     annotation_file = ''
     if identify_method == 'vs':
         annotation_file = os.path.join(virsorter_outdir, 'final_vs2_virus.annotation.txt')
@@ -276,12 +458,7 @@ def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dv
     header_list = ['protein', 'scaffold', 'KO', 'AMG', 'KO name', 'KO evalue', 'KO score', 'Pfam', 'Pfam name', 'Pfam evalue', 'Pfam score', 'VOG', 'VOG name', 'VOG evalue', 'VOG score']    
     header = '\t'.join(header_list)
     f.write(header + '\n')
-    all_pro_seq = {}
-    for faa_addr in all_faa_addrs:
-        pro_seq = store_seq(faa_addr)
-        all_pro_seq.update(pro_seq)
-    
-    for pro_w_array in all_pro_seq:
+    for pro_w_array in all_faa_seq:
         pro = pro_w_array.replace('>', '' , 1)
         scf = pro.rsplit('_', 1)[0]
         KO, AMG, KO_name, KO_evalue, KO_score = '', '', '', '', ''
@@ -301,11 +478,8 @@ def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dv
         f.write(line + '\n')  
     f.close()   
 
-    # Step 7 Make the final virus faa and ffn files and remove all tmp dirs
-    all_ffn_addrs = glob(f"{output_seq_folder}/*.ffn")
-    all_faa_seq = {}
+    # Step 4 Make the final virus faa and ffn files
     all_faa_seq_addr = ''
-    all_ffn_seq = {}
     all_ffn_seq_addr = ''
     
     if identify_method == 'vs':
@@ -315,19 +489,12 @@ def run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dv
         all_faa_seq_addr = os.path.join(dvf_outdir, 'final_dvf_virus.faa')
         all_ffn_seq_addr = os.path.join(dvf_outdir, 'final_dvf_virus.ffn')
     
-    for faa_addr in all_faa_addrs:
-        faa_addr_seq = store_seq(faa_addr)
-        all_faa_seq.update(faa_addr_seq)
-
-    for ffn_addr in all_ffn_addrs:
-        ffn_addr_seq = store_seq(ffn_addr)
-        all_ffn_seq.update(ffn_addr_seq)   
-
     write_down_seq(all_faa_seq, all_faa_seq_addr)
     write_down_seq(all_ffn_seq, all_ffn_seq_addr)    
-    
-    os.system(f"rm -rf {output_seq_folder} {tmp_dir_kegg_hmmsearch_results} {tmp_dir_pfam_hmmsearch_results} {tmp_dir_vog_hmmsearch_results}")
                
     
-VIBRANT_db, identify_method, virsorter_outdir, dvf_outdir, out_dir, threads = sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5], sys.argv[6]
-run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dvf_outdir, out_dir, threads)       
\ No newline at end of file
+if __name__ == "__main__":
+    VIBRANT_db, identify_method, virsorter_outdir, dvf_outdir, out_dir, threads = sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5], sys.argv[6]
+    gene_caller = sys.argv[7] if len(sys.argv) > 7 else 'prodigal'
+    hmm_search_mode = sys.argv[8] if len(sys.argv) > 8 else 'separate'
+    run_annotate_by_vibrant_db(VIBRANT_db, identify_method, virsorter_outdir, dvf_outdir, out_dir, threads, gene_caller, hmm_search_mode)       
\ No newline at end of file
@@ -9,11 +9,13 @@ try:
     from pathlib import Path
     from glob import glob
     import subprocess
-    from subprocess import DEVNULL, STDOUT, check_call  
+    from subprocess import DEVNULL, STDOUT, check_call
+    from collections import defaultdict
+    import math
 except Exception as e:
     sys.stderr.write(str(e) + "\n\n")
-    exit(1) 
-    
+    exit(1)
+
 def run_drep(dRep_outdir, viral_genus_genome_list_dir, threads, dRep_length_limit):
     dRep_cmd = []
     viral_genus_genome_lists = glob(f'{viral_genus_genome_list_dir}/viral_genus_genome_list.*.txt')
@@ -33,7 +35,189 @@ def run_drep(dRep_outdir, viral_genus_genome_list_dir, threads, dRep_length_limi
     for j in range(max(int(len(dRep_cmd)/n + 1), 1)):
         procs = [subprocess.Popen(i, shell=True, stdout=DEVNULL) for i in dRep_cmd[j*n: min((j+1)*n, len(dRep_cmd))] ]
         for p in procs:
-            p.wait()      
-    
+            p.wait()
+
+def get_genome_length(genome):
+    length = 0
+    with open(genome, 'r') as lines:
+        for line in lines:
+            if not line.startswith('>'):
+                length += len(line.strip())
+    lines.close()
+
+    return length
+
+def cluster_by_average_linkage(gns, pair2dist, dist_cutoff):
+    # Cluster genomes by average linkage (the same as dRep hierarchical clustering),
+    # missing pairs are treated as completely different genomes (distance = 1)
+    from scipy.cluster.hierarchy import linkage, fcluster
+    from scipy.spatial.distance import squareform
+    import numpy as np
+
+    if len(gns) == 1:
+        return {gns[0]: 1}
+
+    dist_matrix = np.ones((len(gns), len(gns)))
+    for i in range(len(gns)):
+        dist_matrix[i][i] = 0
+        for j in range(i + 1, len(gns)):
+            dist_pair = []
+            if (gns[i], gns[j]) in pair2dist: dist_pair.append(pair2dist[(gns[i], gns[j])])
+            if (gns[j], gns[i]) in pair2dist: dist_pair.append(pair2dist[(gns[j], gns[i])])
+            if dist_pair:
+                dist_matrix[i][j] = dist_matrix[j][i] = sum(dist_pair) / len(dist_pair)
+
+    linkage_result = linkage(squareform(dist_matrix, checks=False), method='average')
+    cluster_result = fcluster(linkage_result, dist_cutoff, criterion='distance')
+
+    gn2cluster = {} # gn => cluster number
+    for i in range(len(gns)):
+        gn2cluster[gns[i]] = int(cluster_result[i])
+
+    return gn2cluster
+
+def run_drep_with_shared_sketch(dRep_outdir, viral_genus_genome_list_dir, threads, dRep_length_limit):
+    # Use the same settings as "run_drep": -pa 0.8 -sa 0.95 -nc 0.85 -sizeW 1 (all other weights are 0)
+    P_ani, S_ani, cov_thresh = 0.8, 0.95, 0.85
+    n = int(threads) # The number of parallel processes
+
+    shared_sketch_dir = os.path.join(dRep_outdir, 'shared_sketch')
+    fastani_dir = os.path.join(shared_sketch_dir, 'fastANI_results')
+    os.makedirs(fastani_dir, exist_ok=True)
+
+    # Step 1 Collect genomes from all non-singleton genera
+    VC2gns = {} # VC => [gn_addresses]
+    gn2length = {} # gn_address => genome length
+    viral_genus_genome_lists = glob(f'{viral_genus_genome_list_dir}/viral_genus_genome_list.*.txt')
+    for viral_genus_genome_list in viral_genus_genome_lists:
+        VC = Path(viral_genus_genome_list).stem.split(".")[1]
+        gns = []
+        with open(viral_genus_genome_list, 'r') as lines:
+            for line in lines:
+                line = line.rstrip('\n')
+                if line:
+                    gns.append(line)
+        lines.close()
+
+        if len(gns) != 1:
+            # Filter genomes by length, the same as "dRep dereplicate -l"
+            for gn in gns:
+                gn2length[gn] = get_genome_length(gn)
+            gns = [gn for gn in gns if gn2length[gn] >= int(dRep_length_limit)]
+            if gns:
+                VC2gns[VC] = gns
+
+    if not VC2gns:
+        return
+
+    gn2VC = {} # gn_address => VC
+    for VC in VC2gns:
+        for gn in VC2gns[VC]:
+            gn2VC[gn] = VC
+
+    # Step 2 Sketch all genomes once and get Mash distances within each genus
+    all_genome_list = os.path.join(shared_sketch_dir, 'all_genomes.txt')
+    f = open(all_genome_list, 'w')
+    for gn in gn2VC:
+        f.write(gn + '\n')
+    f.close()
+
+    all_genome_sketch = os.path.join(shared_sketch_dir, 'all_genomes')
+    os.system(f'mash sketch -p {n} -s 1000 -o {all_genome_sketch} -l {all_genome_list} 1> /dev/null 2>&1')
+    all_genome_mash_dist = os.path.join(shared_sketch_dir, 'all_genomes.mash_dist.tsv')
+    os.system(f'mash dist -p {n} -d {round(1 - P_ani, 2)} {all_genome_sketch}.msh {all_genome_sketch}.msh > {all_genome_mash_dist} 2> /dev/null')
+
+    VC2mash_dist = defaultdict(dict) # VC => {(gn1, gn2) => mash distance}
+    with open(all_genome_mash_dist, 'r') as lines:
+        for line in lines:
+            tmp = line.rstrip('\n').split('\t')
+            gn1, gn2 = tmp[0], tmp[1]
+            if gn1 != gn2 and gn1 in gn2VC and gn2 in gn2VC and gn2VC[gn1] == gn2VC[gn2]:
+                VC2mash_dist[gn2VC[gn1]][(gn1, gn2)] = float(tmp[2])
+    lines.close()
+
+    # Step 3 Get primary clusters within each genus
+    VC2gn2primary_cluster = {} # VC => {gn_address => primary cluster}
+    for VC in VC2gns:
+        VC2gn2primary_cluster[VC] = cluster_by_average_linkage(VC2gns[VC], VC2mash_dist[VC], 1 - P_ani)
+
+    # Step 4 Run fastANI for all primary clusters from all genera in one shared pool
+    fastani_cmds = []
+    primary_cluster2fastani_result = {} # (VC, primary cluster) => fastANI result file
+    for VC in VC2gn2primary_cluster:
+        primary_cluster2gns = defaultdict(list)
+        for gn, primary_cluster in VC2gn2primary_cluster[VC].items():
+            primary_cluster2gns[primary_cluster].append(gn)
+        for primary_cluster, gns in primary_cluster2gns.items():
+            if len(gns) > 1:
+                fastani_list = os.path.join(fastani_dir, f'{VC}.{primary_cluster}.txt')
+                fastani_result = os.path.join(fastani_dir, f'{VC}.{primary_cluster}.fastANI.tsv')
+                f = open(fastani_list, 'w')
+                for gn in gns:
+                    f.write(gn + '\n')
+                f.close()
+                fastani_cmds.append(f'fastANI --ql {fastani_list} --rl {fastani_list} -o {fastani_result} -t 1 1> /dev/null 2>&1')
+                primary_cluster2fastani_result[(VC, primary_cluster)] = fastani_result
+
+    for j in range(max(int(len(fastani_cmds)/n + 1), 1)):
+        procs = [subprocess.Popen(i, shell=True, stdout=DEVNULL) for i in fastani_cmds[j*n: min((j+1)*n, len(fastani_cmds))] ]
+        for p in procs:
+            p.wait()
+
+    # Step 5 Get secondary clusters and species representatives, and write down dRep-like data tables
+    for VC in VC2gn2primary_cluster:
+        gn2primary_cluster = VC2gn2primary_cluster[VC]
+        primary_cluster2gns = defaultdict(list)
+        for gn, primary_cluster in gn2primary_cluster.items():
+            primary_cluster2gns[primary_cluster].append(gn)
+
+        gn2secondary_cluster = {} # gn_address => secondary cluster
+        for primary_cluster, gns in primary_cluster2gns.items():
+            if len(gns) == 1:
+                gn2secondary_cluster[gns[0]] = f'{primary_cluster}_0'
+                continue
+
+            ani_dist = {} # (gn1, gn2) => 1 - ANI
+            fastani_result = primary_cluster2fastani_result[(VC, primary_cluster)]
+            if os.path.exists(fastani_result):
+                with open(fastani_result, 'r') as lines:
+                    for line in lines:
+                        tmp = line.rstrip('\n').split('\t')
+                        ani = float(tmp[2]) / 100
+                        if int(tmp[4]) == 0 or int(tmp[3]) / int(tmp[4]) < cov_thresh:
+                            ani = 0
+                        ani_dist[(tmp[0], tmp[1])] = 1 - ani
+                lines.close()
+
+            gn2cluster = cluster_by_average_linkage(gns, ani_dist, 1 - S_ani)
+            for gn in gn2cluster:
+                gn2secondary_cluster[gn] = f'{primary_cluster}_{gn2cluster[gn]}'
+
+        secondary_cluster2winner = {} # secondary cluster => [gn_address, score]
+        for gn in VC2gns[VC]:
+            secondary_cluster = gn2secondary_cluster[gn]
+            score = math.log10(gn2length[gn]) # Only genome size is weighted (-sizeW 1)
+            if secondary_cluster not in secondary_cluster2winner or score > secondary_cluster2winner[secondary_cluster][1]:
+                secondary_cluster2winner[secondary_cluster] = [gn, score]
+
+        data_tables_dir = os.path.join(dRep_outdir, f'Output.{VC}', 'data_tables')
+        os.makedirs(data_tables_dir, exist_ok=True)
+        f = open(os.path.join(data_tables_dir, 'Cdb.csv'), 'w')
+        f.write('genome,secondary_cluster,threshold,cluster_method,comparison_algorithm,primary_cluster\n')
+        for gn in VC2gns[VC]:
+            f.write(f'{Path(gn).name},{gn2secondary_cluster[gn]},{round(1 - S_ani, 2)},average,fastANI,{gn2primary_cluster[gn]}\n')
+        f.close()
+
+        f = open(os.path.join(data_tables_dir, 'Wdb.csv'), 'w')
+        f.write('genome,cluster,score\n')
+        for secondary_cluster in secondary_cluster2winner:
+            gn, score = secondary_cluster2winner[secondary_cluster]
+            f.write(f'{Path(gn).name},{secondary_cluster},{score}\n')
+        f.close()
+
 dRep_outdir, viral_genus_genome_list_dir, threads, dRep_length_limit = sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4]
-run_drep(dRep_outdir, viral_genus_genome_list_dir, threads, dRep_length_limit)    
\ No newline at end of file
+species_cluster_method = sys.argv[5] if len(sys.argv) > 5 else 'drep'
+if species_cluster_method == 'shared_sketch':
+    run_drep_with_shared_sketch(dRep_outdir, viral_genus_genome_list_dir, threads, dRep_length_limit)
+else:
+    run_drep(dRep_outdir, viral_genus_genome_list_dir, threads, dRep_length_limit)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import sqlite3
+    warnings.filterwarnings("ignore")
+    from datetime import datetime
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# The protein => ICTV 8-rank taxonomy table of the Tax classification db ("pro2ictv_8_rank_tax.txt") compiled into a sqlite db at download time;
+# each distinct lineage is stored once in "lineages", and "proteins" maps each protein to its lineage id.
+# "proteins" is a WITHOUT ROWID table, i.e., a B-tree sorted by protein, so a lookup is O(log n) and nothing is loaded up front
+
+tax_db_version = '1' # Change it when the tables change; a tax db of another version is not used, and the txt table is parsed instead
+tax_db_name = 'pro2ictv_8_rank_tax.sqlite'
+tax_txt_name = 'pro2ictv_8_rank_tax.txt'
+
+def write_tax_db(pro2tax_file, tax_db):
+    # Write the tax db into "{tax_db}.part" and rename it when it is complete, so that a half-written tax db is never used
+    part_db = tax_db + '.part'
+    if os.path.exists(part_db):
+        os.remove(part_db)
+    conn = sqlite3.connect(part_db)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+    conn.execute('CREATE TABLE lineages (lineage_id INTEGER PRIMARY KEY, lineage TEXT)')
+    conn.execute('CREATE TABLE proteins (protein TEXT PRIMARY KEY, lineage_id INTEGER) WITHOUT ROWID')
+
+    lineage2id = {} # lineage => lineage_id
+    pro2lineage_id = {} # pro => lineage_id; a repeated protein keeps its last lineage, the same as parsing the txt table
+    with open(pro2tax_file, 'r') as lines:
+        for line in lines:
+            pro, lineage = line.rstrip('\n').split('\t', 1)
+            if lineage not in lineage2id:
+                lineage2id[lineage] = len(lineage2id) + 1
+            pro2lineage_id[pro] = lineage2id[lineage]
+    lines.close()
+
+    with conn:
+        conn.executemany('INSERT INTO lineages VALUES (?, ?)', ((lineage2id[lineage], lineage) for lineage in lineage2id))
+        conn.executemany('INSERT INTO proteins VALUES (?, ?)', sorted(pro2lineage_id.items())) # Sorted input makes the B-tree build sequential
+        meta = {'version': tax_db_version, 'protein_num': str(len(pro2lineage_id)), 'lineage_num': str(len(lineage2id)), 'made_at': str(datetime.now().replace(microsecond=0))}
+        conn.executemany('INSERT INTO meta VALUES (?, ?)', meta.items())
+    conn.close()
+    os.replace(part_db, tax_db)
+
+def connect_tax_db(tax_db):
+    # Return a read-only connection to the tax db, or None if it is missing or of another version
+    if not os.path.exists(tax_db):
+        return None
+    conn = sqlite3.connect(f"file:{os.path.abspath(tax_db)}?mode=ro", uri = True)
+    try:
+        version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    except sqlite3.DatabaseError:
+        version = None
+    if not version or version[0] != tax_db_version:
+        conn.close()
+        return None
+    return conn
+
+def get_pro2tax(tax_classification_db_dir, pros):
+    # Return pro => ICTV 8-rank tax for the given proteins; proteins without tax are left out.
+    # Use the tax db if it is usable, otherwise parse the txt table (e.g., a Tax classification db set up before the tax db was added)
+    pros = set(pros)
+    pro2tax = {}
+    conn = connect_tax_db(os.path.join(tax_classification_db_dir, tax_db_name))
+    if conn:
+        pro_list = sorted(pros)
+        for i in range(0, len(pro_list), 500): # Stay below the limit of SQL variables (999 in older sqlite)
+            pro_chunk = pro_list[i:i + 500]
+            for pro, lineage in conn.execute(f"SELECT proteins.protein, lineages.lineage FROM proteins JOIN lineages ON proteins.lineage_id = lineages.lineage_id WHERE proteins.protein IN ({', '.join('?' * len(pro_chunk))})", pro_chunk):
+                pro2tax[pro] = lineage
+        conn.close()
+    else:
+        with open(os.path.join(tax_classification_db_dir, tax_txt_name), 'r') as lines:
+            for line in lines:
+                pro, tax = line.rstrip('\n').split('\t', 1)
+                if pro in pros:
+                    pro2tax[pro] = tax
+        lines.close()
+
+    return pro2tax
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import pickle
+    warnings.filterwarnings("ignore")
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# A compiled cache of the VIBRANT name, AMG, and KEGG pathway tables; only the standard library is used,
+# so it can be loaded from both the ViWrap env and the ViWrap-VIBRANT env
+
+vibrant_metadata_sources = ['files/VIBRANT_AMGs.tsv', 'files/VIBRANT_names.tsv', 'files/VIBRANT_KEGG_pathways_summary.tsv']
+vibrant_metadata_cache = 'files/VIBRANT_metadata.pkl'
+vibrant_metadata_version = 3 # Bump it when the cached content changes
+loaded_vibrant_metadata = {} # VIBRANT_db => metadata; Metadata that has been loaded in this process
+
+def get_source_stats(VIBRANT_db):
+    source_stats = {} # source file => [size, mtime]
+    for source in vibrant_metadata_sources:
+        source_file = os.path.join(VIBRANT_db, source)
+        if os.path.exists(source_file):
+            source_stats[source] = [os.path.getsize(source_file), int(os.path.getmtime(source_file))]
+    return source_stats
+
+def strip_quotes(item):
+    if item and item[0] == '"' and item[-1] == '"':
+        item = item.strip('"').rstrip('"')
+    return item
+
+def build_vibrant_metadata(VIBRANT_db):
+    metadata = {}
+    metadata['version'] = vibrant_metadata_version
+    metadata['source_stats'] = get_source_stats(VIBRANT_db)
+
+    # Step 1 Store AMG KOs
+    amg_kos = set() # Store the AMG KOs
+    with open(os.path.join(VIBRANT_db, 'files/VIBRANT_AMGs.tsv'), 'r') as lines:
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if line != 'KO' and line.startswith('K'):
+                amg_kos.add(line)
+    lines.close()
+    metadata['amg_kos'] = amg_kos
+
+    # Step 2 Store KO, Pfam, and VOG names
+    ko2name = {} # KO => KO name
+    pfam2name = {} # Pfam => Pfam name
+    vog2name = {} # VOG => VOG name
+    with open(os.path.join(VIBRANT_db, 'files/VIBRANT_names.tsv'), 'r') as lines:
+        for line in lines:
+            tmp = line.rstrip('\r\n').split('\t')
+            if len(tmp) < 2:
+                continue
+            if tmp[0].startswith('VOG'):
+                vog2name[tmp[0]] = tmp[1]
+            elif tmp[0].startswith('K'):
+                ko2name[tmp[0]] = tmp[1]
+            else:
+                pfam2name[tmp[0]] = tmp[1]
+    lines.close()
+    metadata['ko2name'], metadata['pfam2name'], metadata['vog2name'] = ko2name, pfam2name, vog2name
+
+    # Step 3 Store the metabolism and pathway KOs, and their inverted KO indexes in the same pass;
+    # the pathway summary has no KEGG level above the metabolism (all its maps are under "Metabolism"), so the categories are left empty
+    metabolism2kos = {} # metabolism => [kos]
+    pathway2kos = {} # pathway => [kos]
+    category2kos = {} # category => [kos]
+    ko2metabolisms = {} # ko => {metabolisms}
+    ko2pathways = {} # ko => {pathways}
+    ko2categories = {} # ko => {categories}
+    KEGG_pathway_file = os.path.join(VIBRANT_db, 'files/VIBRANT_KEGG_pathways_summary.tsv')
+    if os.path.exists(KEGG_pathway_file):
+        with open(KEGG_pathway_file, 'r') as lines:
+            for line in lines:
+                tmp = line.rstrip('\r\n').split('\t')
+                if 'map' in tmp[0]:
+                    metabolism, pathway, ko_arrary = strip_quotes(tmp[1]), strip_quotes(tmp[2]), tmp[3]
+                    kos = ko_arrary.split('~')
+                    pathway2kos[pathway] = kos
+                    metabolism2kos.setdefault(metabolism, [])
+                    for ko in kos:
+                        if metabolism not in ko2metabolisms.get(ko, ()): # A metabolism spans several pathway rows, so merge their KOs
+                            metabolism2kos[metabolism].append(ko)
+                        ko2metabolisms.setdefault(ko, set()).add(metabolism)
+                        ko2pathways.setdefault(ko, set()).add(pathway)
+        lines.close()
+    metadata['metabolism2kos'], metadata['pathway2kos'], metadata['category2kos'] = metabolism2kos, pathway2kos, category2kos
+    # Sort the hits so that joined outputs are stable between runs
+    metadata['ko2metabolisms'] = {ko: sorted(ko2metabolisms[ko]) for ko in ko2metabolisms}
+    metadata['ko2pathways'] = {ko: sorted(ko2pathways[ko]) for ko in ko2pathways}
+    metadata['ko2categories'] = {ko: sorted(ko2categories[ko]) for ko in ko2categories}
+
+    return metadata
+
+def write_vibrant_metadata(VIBRANT_db):
+    # Build the cache at download time, it will be rebuilt if any source file has changed
+    metadata = build_vibrant_metadata(VIBRANT_db)
+    with open(os.path.join(VIBRANT_db, vibrant_metadata_cache), 'wb') as f:
+        pickle.dump(metadata, f, protocol = 4)
+    f.close()
+    return metadata
+
+def load_vibrant_metadata(VIBRANT_db):
+    if VIBRANT_db in loaded_vibrant_metadata:
+        return loaded_vibrant_metadata[VIBRANT_db]
+
+    metadata = {}
+    cache_file = os.path.join(VIBRANT_db, vibrant_metadata_cache)
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            metadata = pickle.load(f)
+        f.close()
+    if metadata.get('version') != vibrant_metadata_version or metadata.get('source_stats') != get_source_stats(VIBRANT_db):
+        try:
+            metadata = write_vibrant_metadata(VIBRANT_db)
+        except OSError: # The VIBRANT db dir could be read-only
+            metadata = build_vibrant_metadata(VIBRANT_db)
+
+    loaded_vibrant_metadata[VIBRANT_db] = metadata
+    return metadata
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+try:
+    import warnings
+    import sys
+    import os
+    import csv
+    import sqlite3
+    import hashlib
+    warnings.filterwarnings("ignore")
+    from pathlib import Path
+    from datetime import datetime
+except Exception as e:
+    sys.stderr.write(str(e) + "\n\n")
+    exit(1)
+
+# Warehouse tables and their columns, each table (except "runs") is keyed by run_id so that a run can be replaced as a whole
+warehouse_tables = {} # table name => [columns]
+warehouse_tables['runs'] = ['run_id TEXT PRIMARY KEY', 'out_dir TEXT', 'run_type TEXT', 'fingerprint TEXT', 'ingested_at TEXT']
+warehouse_tables['genome_info'] = ['run_id TEXT', 'genome TEXT', 'genome_size INTEGER', 'scaffold_num INTEGER', 'protein_count INTEGER', 'AMG_KOs TEXT', 'lytic_state TEXT', 'checkv_quality TEXT', 'miuvig_quality TEXT', 'completeness REAL', 'completeness_method TEXT']
+warehouse_tables['species_clusters'] = ['run_id TEXT', 'genome TEXT', 'species_rep TEXT', 'genus TEXT']
+warehouse_tables['genus_clusters'] = ['run_id TEXT', 'genome TEXT', 'genus TEXT']
+warehouse_tables['taxonomy'] = ['run_id TEXT', 'genome TEXT', 'lineage TEXT', 'method TEXT']
+warehouse_tables['host_predictions'] = ['run_id TEXT', 'genome TEXT', 'level TEXT', 'host TEXT', 'host_taxonomy TEXT', 'confidence_score REAL', 'methods TEXT']
+warehouse_tables['amg_proteins'] = ['run_id TEXT', 'genome TEXT', 'protein TEXT', 'scaffold TEXT', 'ko TEXT', 'ko_name TEXT', 'metabolism TEXT', 'pathway TEXT', 'category TEXT']
+warehouse_tables['abundance'] = ['run_id TEXT', 'genome TEXT', 'sample TEXT', 'raw_abundance REAL', 'normalized_abundance REAL']
+
+warehouse_indexes = {} # index name => [table, columns]
+warehouse_indexes['idx_genome_info'] = ['genome_info', 'run_id, genome']
+warehouse_indexes['idx_genome_info_genome'] = ['genome_info', 'genome']
+warehouse_indexes['idx_species_clusters'] = ['species_clusters', 'run_id, genome']
+warehouse_indexes['idx_species_clusters_rep'] = ['species_clusters', 'species_rep']
+warehouse_indexes['idx_genus_clusters'] = ['genus_clusters', 'run_id, genome']
+warehouse_indexes['idx_genus_clusters_genus'] = ['genus_clusters', 'genus']
+warehouse_indexes['idx_taxonomy'] = ['taxonomy', 'run_id, genome']
+warehouse_indexes['idx_host_predictions'] = ['host_predictions', 'run_id, genome']
+warehouse_indexes['idx_host_predictions_host'] = ['host_predictions', 'host']
+warehouse_indexes['idx_amg_proteins'] = ['amg_proteins', 'run_id, genome']
+warehouse_indexes['idx_amg_proteins_ko'] = ['amg_proteins', 'ko']
+warehouse_indexes['idx_abundance'] = ['abundance', 'run_id, genome']
+warehouse_indexes['idx_abundance_sample'] = ['abundance', 'sample']
+
+# Summary files that are loaded into the warehouse (relative to the summary outdir)
+summary_files = ['Virus_summary_info.txt', 'Species_cluster_info.txt', 'Genus_cluster_info.txt', 'Tax_classification_result.txt',
+                 'Host_prediction_to_genome_m90.csv', 'Host_prediction_to_genus_m90.csv', 'AMG_results/AMG_pro2info.txt',
+                 'Virus_raw_abundance.txt', 'Virus_normalized_abundance.txt']
+
+def connect_warehouse(warehouse_db, read_only = False):
+    if read_only:
+        if not os.path.exists(warehouse_db):
+            sys.exit(f"Could not find the ViWrap warehouse of {warehouse_db}")
+        conn = sqlite3.connect(f"file:{os.path.abspath(warehouse_db)}?mode=ro", uri = True)
+    else:
+        conn = sqlite3.connect(warehouse_db)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        create_warehouse_tables(conn)
+
+    return conn
+
+def create_warehouse_tables(conn):
+    with conn:
+        for table in warehouse_tables:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(warehouse_tables[table])})")
+        for index in warehouse_indexes:
+            table, columns = warehouse_indexes[index]
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns})")
+
+def get_summary_outdir(out_dir):
+    # Return the summary outdir and the run type ("run" or "run_wo_reads") of a finished ViWrap run
+    if os.path.exists(os.path.join(out_dir, '08_ViWrap_summary_outdir', 'Virus_summary_info.txt')):
+        return os.path.join(out_dir, '08_ViWrap_summary_outdir'), 'run'
+    elif os.path.exists(os.path.join(out_dir, '05_ViWrap_summary_outdir', 'Virus_summary_info.txt')):
+        return os.path.join(out_dir, '05_ViWrap_summary_outdir'), 'run_wo_reads'
+    else:
+        return '', ''
+
+def get_run_fingerprint(summary_outdir):
+    # The fingerprint only uses the name, size, and modification time of each summary file,
+    # so an unchanged run can be skipped without reading any table
+    fingerprint = hashlib.sha1()
+    for summary_file in summary_files:
+        summary_file_addr = os.path.join(summary_outdir, summary_file)
+        if os.path.exists(summary_file_addr):
+            stat = os.stat(summary_file_addr)
+            fingerprint.update(f"{summary_file}\t{stat.st_size}\t{stat.st_mtime_ns}\n".encode())
+
+    return fingerprint.hexdigest()
+
+def to_number(value, number_type = float):
+    try:
+        return number_type(value)
+    except ValueError:
+        return None
+
+def get_genome_info_rows(run_id, summary_outdir):
+    rows = []
+    with open(os.path.join(summary_outdir, 'Virus_summary_info.txt'), 'r') as lines:
+        header = lines.readline().rstrip('\n').split('\t')
+        for line in lines:
+            tmp = line.rstrip('\n').split('\t')
+            items = dict(zip(header[1:], tmp[1:])) # The first column is the genome
+            rows.append([run_id, tmp[0], to_number(items.get('genome_size', ''), int), to_number(items.get('scaffold_num', ''), int),
+                         to_number(items.get('protein_count', ''), int), items.get('AMG_KOs', ''), items.get('lytic_state', ''),
+                         items.get('checkv_quality', ''), items.get('miuvig_quality', ''), to_number(items.get('completeness', '')),
+                         items.get('completeness_method', '')])
+    lines.close()
+
+    return rows
+
+def get_cluster_rows(run_id, summary_outdir):
+    species_rows = []
+    with open(os.path.join(summary_outdir, 'Species_cluster_info.txt'), 'r') as lines:
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line.startswith('#'):
+                species_rep, gns, genus = line.split(',')
+                for gn in gns.split(';'):
+                    species_rows.append([run_id, gn, species_rep, genus])
+    lines.close()
+
+    genus_rows = []
+    with open(os.path.join(summary_outdir, 'Genus_cluster_info.txt'), 'r') as lines:
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line.startswith('#'):
+                genus, gns = line.split(',', 1)
+                for gn in gns.split(';'):
+                    genus_rows.append([run_id, gn, genus])
+    lines.close()
+
+    return species_rows, genus_rows
+
+def get_taxonomy_rows(run_id, summary_outdir):
+    rows = []
+    tax_classification_result = os.path.join(summary_outdir, 'Tax_classification_result.txt')
+    if os.path.exists(tax_classification_result):
+        with open(tax_classification_result, 'r') as lines:
+            for line in lines:
+                tmp = line.rstrip('\n').split('\t')
+                if len(tmp) == 3:
+                    rows.append([run_id, tmp[0], tmp[1], tmp[2]])
+        lines.close()
+
+    return rows
+
+def get_host_prediction_rows(run_id, summary_outdir):
+    rows = []
+    host_pred_files = {} # level => [host pred file, host column, host taxonomy column, method columns]
+    host_pred_files['genome'] = ['Host_prediction_to_genome_m90.csv', 'Host genome', 'Host taxonomy', ['Main method', 'Additional methods']]
+    host_pred_files['genus'] = ['Host_prediction_to_genus_m90.csv', 'Host genus', 'Host genus', ['List of methods']]
+
+    for level in host_pred_files:
+        host_pred_file, host_col, host_tax_col, method_cols = host_pred_files[level]
+        host_pred_file = os.path.join(summary_outdir, host_pred_file)
+        if not os.path.exists(host_pred_file):
+            continue
+        with open(host_pred_file, 'r', newline = '') as lines:
+            for items in csv.DictReader(lines):
+                methods = ';'.join([items[col] for col in method_cols if items.get(col)])
+                rows.append([run_id, items.get('Virus', ''), level, items.get(host_col, ''), items.get(host_tax_col, ''),
+                             to_number(items.get('Confidence score', '')), methods])
+        lines.close()
+
+    return rows
+
+def get_amg_protein_rows(run_id, summary_outdir):
+    rows = []
+    amg_pro2info_file = os.path.join(summary_outdir, 'AMG_results', 'AMG_pro2info.txt')
+    if os.path.exists(amg_pro2info_file):
+        with open(amg_pro2info_file, 'r') as lines:
+            header = lines.readline().rstrip('\n').split('\t')
+            for line in lines:
+                items = dict(zip(header, line.rstrip('\n').split('\t')))
+                # The AMG table from "run_wo_reads" has no genome column, each scaffold is a genome there
+                genome = items['Genome'] if 'Genome' in items else items['Scaffold'].replace('||', '__', 1)
+                rows.append([run_id, genome, items['AMG'], items['Scaffold'], items['AMG_KO'], items['AMG_KO_name'],
+                             items['Metabolism'], items['Pathway'], items['Category']])
+        lines.close()
+
+    return rows
+
+def get_abundance_rows(run_id, summary_outdir):
+    abundance_dict = {} # (genome, sample) => [raw_abundance, normalized_abundance]
+    abundance_files = [os.path.join(summary_outdir, 'Virus_raw_abundance.txt'), os.path.join(summary_outdir, 'Virus_normalized_abundance.txt')]
+    for i in range(len(abundance_files)):
+        if not os.path.exists(abundance_files[i]):
+            continue
+        with open(abundance_files[i], 'r') as lines:
+            samples = lines.readline().rstrip('\n').split('\t')[1:]
+            for line in lines:
+                tmp = line.rstrip('\n').split('\t')
+                for j in range(len(samples)):
+                    abundance_dict.setdefault((tmp[0], samples[j]), [None, None])[i] = to_number(tmp[j + 1])
+        lines.close()
+
+    rows = []
+    for genome, sample in abundance_dict:
+        raw_abundance, normalized_abundance = abundance_dict[(genome, sample)]
+        rows.append([run_id, genome, sample, raw_abundance, normalized_abundance])
+
+    return rows
+
+def ingest_run(conn, out_dir, run_id, force = False):
+    # Return "ingested", "skipped" (the same run has been ingested and is unchanged), or "missing" (not a finished run)
+    summary_outdir, run_type = get_summary_outdir(out_dir)
+    if not summary_outdir:
+        return 'missing'
+
+    fingerprint = get_run_fingerprint(summary_outdir)
+    old_run = conn.execute('SELECT fingerprint FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+    if old_run and old_run[0] == fingerprint and not force:
+        return 'skipped'
+
+    table2rows = {} # table name => [rows]
+    table2rows['genome_info'] = get_genome_info_rows(run_id, summary_outdir)
+    table2rows['species_clusters'], table2rows['genus_clusters'] = get_cluster_rows(run_id, summary_outdir)
+    table2rows['taxonomy'] = get_taxonomy_rows(run_id, summary_outdir)
+    table2rows['host_predictions'] = get_host_prediction_rows(run_id, summary_outdir)
+    table2rows['amg_proteins'] = get_amg_protein_rows(run_id, summary_outdir)
+    table2rows['abundance'] = get_abundance_rows(run_id, summary_outdir)
+
+    # Replace all rows of this run in one transaction, so re-ingesting a run never leaves duplicated or partial rows
+    with conn:
+        for table in table2rows:
+            conn.execute(f'DELETE FROM {table} WHERE run_id = ?', (run_id,))
+            placeholders = ', '.join(['?'] * len(warehouse_tables[table]))
+            conn.executemany(f'INSERT INTO {table} VALUES ({placeholders})', table2rows[table])
+        conn.execute('INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)',
+                     (run_id, os.path.abspath(out_dir), run_type, fingerprint, str(datetime.now().replace(microsecond=0))))
+
+    return 'ingested'
+
+def query_warehouse(conn, sql, params = ()):
+    cursor = conn.execute(sql, params)
+    header = [col[0] for col in cursor.description] if cursor.description else []
+
+    return header, cursor
+
+def write_down_query_result(header, rows, output):
+    f = open(output, 'w') if output != '-' else sys.stdout
+    f.write('\t'.join(header) + '\n')
+    for row in rows:
+        f.write('\t'.join(['' if item == None else str(item) for item in row]) + '\n')
+    if output != '-':
+        f.close()